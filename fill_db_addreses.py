@@ -1,3 +1,4 @@
+import argparse
 import os
 import django
 import json
@@ -19,25 +20,50 @@ RAW_BASE_PATH = 'raw_base'
 IMAGE_SOURCE_FOLDER = os.path.join(RAW_BASE_PATH, 'addresses')
 SHOPS_JSON_PATH = os.path.join(RAW_BASE_PATH, 'shops.json')
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Загрузка магазинов из raw_base')
+    parser.add_argument('--batch', action='store_true',
+                        help='Пакетный импорт: параллельное геокодирование и запись одним upsert')
+    parser.add_argument('--workers', type=int, default=8, help='Параллельных запросов к геокодеру (--batch)')
+    parser.add_argument('--rate', type=int, default=50, help='Запросов к геокодеру в секунду (--batch)')
+    parser.add_argument('--json', default=SHOPS_JSON_PATH, help='Файл с магазинами')
+    parser.add_argument('--images', default=IMAGE_SOURCE_FOLDER, help='Папка с изображениями')
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
     print("\nЗагрузка магазинов...")
     
     # Проверка папки с изображениями
-    if not os.path.exists(IMAGE_SOURCE_FOLDER):
-        print(f"Папка {IMAGE_SOURCE_FOLDER} не найдена!")
+    if not os.path.exists(args.images):
+        print(f"Папка {args.images} не найдена!")
         return
 
     # Загрузка данных магазинов
     try:
-        with open(SHOPS_JSON_PATH, 'r', encoding='utf-8') as f:
+        with open(args.json, 'r', encoding='utf-8') as f:
             shops_data = json.load(f)
     except FileNotFoundError:
-        print("Файл shops.json не найден!")
+        print(f"Файл {args.json} не найден!")
+        return
+
+    if args.batch:
+        from flowershopservice.shop_import import import_shops
+
+        stats = import_shops(shops_data, args.images, workers=args.workers, rate=args.rate)
+        print(
+            f"Загружено магазинов: {stats['shops']} (координаты: {stats['geocoded']}, "
+            f"не найдены: {stats['not_found']}, ждут геокодирования: {stats['pending']}, "
+            f"прежние из-за ошибки геокодера: {stats['kept']}); "
+            f"изображений скопировано: {stats['images_copied']}, уже были: {stats['images_skipped']}"
+        )
         return
 
     # Получение списка доступных изображений
     image_files = [
-        f for f in os.listdir(IMAGE_SOURCE_FOLDER) 
+        f for f in os.listdir(args.images) 
         if f.lower().endswith(('.png', '.jpg', '.jpeg'))
     ]
     if not image_files:
@@ -53,7 +79,7 @@ def main():
         # Копирование случайного изображения
         try:
             image_file = random.choice(image_files)
-            source_path = os.path.join(IMAGE_SOURCE_FOLDER, image_file)
+            source_path = os.path.join(args.images, image_file)
             dest_path = os.path.join('shops', image_file)
             full_dest_path = os.path.join(settings.MEDIA_ROOT, dest_path)
             
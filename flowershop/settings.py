@@ -68,6 +68,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'flowershopservice.context_processors.shops_context',
+                'flowershopservice.context_processors.idempotency_context',
             ],
         },
     },
@@ -137,18 +138,37 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_NAME = 'sessionid'
 SESSION_COOKIE_AGE = 60 * 5  # 5 минут
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = True
 
+# Срок действия подписанного токена мастера заказа (с момента последнего шага)
+ORDER_WIZARD_MAX_AGE = 60 * 30  # 30 минут
+
 # Яндекс Геокодер и Карты
 YANDEX_GEOCODER_API_KEY = env.str('YANDEX_GEOCODER_API_KEY')
 YANDEX_MAPS_API_KEY = env.str('YANDEX_MAPS_API_KEY')
+YANDEX_GEOCODER_URL = env.str('YANDEX_GEOCODER_URL', default='https://geocode-maps.yandex.ru/1.x/')  # Адрес API геокодера
+# Город магазинов: его название в начале адреса не влияет на ключ кэша геокодера
+GEOCODER_CITY = env.str('GEOCODER_CITY', default='Красноярск')
+# Оценка времени доставки: средняя скорость курьера по городу и во сколько раз
+# путь по дорогам длиннее расстояния по прямой
+DELIVERY_SPEED_KMH = env.int('DELIVERY_SPEED_KMH', default=25)
+DELIVERY_ROUTE_FACTOR = env.float('DELIVERY_ROUTE_FACTOR', default=1.4)
 
 TELEGRAM_BOT_TOKEN = env.str('TELEGRAM_BOT_TOKEN', default=None)  # Токен бота
 TELEGRAM_CHAT_ID = env.str('TELEGRAM_CHAT_ID', default=None)      # ID канала
+TELEGRAM_API_URL = env.str('TELEGRAM_API_URL', default='https://api.telegram.org')  # Адрес Bot API
+# Окно сводки уведомлений менеджерам в секундах (0 - отправлять каждое уведомление сразу)
+NOTIFICATION_DIGEST_WINDOW = env.int('NOTIFICATION_DIGEST_WINDOW', default=0)
 
 LOGGING = {
     'version': 1,
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ShopUser, Category, PriceRange, Product, DeliveryTimeSlot, Order, Consultation, DeliveryManagement, Shop
+from .models import ShopUser, Category, PriceRange, Product, DeliveryTimeSlot, Order, Consultation, DeliveryManagement, Shop, SlotBooking, NotificationOutbox, NotificationDeadLetter, GeocodeCache
 from django.utils.html import mark_safe, format_html
 from django.db import models
 from django.utils import timezone
@@ -8,11 +8,12 @@ from django import forms
 from django.core.validators import RegexValidator
 from django.conf import settings
 from django.contrib import messages
+from . import search, outbox, geocoding
 
 @admin.register(ShopUser)
 class ShopUserAdmin(admin.ModelAdmin):
-    list_display = ['full_name', 'phone', 'status']
-    list_filter = ['status']
+    list_display = ['full_name', 'phone', 'status', 'telegram_blocked']
+    list_filter = ['status', 'telegram_blocked']
     search_fields = ['full_name', 'phone']
 
     # Добавляем форму для кастомизации полей
@@ -64,6 +65,12 @@ class ProductAdmin(admin.ModelAdmin):
             )
         }
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск в админке идет через тот же полнотекстовый индекс, что и на сайте"""
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return search.filter_queryset(queryset, search_term), False
+
     def formfield_for_manytomany(self, db_field, request, **kwargs):
         if db_field.name == "categories":
             kwargs['widget'] = admin.widgets.FilteredSelectMultiple(
@@ -96,9 +103,9 @@ class ProductAdmin(admin.ModelAdmin):
 
 @admin.register(DeliveryTimeSlot)
 class DeliveryTimeSlotAdmin(admin.ModelAdmin):
-    list_display = ['time_start', 'time_end', 'display_name', 'is_express', 'is_available_tomorrow']
+    list_display = ['time_start', 'time_end', 'display_name', 'is_express', 'is_available_tomorrow', 'capacity']
     list_filter = ['is_express', 'is_available_tomorrow']
-    list_editable = ['display_name', 'is_available_tomorrow']
+    list_editable = ['display_name', 'is_available_tomorrow', 'capacity']
     
     def get_fieldsets(self, request, obj=None):
         return [
@@ -106,10 +113,111 @@ class DeliveryTimeSlotAdmin(admin.ModelAdmin):
                 'fields': ('time_start', 'time_end', 'display_name')
             }),
             ('Настройки доступности', {
-                'fields': ('is_express', 'is_available_tomorrow')
+                'fields': ('is_express', 'is_available_tomorrow', 'capacity')
             })
         ]
 
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'created_at', 'chat_id', 'status', 'digest', 'attempts', 'sent_at', 'last_error']
+    list_filter = ['status', 'digest']
+    search_fields = ['chat_id', 'recipient_name', 'text']
+    readonly_fields = [
+        'chat_id', 'recipient_name', 'text', 'digest', 'status', 'attempts', 'created_at', 'available_at',
+        'locked_until', 'claimed_by', 'sent_at', 'last_error',
+    ]
+    actions = ['retry_messages']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_messages(self, request, queryset):
+        updated = queryset.exclude(status__in=['sent', 'merged']).update(
+            status='pending', attempts=0, available_at=timezone.now(), locked_until=None,
+        )
+        self.message_user(request, f"Повторно поставлено в очередь: {updated}")
+    retry_messages.short_description = 'Отправить повторно'
+
+
+@admin.register(NotificationDeadLetter)
+class NotificationDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ['id', 'failed_at', 'chat_id', 'recipient_name', 'attempts', 'error']
+    search_fields = ['chat_id', 'recipient_name', 'text', 'error']
+    date_hierarchy = 'failed_at'
+    readonly_fields = ['chat_id', 'recipient_name', 'text', 'attempts', 'error', 'created_at', 'failed_at']
+    actions = ['requeue_messages']
+
+    def has_add_permission(self, request):
+        return False
+
+    def requeue_messages(self, request, queryset):
+        # Получателю, заблокировавшему бота, сначала нужно снять флаг в карточке пользователя
+        messages_to_requeue = list(queryset)
+        outbox.enqueue_many((message.chat_id, message.text) for message in messages_to_requeue)
+        queryset.filter(id__in=[message.id for message in messages_to_requeue]).delete()
+        self.message_user(request, f"Возвращено в очередь: {len(messages_to_requeue)}")
+    requeue_messages.short_description = 'Вернуть в очередь'
+
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ['address', 'latitude', 'longitude', 'created_at', 'expires_at']
+    search_fields = ['address']
+    readonly_fields = ['address', 'latitude', 'longitude', 'created_at', 'expires_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    # Удаленный адрес будет запрошен у геокодера заново
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        geocoding.clear_memory_cache()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        geocoding.clear_memory_cache()
+
+
+@admin.register(SlotBooking)
+class SlotBookingAdmin(admin.ModelAdmin):
+    list_display = ['delivery_date', 'slot', 'orders_count']
+    list_filter = ['delivery_date', 'slot']
+    # Счетчики ведутся автоматически при оформлении и отмене заказов
+    readonly_fields = ['slot', 'delivery_date', 'orders_count']
+
+    def has_add_permission(self, request):
+        return False
+
+
+class DistanceBandFilter(admin.SimpleListFilter):
+    """Фильтр заказов по расстоянию до ближайшего магазина (по сохраненному distance_km)"""
+    title = 'Расстояние доставки'
+    parameter_name = 'distance'
+    # Значение параметра -> (название, от, до) в километрах
+    BANDS = {
+        '0-3': ('до 3 км', None, 3),
+        '3-7': ('3–7 км', 3, 7),
+        '7-15': ('7–15 км', 7, 15),
+        '15+': ('дальше 15 км', 15, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(value, band[0]) for value, band in self.BANDS.items()] + [('unknown', 'не определено')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'unknown':
+            return queryset.filter(distance_km__isnull=True)
+        if self.value() not in self.BANDS:
+            return queryset
+        _, low, high = self.BANDS[self.value()]
+        if low is not None:
+            queryset = queryset.filter(distance_km__gte=low)
+        if high is not None:
+            queryset = queryset.filter(distance_km__lt=high)
+        return queryset
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     def get_phone(self, obj):
@@ -127,6 +235,19 @@ class OrderAdmin(admin.ModelAdmin):
     get_delivery_time.short_description = "Время доставки"
     get_delivery_time.allow_tags = True
 
+    # Расстояние и время в пути сохранены воркером геокодирования
+    def get_distance(self, obj):
+        if obj.distance_km is not None:
+            return f"{obj.distance_km:.1f} км"
+        return obj.get_geocode_status_display()
+    get_distance.short_description = 'Расстояние'
+    get_distance.admin_order_field = 'distance_km'
+
+    def get_eta(self, obj):
+        return f"~{obj.eta_minutes} мин" if obj.eta_minutes is not None else '-'
+    get_eta.short_description = 'В пути'
+    get_eta.admin_order_field = 'eta_minutes'
+
     list_display = (
         'get_bouquet_preview', 
         'product',
@@ -135,6 +256,8 @@ class OrderAdmin(admin.ModelAdmin):
         'get_delivery_time',
         'status',
         'delivery_date',
+        'get_distance',
+        'get_eta',
         'delivery_person',
         'display_creation_date'
     )
@@ -145,7 +268,7 @@ class OrderAdmin(admin.ModelAdmin):
         'user__phone', 
         'delivery_address'
     )
-    list_filter = ('status', 'delivery_date', 'is_express_delivery', 'delivery_person')
+    list_filter = ('status', 'delivery_date', 'is_express_delivery', DistanceBandFilter, 'delivery_person')
     list_editable = ('status',)
     
     # Уменьшаем высоту поля комментария
@@ -160,7 +283,7 @@ class OrderAdmin(admin.ModelAdmin):
     get_bouquet_preview.short_description = 'Фото'
 
     # Добавляем действия для быстрого назначения доставщика
-    actions = ['assign_to_delivery']
+    actions = ['assign_to_delivery', 'regeocode_orders']
     
     def assign_to_delivery(self, request, queryset):
         # Получаем всех доставщиков
@@ -217,6 +340,14 @@ class OrderAdmin(admin.ModelAdmin):
     
     assign_to_delivery.short_description = "Назначить доставщика и отправить в доставку"
 
+    def regeocode_orders(self, request, queryset):
+        # Пересчет после исправления адреса в кэше или появления новых магазинов
+        updated = queryset.update(
+            geocode_status='pending', geocode_attempts=0, geocode_retry_at=timezone.now(), geocode_error='',
+        )
+        self.message_user(request, f"Расстояние будет определено заново: {updated}")
+    regeocode_orders.short_description = 'Пересчитать расстояние доставки'
+
     # Настройка полей формы
     fieldsets = (
         ('Основная информация', {
@@ -226,6 +357,10 @@ class OrderAdmin(admin.ModelAdmin):
             'fields': ('delivery_date', 'delivery_address', 'is_express_delivery', 
                       'delivery_time_from', 'delivery_time_to', 'delivery_person'),
         }),
+        ('Расстояние доставки', {
+            'fields': ('geocode_status', ('coord_x', 'coord_y'), 'nearest_shop', 'distance_km', 'eta_minutes'),
+            'classes': ('collapse',),
+        }),
         ('Комментарии', {
             'fields': ('comment', 'delivery_comments'),
             'classes': ('collapse',),  # Делаем секцию сворачиваемой
@@ -233,7 +368,8 @@ class OrderAdmin(admin.ModelAdmin):
     )
 
     # Делаем поле creation_date только для чтения
-    readonly_fields = ('creation_date', 'user')
+    readonly_fields = ('creation_date', 'user', 'geocode_status', 'coord_x', 'coord_y', 'nearest_shop',
+                       'distance_km', 'eta_minutes')
     
     # Фильтруем список доставщиков - показываем только пользователей со статусом 'delivery'
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
@@ -258,21 +394,16 @@ class OrderAdmin(admin.ModelAdmin):
         Переопределяем метод сохранения модели, чтобы автоматически менять статус
         заказа на "В доставке" при назначении доставщика
         """
-        # Получаем предыдущее состояние объекта (если он существует)
+        # Прежний доставщик берется из снимка, сделанного при загрузке заказа
         if change and obj.pk:
-            try:
-                old_obj = self.model.objects.get(pk=obj.pk)
-                old_delivery_person = old_obj.delivery_person
-                
-                # Если доставщик был изменен или назначен
-                if obj.delivery_person and (not old_delivery_person or old_delivery_person.id != obj.delivery_person.id):
-                    # Меняем статус на "В доставке" если он не был еще установлен
-                    if obj.status != 'inDelivery':
-                        obj.status = 'inDelivery'
-                        messages.info(request, f"Статус заказа автоматически изменён на 'В доставке' при назначении доставщика.")
-                    
-            except self.model.DoesNotExist:
-                pass
+            previous = obj.get_previous_values('delivery_person_id')
+            
+            # Если доставщик был изменен или назначен
+            if previous and obj.delivery_person_id and previous['delivery_person_id'] != obj.delivery_person_id:
+                # Меняем статус на "В доставке" если он не был еще установлен
+                if obj.status != 'inDelivery':
+                    obj.status = 'inDelivery'
+                    messages.info(request, f"Статус заказа автоматически изменён на 'В доставке' при назначении доставщика.")
                 
         # Если это новый заказ и сразу назначается доставщик
         elif not change and obj.delivery_person:
@@ -312,12 +443,14 @@ class DeliveryManagementAdmin(admin.ModelAdmin):
 
 @admin.register(Shop)
 class ShopAdmin(admin.ModelAdmin):
-    list_display = ('admin_image_preview', 'title', 'address', 'phone', 'working_hours', 'order', 'is_active')
+    list_display = ('admin_image_preview', 'title', 'address', 'phone', 'working_hours', 'order', 'is_active',
+                    'geocode_status')
     list_editable = ('order', 'is_active')
     search_fields = ('title', 'address')
-    list_filter = ('is_active',)
+    list_filter = ('is_active', 'geocode_status')
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ('coord_x', 'coord_y', 'get_map_preview', 'get_image_preview')
+    actions = ['regeocode_shops']
     
     fieldsets = (
         ('Основная информация', {
@@ -343,6 +476,14 @@ class ShopAdmin(admin.ModelAdmin):
     )
     
     def get_map_preview(self, obj):
+        if obj.pk and obj.geocode_status == 'pending':
+            return "Координаты определяются, обновите страницу через несколько секунд"
+        if obj.pk and obj.geocode_status in ('not_found', 'failed'):
+            return format_html(
+                'Координаты не определены: {}{}',
+                obj.get_geocode_status_display(),
+                f' ({obj.geocode_error})' if obj.geocode_error else '',
+            )
         if obj.coord_x and obj.coord_y:
             return mark_safe(f'''
                 <div style="width: 100%; max-width: 800px; min-width: 400px;">
@@ -406,6 +547,17 @@ class ShopAdmin(admin.ModelAdmin):
             ''')
         return "Координаты не указаны"
     get_map_preview.short_description = 'Предпросмотр на карте'
+
+    def regeocode_shops(self, request, queryset):
+        # Прежний результат удаляется из кэша, чтобы адрес запросился у геокодера
+        addresses = [geocoding.normalize_address(address) for address in queryset.values_list('address', flat=True)]
+        GeocodeCache.objects.filter(address__in=addresses).delete()
+        geocoding.clear_memory_cache()
+        updated = queryset.update(
+            geocode_status='pending', geocode_attempts=0, geocode_retry_at=timezone.now(), geocode_error='',
+        )
+        self.message_user(request, f"Координаты будут определены заново: {updated}")
+    regeocode_shops.short_description = 'Определить координаты заново'
     
     def admin_image_preview(self, obj):
         if obj.image:
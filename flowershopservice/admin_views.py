@@ -1,7 +1,7 @@
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
 from .models import Order, ShopUser
-from .telegram_service import TelegramNotifier
+from . import notifications, recipients
 import logging
 
 logger = logging.getLogger(__name__)
@@ -49,74 +49,23 @@ def assign_deliverer_confirm(request):
             f"и переведен в статус 'В доставке'"
         )
         
-        # Проверяем наличие Telegram ID и отправляем уведомление
-        if deliverer.telegram_id:
-            # Формируем текст уведомления для доставщика
-            message = (
-                f"🚚 Заказ #{order.id} готов к доставке!\n"
-                f"Клиент: {order.user.full_name}\n"
-                f"Телефон: {order.user.phone}\n"
-                f"Букет: {order.product_name}\n"
-                f"Адрес: {order.delivery_address}\n"
+        # Уведомление доставщику ставит в очередь сигнал pre_save при сохранении
+        # заказа, здесь только сообщаем администратору результат
+        if recipients.get_recipient(deliverer.id):
+            messages.success(
+                request, "Уведомление доставщику поставлено в очередь отправки."
             )
-            
-            # Добавляем информацию о времени доставки
-            if order.delivery_date:
-                message += f"Дата: {order.delivery_date.strftime('%d.%m.%Y')}\n"
-                
-            if order.is_express_delivery:
-                message += "⚡ СРОЧНАЯ доставка!"
-            elif order.delivery_time_from and order.delivery_time_to:
-                from_time = order.delivery_time_from.strftime('%H:%M')
-                to_time = order.delivery_time_to.strftime('%H:%M')
-                message += f"Время: с {from_time} до {to_time}"
-            
-            # Отправляем уведомление доставщику
-            delivery_message = (
-                f"👋 {deliverer.full_name}, "
-                f"у вас новый заказ на доставку!\n\n{message}"
-            )
-            success = TelegramNotifier.send_to_user(
-                deliverer.telegram_id,
-                delivery_message
-            )
-            
-            if success:
-                logger.info(
-                    f"Уведомление о заказе #{order.id} отправлено "
-                    f"доставщику {deliverer.full_name}"
-                )
-                messages.success(
-                    request, "Уведомление отправлено доставщику."
-                )
-            else:
-                logger.warning(
-                    f"Не удалось отправить уведомление доставщику "
-                    f"{deliverer.full_name} о заказе #{order.id}"
-                )
-                messages.warning(
-                    request, "Не удалось отправить уведомление доставщику."
-                )
         else:
             messages.warning(
                 request,
-                f"У доставщика {deliverer.full_name} не указан Telegram ID. "
+                f"У доставщика {deliverer.full_name} не указан корректный Telegram ID. "
                 f"Уведомление не отправлено!"
             )
             
         # Уведомление менеджеров теперь отключено по умолчанию и отправляется
         # только если пользователь явно выбрал опцию "notify_manager"
         if should_notify_managers:
-            from .signals import send_to_managers
-            
-            manager_message = (
-                f"📋 Заказ #{order.id} передан в доставку\n"
-                f"Доставщик: {deliverer.full_name}\n"
-                f"Клиент: {order.user.full_name}\n"
-                f"Букет: {order.product_name}"
-            )
-            
-            send_to_managers(manager_message)
+            notifications.notify(notifications.ORDER_HANDED_TO_DELIVERY, order)
             
             logger.info(
                 f"Уведомление об изменении статуса заказа #{order.id} "
@@ -0,0 +1,70 @@
+from functools import lru_cache
+
+from django.core.files.storage import default_storage
+
+# Поля, которые нужны для плитки букета в каталоге и на главной
+LIST_FIELDS = ('id', 'name', 'price', 'image')
+# Поля для страницы букета и результата квиза
+DETAIL_FIELDS = LIST_FIELDS + ('description', 'composition')
+
+
+@lru_cache(maxsize=4096)
+def get_image_url(name):
+    """URL изображения из хранилища; одни и те же файлы повторяются у многих букетов"""
+    return default_storage.url(name)
+
+
+class ProductCard:
+    """
+    Легковесная карточка букета для витрины.
+
+    Вместо полного экземпляра Product хранит только поля, которые выводятся
+    в шаблонах, и готовый URL изображения. Благодаря __slots__ у карточки
+    нет __dict__, поэтому она заметно меньше в памяти и в кэше.
+    """
+    __slots__ = ('id', 'name', 'price', 'image_url', 'description', 'composition')
+
+    def __init__(self, id, name, price, image_url, description='', composition=''):
+        self.id = id
+        self.name = name
+        self.price = price
+        self.image_url = image_url
+        self.description = description
+        self.composition = composition
+
+    def __repr__(self):
+        return f'<ProductCard {self.id}: {self.name}>'
+
+    @classmethod
+    def from_row(cls, row):
+        """Создает карточку из словаря, полученного через QuerySet.values()"""
+        image = row.get('image')
+        return cls(
+            id=row['id'],
+            name=row['name'],
+            price=row['price'],
+            image_url=get_image_url(image) if image else '',
+            description=row.get('description', ''),
+            composition=row.get('composition', ''),
+        )
+
+
+def fetch_cards(queryset, detail=False):
+    """
+    Выбирает карточки букетов одним запросом только по нужным полям.
+
+    Args:
+        queryset: QuerySet букетов (фильтрация и сортировка уже применены)
+        detail: Нужны ли описание и состав
+
+    Returns:
+        list[ProductCard]: Карточки в порядке queryset
+    """
+    fields = DETAIL_FIELDS if detail else LIST_FIELDS
+    return [ProductCard.from_row(row) for row in queryset.values(*fields)]
+
+
+def get_card(queryset, **lookup):
+    """Возвращает одну подробную карточку или None, если букет не найден"""
+    row = queryset.filter(**lookup).values(*DETAIL_FIELDS).first()
+    return ProductCard.from_row(row) if row else None
@@ -0,0 +1,58 @@
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from . import versions
+
+
+def get_version():
+    """Текущая версия каталога: букетов, категорий, ценовых диапазонов и магазинов"""
+    return versions.get(versions.CATALOG)
+
+
+def bump():
+    """Отмечает изменение каталога (см. versions.bump)"""
+    versions.bump(versions.CATALOG)
+
+
+def _request_version(request):
+    """Версия каталога, прочитанная один раз на запрос (ее используют и ETag, и Last-Modified)"""
+    version = getattr(request, '_catalog_version', None)
+    if version is None:
+        version = request._catalog_version = get_version()
+    return version
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    Слабый ETag страниц каталога: версия каталога плюс отпечаток CSRF-cookie.
+
+    ETag слабый, потому что страница не совпадает побайтно между ответами:
+    {% csrf_token %} в base.html каждый раз маскируется заново. Отпечаток
+    cookie нужен, чтобы страница, закэшированная с чужим секретом CSRF,
+    не отдавалась как 304.
+    """
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    fingerprint = hashlib.md5(csrf_cookie.encode()).hexdigest()[:8]
+    return f'W/"catalog-{_request_version(request)}-{fingerprint}"'
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return datetime.datetime.fromtimestamp(_request_version(request) / 1000, tz=datetime.timezone.utc)
+
+
+def catalog_conditional(view_func):
+    """
+    Декоратор для представлений каталога: условные ответы по версии каталога.
+
+    При совпадении If-None-Match / If-Modified-Since отдается 304 без
+    выборки букетов и рендеринга шаблонов. Cache-Control: no-cache
+    заставляет браузер перепроверять страницу, а не показывать устаревшую
+    копию.
+    """
+    return cache_control(no_cache=True)(
+        condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)(view_func)
+    )
@@ -1,4 +1,5 @@
 from .models import Shop
+from . import idempotency
 
 
 def shops_context(request):
@@ -11,4 +12,15 @@ def shops_context(request):
             'lat': 56.0096,  # Широта центра Красноярска
             'lng': 92.8726   # Долгота центра Красноярска
         }
-    }
\ No newline at end of file
+    }
+
+
+def idempotency_context(request):
+    """
+    Ключ идемпотентности для форм консультации и заказа.
+
+    Ключ ленивый: он создается, только если шаблон его выводит.
+    """
+    return {
+        'idempotency_key': idempotency.issue_key,
+    }
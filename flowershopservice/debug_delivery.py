@@ -16,7 +16,8 @@ django.setup()
 
 from flowershopservice.models import Order, ShopUser
 from flowershopservice.telegram_service import TelegramNotifier
-from flowershopservice.signals import send_to_delivery_person
+from flowershopservice import notifications
+from flowershopservice.recipients import Recipient
 
 def main():
     """Основная функция скрипта"""
@@ -53,18 +54,6 @@ def test_existing_order():
         if 1 <= choice <= len(orders):
             order = orders[choice-1]
             
-            # Формируем текст уведомления для доставщика
-            message = (
-                f"🚚 Заказ #{order.id} готов к доставке!\n"
-                f"Клиент: {order.user.full_name}\n"
-                f"Телефон: {order.user.phone}\n"
-                f"Букет: {order.product_name}\n"
-                f"Адрес: {order.delivery_address}\n"
-                f"Доставка: {order.delivery_date.strftime('%d.%m.%Y')}, "
-                f"{order.delivery_time_from.strftime('%H:%M') if order.delivery_time_from else '-'} - "
-                f"{order.delivery_time_to.strftime('%H:%M') if order.delivery_time_to else '-'}"
-            )
-            
             deliverer = order.delivery_person
             print(f"\nОтправка сообщения доставщику {deliverer.full_name} (Telegram ID: {deliverer.telegram_id})")
             
@@ -73,13 +62,13 @@ def test_existing_order():
                 print("ОШИБКА: У доставщика не указан Telegram ID!")
                 return
             
-            # Отправляем через функцию из signals
-            print("\nОтправка через функцию send_to_delivery_person из signals.py...")
-            send_to_delivery_person(deliverer, message)
+            # Текст формируется так же, как в уведомлениях о передаче в доставку
+            direct_message = notifications.format_message(
+                notifications.ORDER_IN_DELIVERY, order, Recipient(deliverer.id, deliverer.full_name, deliverer.telegram_id)
+            )
             
-            # Отправляем напрямую через TelegramNotifier
+            # Отправляем напрямую через TelegramNotifier, минуя очередь
             print("\nОтправка напрямую через TelegramNotifier...")
-            direct_message = f"👋 {deliverer.full_name}, тестовое сообщение!\n\n{message}"
             result = TelegramNotifier.send_to_user(deliverer.telegram_id, direct_message)
             
             if result:
@@ -0,0 +1,234 @@
+import datetime
+import logging
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import versions
+from .models import DeliveryTimeSlot, SlotBooking
+
+logger = logging.getLogger(__name__)
+
+SLOTS_CACHE_KEY = 'delivery_slots:{version}'
+SLOTS_CACHE_TIMEOUT = 60 * 60 * 24
+BOOKINGS_CACHE_KEY = 'slot_bookings:{date}'
+# Счетчики сбрасываются только в процессе, принявшем заказ; остальные
+# процессы видят их с задержкой не больше минуты. Лимит слота от этого
+# не нарушается: его проверяет reserve_slot в базе
+BOOKINGS_CACHE_TIMEOUT = 60
+
+# Минимальный запас времени до конца слота, чтобы его еще можно было выбрать сегодня
+MIN_MINUTES_BEFORE_END = 30
+
+Slot = namedtuple('Slot', [
+    'id', 'time_start', 'time_end', 'display_name', 'is_available_tomorrow', 'is_express', 'capacity',
+])
+
+
+def get_slots():
+    """
+    Возвращает все слоты доставки, отсортированные по времени начала.
+
+    Слоты читаются из базы один раз и хранятся в кэше, пока администратор
+    не изменит какой-либо слот. Ключ кэша включает общую версию расписания
+    из базы (ее меняют сигналы слотов), поэтому изменение, сделанное в
+    админке, видят все процессы сайта.
+    """
+    cache_key = SLOTS_CACHE_KEY.format(version=versions.get(versions.DELIVERY_SLOTS))
+    slots = cache.get(cache_key)
+    if slots is None:
+        slots = [
+            Slot(*row) for row in DeliveryTimeSlot.objects.order_by('time_start').values_list(
+                'id', 'time_start', 'time_end', 'display_name', 'is_available_tomorrow', 'is_express', 'capacity',
+            )
+        ]
+        cache.set(cache_key, slots, SLOTS_CACHE_TIMEOUT)
+    return slots
+
+
+def get_slot(slot_id):
+    """Возвращает слот по ID из закэшированного расписания или None"""
+    for slot in get_slots():
+        if slot.id == slot_id:
+            return slot
+    return None
+
+
+def invalidate_slots():
+    """Сбрасывает расписание во всех процессах"""
+    versions.bump(versions.DELIVERY_SLOTS)
+
+
+def get_booked_counts(delivery_date):
+    """
+    Возвращает количество принятых заказов по слотам на дату: {slot_id: count}.
+
+    Счетчики кэшируются ненадолго (BOOKINGS_CACHE_TIMEOUT) и сбрасываются
+    после каждого бронирования или отмены в этом процессе.
+    """
+    cache_key = BOOKINGS_CACHE_KEY.format(date=delivery_date.isoformat())
+    counts = cache.get(cache_key)
+    if counts is None:
+        counts = dict(SlotBooking.objects.filter(delivery_date=delivery_date).values_list('slot_id', 'orders_count'))
+        cache.set(cache_key, counts, BOOKINGS_CACHE_TIMEOUT)
+    return counts
+
+
+def _invalidate_booked_counts(delivery_date):
+    cache_key = BOOKINGS_CACHE_KEY.format(date=delivery_date.isoformat())
+    cache.delete(cache_key)
+    # Повторный сброс после коммита: иначе параллельный запрос может успеть
+    # закэшировать счетчики до фиксации транзакции
+    transaction.on_commit(lambda: cache.delete(cache_key))
+
+
+def has_capacity(slot, booked_counts):
+    return not slot.capacity or booked_counts.get(slot.id, 0) < slot.capacity
+
+
+def reserve_slot(slot_id, delivery_date, capacity=0, force=False):
+    """
+    Атомарно занимает место в слоте на дату.
+
+    Проверка лимита и увеличение счетчика - один условный UPDATE с F(), поэтому
+    параллельные заказы не могут превысить лимит ни на SQLite (запись
+    сериализуется блокировкой базы), ни на PostgreSQL (UPDATE блокирует строку
+    и перепроверяет условие после ожидания). Запись начинается сразу с UPDATE,
+    чтобы на SQLite транзакция не пыталась повысить блокировку с чтения до
+    записи. Вызывать нужно внутри transaction.atomic() вместе с созданием заказа.
+
+    Args:
+        slot_id: ID слота доставки
+        delivery_date: Дата доставки
+        capacity: Лимит заказов слота (0 - без ограничений)
+        force: Не проверять лимит (например, при восстановлении отмененного заказа)
+
+    Returns:
+        bool: True, если место занято, False - если слот заполнен
+    """
+    bookings = SlotBooking.objects.filter(slot_id=slot_id, delivery_date=delivery_date)
+    if capacity and not force:
+        bookings = bookings.filter(orders_count__lt=capacity)
+
+    reserved = bookings.update(orders_count=F('orders_count') + 1) > 0
+    if not reserved and not SlotBooking.objects.filter(slot_id=slot_id, delivery_date=delivery_date).exists():
+        # Первый заказ в слот на эту дату
+        try:
+            with transaction.atomic():
+                SlotBooking.objects.create(slot_id=slot_id, delivery_date=delivery_date, orders_count=1)
+            reserved = True
+        except IntegrityError:
+            # Строку одновременно создал другой запрос
+            reserved = bookings.update(orders_count=F('orders_count') + 1) > 0
+
+    if reserved:
+        _invalidate_booked_counts(delivery_date)
+    else:
+        logger.info(f"Слот {slot_id} на {delivery_date} заполнен")
+    return reserved
+
+
+def release_slot(slot_id, delivery_date):
+    """Освобождает место в слоте (отмена или удаление заказа)"""
+    SlotBooking.objects.filter(
+        slot_id=slot_id, delivery_date=delivery_date, orders_count__gt=0,
+    ).update(orders_count=F('orders_count') - 1)
+    _invalidate_booked_counts(delivery_date)
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute + value.second / 60
+
+
+def is_available_today(slot, now):
+    """Слот доступен сегодня, если до его окончания больше MIN_MINUTES_BEFORE_END минут"""
+    return _minutes(slot.time_end) - _minutes(now.time()) > MIN_MINUTES_BEFORE_END
+
+
+def get_availability(now=None):
+    """
+    Рассчитывает доступные слоты доставки на момент now.
+
+    Заполненные слоты (см. DeliveryTimeSlot.capacity) не попадают в результат.
+
+    Args:
+        now: Текущее время (по умолчанию datetime.datetime.now())
+
+    Returns:
+        dict: express_slot, today_slots, tomorrow_slots, current_date, tomorrow_date
+    """
+    now = now or datetime.datetime.now()
+    today = now.date()
+    tomorrow = today + datetime.timedelta(days=1)
+    today_counts = get_booked_counts(today)
+    tomorrow_counts = get_booked_counts(tomorrow)
+
+    express_slot = None
+    today_slots = []
+    tomorrow_slots = []
+    for slot in get_slots():
+        if slot.is_express:
+            # Используется первый экспресс-слот, как и раньше
+            if (express_slot is None and is_available_today(slot, now)
+                    and has_capacity(slot, today_counts)):
+                express_slot = slot
+            continue
+        if is_available_today(slot, now) and has_capacity(slot, today_counts):
+            today_slots.append(slot)
+        if slot.is_available_tomorrow and has_capacity(slot, tomorrow_counts):
+            tomorrow_slots.append(slot)
+
+    return {
+        'express_slot': express_slot,
+        'today_slots': today_slots,
+        'tomorrow_slots': tomorrow_slots,
+        'current_date': today,
+        'tomorrow_date': tomorrow,
+    }
+
+
+def resolve_order_time(order_time, now=None):
+    """
+    Разбирает выбранное в форме значение слота ('express', 'today-<id>', 'tomorrow-<id>').
+
+    Returns:
+        dict: slot_id, delivery_date, is_express, delivery_time_from, delivery_time_to
+              или None, если слот не найден или уже недоступен
+    """
+    now = now or datetime.datetime.now()
+    availability = get_availability(now)
+
+    if order_time.startswith('express'):
+        slot = availability['express_slot']
+        if slot is None:
+            return None
+        return {
+            'slot_id': slot.id,
+            'delivery_date': availability['current_date'],
+            'is_express': True,
+            'delivery_time_from': slot.time_start,
+            'delivery_time_to': slot.time_end,
+        }
+
+    kind, _, slot_id = order_time.partition('-')
+    if kind == 'today':
+        candidates, delivery_date = availability['today_slots'], availability['current_date']
+    elif kind == 'tomorrow':
+        candidates, delivery_date = availability['tomorrow_slots'], availability['tomorrow_date']
+    else:
+        return None
+
+    for slot in candidates:
+        if str(slot.id) == slot_id:
+            return {
+                'slot_id': slot.id,
+                'delivery_date': delivery_date,
+                'is_express': False,
+                'delivery_time_from': slot.time_start,
+                'delivery_time_to': slot.time_end,
+            }
+
+    logger.warning(f"Выбран недоступный слот доставки: {order_time}")
+    return None
@@ -0,0 +1,159 @@
+import hashlib
+import logging
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Product, Category, PriceRange
+from . import catalog_version
+
+logger = logging.getLogger(__name__)
+
+FACETS_CACHE_TIMEOUT = 60 * 60
+
+# Варианты сортировки: (поле, по убыванию)
+SORT_OPTIONS = {
+    'default': ('id', False),
+    'price_asc': ('price', False),
+    'price_desc': ('price', True),
+}
+
+
+def _int_list(values):
+    result = set()
+    for value in values:
+        try:
+            result.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return tuple(sorted(result))
+
+
+def parse_filter(params):
+    """
+    Разбирает параметры фильтра каталога из QueryDict.
+
+    Поддерживаются параметры:
+        category: ID категорий (можно несколько)
+        price_range: ID ценовых диапазонов (можно несколько)
+        featured / bestseller: '1' - только отмеченные букеты
+        sort: ключ из SORT_OPTIONS
+
+    Returns:
+        dict: Нормализованный фильтр (списки ID отсортированы)
+    """
+    sort = params.get('sort', 'default')
+    return {
+        'categories': _int_list(params.getlist('category')),
+        'price_ranges': _int_list(params.getlist('price_range')),
+        'featured': params.get('featured') == '1',
+        'bestseller': params.get('bestseller') == '1',
+        'sort': sort if sort in SORT_OPTIONS else 'default',
+    }
+
+
+def _base_queryset(catalog_filter):
+    """Активные букеты с учетом флагов (без фильтров по фасетам)"""
+    queryset = Product.objects.filter(status='active')
+    if catalog_filter['featured']:
+        queryset = queryset.filter(is_featured=True)
+    if catalog_filter['bestseller']:
+        queryset = queryset.filter(is_bestseller=True)
+    return queryset
+
+
+def filter_products(catalog_filter):
+    """
+    Возвращает QuerySet букетов, подходящих под фильтр.
+
+    Фильтры по категориям и диапазонам - подзапросы к таблицам связей,
+    поэтому результат не дублируется и не требует DISTINCT.
+    """
+    queryset = _base_queryset(catalog_filter)
+    if catalog_filter['categories']:
+        queryset = queryset.filter(id__in=Product.categories.through.objects.filter(
+            category_id__in=catalog_filter['categories']).values('product_id'))
+    if catalog_filter['price_ranges']:
+        queryset = queryset.filter(id__in=Product.price_ranges.through.objects.filter(
+            pricerange_id__in=catalog_filter['price_ranges']).values('product_id'))
+    return queryset
+
+
+def _combine(*conditions):
+    result = None
+    for condition in conditions:
+        if condition is not None:
+            result = condition if result is None else result & condition
+    return result
+
+
+def filter_signature(catalog_filter):
+    """Ключ кэша фасетов: сортировка на счетчики не влияет"""
+    raw = (
+        f"c={','.join(map(str, catalog_filter['categories']))}"
+        f"|p={','.join(map(str, catalog_filter['price_ranges']))}"
+        f"|f={int(catalog_filter['featured'])}|b={int(catalog_filter['bestseller'])}"
+    )
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def facet_counts(catalog_filter):
+    """
+    Считает количество букетов для каждой категории и ценового диапазона.
+
+    Все счетчики получаются одним агрегирующим запросом с условными COUNT.
+    Счетчик категории учитывает выбранные ценовые диапазоны (и наоборот), но
+    не выбранные категории - так видно, сколько букетов даст каждый вариант.
+    Результат кэшируется по сигнатуре фильтра и версии каталога.
+
+    Returns:
+        dict: {'total': int, 'categories': [...], 'price_ranges': [...]}
+    """
+    cache_key = f"catalog_facets:{catalog_version.get_version()}:{filter_signature(catalog_filter)}"
+    facets = cache.get(cache_key)
+    if facets is not None:
+        return facets
+
+    categories = list(Category.objects.values_list('id', 'name'))
+    price_ranges = list(PriceRange.objects.order_by('min_price'))
+
+    selected_categories = catalog_filter['categories']
+    selected_price_ranges = catalog_filter['price_ranges']
+    category_condition = Q(categories__id__in=selected_categories) if selected_categories else None
+    price_range_condition = Q(price_ranges__id__in=selected_price_ranges) if selected_price_ranges else None
+
+    aggregates = {
+        'total': Count('id', filter=_combine(category_condition, price_range_condition), distinct=True),
+    }
+    for category_id, _ in categories:
+        aggregates[f'category_{category_id}'] = Count(
+            'id', filter=_combine(Q(categories__id=category_id), price_range_condition), distinct=True)
+    for price_range in price_ranges:
+        aggregates[f'price_range_{price_range.id}'] = Count(
+            'id', filter=_combine(Q(price_ranges__id=price_range.id), category_condition), distinct=True)
+
+    counts = _base_queryset(catalog_filter).aggregate(**aggregates)
+
+    facets = {
+        'total': counts['total'],
+        'categories': [
+            {
+                'id': category_id,
+                'name': name,
+                'count': counts[f'category_{category_id}'],
+                'selected': category_id in selected_categories,
+            }
+            for category_id, name in categories
+        ],
+        'price_ranges': [
+            {
+                'id': price_range.id,
+                'name': str(price_range),
+                'count': counts[f'price_range_{price_range.id}'],
+                'selected': price_range.id in selected_price_ranges,
+            }
+            for price_range in price_ranges
+        ],
+    }
+    cache.set(cache_key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,358 @@
+import datetime
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db.models import Exists, Q
+from django.utils import timezone
+
+from . import utils
+from .models import GeocodeCache, Order, Shop
+from .shop_index import estimate_delivery, get_index as get_shop_index
+from .telegram_service import TokenBucket
+from .utils import GeocoderError
+
+logger = logging.getLogger(__name__)
+
+# Ненайденный адрес повторно не запрашивается в течение этого времени
+NEGATIVE_TTL = 60 * 60 * 24
+# Сколько адресов хранится в памяти процесса
+LRU_SIZE = 2048
+# Пакетное геокодирование: параллельные запросы и их предельная частота в секунду
+LOOKUP_WORKERS = 8
+LOOKUP_RATE = 50
+# Сколько ключей проверяется в таблице кэша одним запросом
+CACHE_QUERY_CHUNK = 500
+# Повторы геокодирования магазина при ошибках API: пауза удваивается
+MAX_GEOCODE_ATTEMPTS = 5
+GEOCODE_RETRY_SECONDS = 60
+
+# Сокращения в адресах и их полные формы. "пр." не раскрывается: так
+# сокращают и проспект, и проезд
+ABBREVIATIONS = {
+    'г': 'город',
+    'ул': 'улица',
+    'пр-т': 'проспект',
+    'просп': 'проспект',
+    'пр-кт': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'корп': 'корпус',
+    'к': 'корпус',
+    'стр': 'строение',
+    'д': 'дом',
+}
+# Слова, которые не влияют на результат геокодирования
+SKIP_WORDS = {'дом'}
+# Префиксы региона, которые отбрасываются в начале адреса
+REGION_PREFIXES = ('россия', 'российская федерация', 'красноярский край')
+
+SEPARATORS_RE = re.compile(r'[\s,;.]+')
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+# Признак ошибки геокодера в результатах пакетного запроса
+_FAILED = object()
+
+
+def normalize_address(address):
+    """
+    Приводит адрес к ключу кэша.
+
+    Регистр, пробелы и знаки препинания не важны, сокращения заменяются
+    полными формами, а страна, регион и город магазина (GEOCODER_CITY) в
+    начале адреса отбрасываются: "г. Красноярск, ул. Ленина, д. 112" и
+    "улица Ленина 112" дают один ключ.
+    """
+    text = (address or '').lower().replace('ё', 'е')
+    words = [ABBREVIATIONS.get(word, word) for word in SEPARATORS_RE.split(text) if word]
+    words = [word for word in words if word not in SKIP_WORDS]
+
+    normalized = ' '.join(words)
+    city = settings.GEOCODER_CITY.lower().replace('ё', 'е')
+    for prefix in REGION_PREFIXES + ('город ' + city, city):
+        if normalized == prefix:
+            return ''
+        if normalized.startswith(prefix + ' '):
+            normalized = normalized[len(prefix) + 1:]
+    return normalized[:300]
+
+
+def _memory_get(key):
+    """Возвращает (найдено, координаты) из памяти процесса"""
+    with _lru_lock:
+        entry = _lru.get(key)
+        if entry is None:
+            return False, None
+        coordinates, expires = entry
+        if expires is not None and expires < time.time():
+            del _lru[key]
+            return False, None
+        _lru.move_to_end(key)
+        return True, coordinates
+
+
+def _memory_set(key, coordinates, expires_at=None):
+    expires = expires_at.timestamp() if expires_at else None
+    with _lru_lock:
+        _lru[key] = (coordinates, expires)
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def clear_memory_cache():
+    with _lru_lock:
+        _lru.clear()
+
+
+def peek(address, use_memory=True):
+    """
+    Координаты адреса из кэша без запроса к геокодеру.
+
+    Args:
+        use_memory: Доверять памяти процесса; без нее адрес проверяется по таблице GeocodeCache
+
+    Returns:
+        tuple: (есть ли адрес в кэше, координаты или None)
+    """
+    key = normalize_address(address)
+    if not key:
+        return True, None
+
+    if use_memory:
+        found, coordinates = _memory_get(key)
+        if found:
+            return True, coordinates
+
+    entry = GeocodeCache.objects.filter(address=key).first()
+    if entry is None or (entry.expires_at is not None and entry.expires_at <= timezone.now()):
+        return False, None
+    coordinates = (entry.latitude, entry.longitude) if entry.latitude is not None else None
+    _memory_set(key, coordinates, entry.expires_at)
+    return True, coordinates
+
+
+def lookup(address, use_memory=True):
+    """
+    Координаты адреса из кэша или от геокодера.
+
+    Сначала проверяется память процесса (если use_memory), затем таблица
+    GeocodeCache, и только при промахе выполняется запрос к API.
+    Ненайденные адреса кэшируются на NEGATIVE_TTL, ошибки API не кэшируются.
+
+    Returns:
+        Tuple[float, float]: (широта, долгота) или None, если адрес не найден
+
+    Raises:
+        GeocoderError: Геокодер недоступен
+    """
+    found, coordinates = peek(address, use_memory)
+    if found:
+        return coordinates
+
+    coordinates = utils.request_coordinates(address)
+    now = timezone.now()
+    expires_at = None if coordinates else now + datetime.timedelta(seconds=NEGATIVE_TTL)
+    latitude, longitude = coordinates or (None, None)
+    key = normalize_address(address)
+    GeocodeCache.objects.update_or_create(
+        address=key,
+        defaults={'latitude': latitude, 'longitude': longitude, 'created_at': now, 'expires_at': expires_at},
+    )
+    _memory_set(key, coordinates, expires_at)
+    return coordinates
+
+
+def get_coordinates(address):
+    """Как lookup, но при ошибке геокодера возвращает None"""
+    try:
+        return lookup(address)
+    except GeocoderError as e:
+        logger.error(f"Ошибка геокодирования: {str(e)}")
+        return None
+
+
+def _cached_many(keys):
+    """Координаты ключей из памяти и таблицы кэша: {ключ: координаты или None}"""
+    found = {}
+    missing = []
+    for key in keys:
+        hit, coordinates = _memory_get(key)
+        if hit:
+            found[key] = coordinates
+        else:
+            missing.append(key)
+
+    now = timezone.now()
+    for start in range(0, len(missing), CACHE_QUERY_CHUNK):
+        for entry in GeocodeCache.objects.filter(address__in=missing[start:start + CACHE_QUERY_CHUNK]):
+            if entry.expires_at is not None and entry.expires_at <= now:
+                continue
+            coordinates = (entry.latitude, entry.longitude) if entry.latitude is not None else None
+            _memory_set(entry.address, coordinates, entry.expires_at)
+            found[entry.address] = coordinates
+    return found
+
+
+def lookup_many(addresses, workers=LOOKUP_WORKERS, rate=LOOKUP_RATE):
+    """
+    Координаты для множества адресов.
+
+    Адреса с одинаковым нормализованным ключом запрашиваются один раз,
+    закэшированные не запрашиваются вовсе. Остальные запрашиваются
+    параллельно (не больше workers одновременно и rate в секунду), а
+    результаты записываются в кэш одним запросом из вызывающего потока.
+
+    Returns:
+        dict: {адрес: (широта, долгота) или None}; адреса, для которых
+        геокодер вернул ошибку, в словарь не попадают
+    """
+    originals = {}
+    for address in addresses:
+        originals.setdefault(normalize_address(address), address)
+    results = {key: None for key in originals if not key}
+    results.update(_cached_many([key for key in originals if key]))
+
+    to_fetch = [key for key in originals if key not in results]
+    bucket = TokenBucket(rate, rate)
+
+    def fetch(key):
+        bucket.acquire()
+        try:
+            return key, utils.request_coordinates(originals[key])
+        except GeocoderError as e:
+            logger.error(f"Ошибка геокодирования {originals[key]}: {e}")
+            return key, _FAILED
+
+    if to_fetch:
+        with ThreadPoolExecutor(max_workers=min(workers, len(to_fetch))) as executor:
+            fetched = [(key, coordinates) for key, coordinates in executor.map(fetch, to_fetch)
+                       if coordinates is not _FAILED]
+
+        now = timezone.now()
+        negative_expires_at = now + datetime.timedelta(seconds=NEGATIVE_TTL)
+        entries = []
+        for key, coordinates in fetched:
+            expires_at = None if coordinates else negative_expires_at
+            latitude, longitude = coordinates or (None, None)
+            entries.append(GeocodeCache(address=key, latitude=latitude, longitude=longitude,
+                                        created_at=now, expires_at=expires_at))
+            _memory_set(key, coordinates, expires_at)
+            results[key] = coordinates
+        GeocodeCache.objects.bulk_create(
+            entries, batch_size=CACHE_QUERY_CHUNK, update_conflicts=True, unique_fields=['address'],
+            update_fields=['latitude', 'longitude', 'created_at', 'expires_at'],
+        )
+
+    coordinates_by_address = {}
+    for address in addresses:
+        key = normalize_address(address)
+        if key in results:
+            coordinates_by_address[address] = results[key]
+    return coordinates_by_address
+
+
+def _geocode(label, address, attempts, now):
+    """
+    Определяет координаты адреса магазина или заказа; возвращает поля для обновления.
+
+    Память процесса не используется: запись GeocodeCache могли удалить в
+    админке другого процесса ("Определить координаты заново"), и адрес
+    должен запроситься у геокодера, а не взяться из устаревшей памяти воркера.
+    """
+    try:
+        coordinates = lookup(address, use_memory=False)
+    except GeocoderError as e:
+        attempts += 1
+        if attempts >= MAX_GEOCODE_ATTEMPTS:
+            logger.error(f"Координаты {label} не определены после {attempts} попыток: {e}")
+            return {'geocode_status': 'failed', 'geocode_attempts': attempts, 'geocode_error': str(e)}
+        delay = GEOCODE_RETRY_SECONDS * 2 ** (attempts - 1)
+        logger.warning(f"Ошибка геокодирования {label}, повтор через {delay} с: {e}")
+        return {
+            'geocode_attempts': attempts,
+            'geocode_retry_at': now + datetime.timedelta(seconds=delay),
+            'geocode_error': str(e),
+        }
+
+    if coordinates is None:
+        return {'geocode_status': 'not_found', 'coord_x': None, 'coord_y': None, 'geocode_error': ''}
+    latitude, longitude = coordinates
+    return {'geocode_status': 'done', 'coord_x': latitude, 'coord_y': longitude, 'geocode_error': ''}
+
+
+def _pending(model, now):
+    return model.objects.filter(
+        Q(geocode_retry_at__isnull=True) | Q(geocode_retry_at__lte=now), geocode_status='pending'
+    ).order_by('geocode_retry_at', 'id')
+
+
+def process_pending_shops(batch_size=20):
+    """
+    Определяет координаты магазинов, ожидающих геокодирования.
+
+    Обновление условное: если адрес магазина изменили, пока шел запрос,
+    результат отбрасывается, и новый адрес обработает следующий проход.
+
+    Returns:
+        tuple[int, int]: Сколько магазинов обработано и сколько отложено до повтора
+    """
+    now = timezone.now()
+    shops = list(_pending(Shop, now).values('id', 'address', 'geocode_attempts')[:batch_size])
+    resolved = postponed = 0
+    for shop in shops:
+        updates = _geocode(f"магазина #{shop['id']}", shop['address'], shop['geocode_attempts'], now)
+        updated = Shop.objects.filter(id=shop['id'], address=shop['address'], geocode_status='pending').update(**updates)
+        if 'geocode_retry_at' in updates:
+            postponed += 1
+        elif updated:
+            resolved += 1
+    return resolved, postponed
+
+
+def process_pending_orders(batch_size=20):
+    """
+    Определяет координаты адресов доставки, ближайший магазин, расстояние
+    до него и время в пути для заказов, ожидающих геокодирования.
+
+    Все значения сохраняются в заказ, поэтому список заказов в админке
+    показывает и фильтрует их без вычислений. Обновление условное, как
+    у магазинов. Индекс магазинов сверяется с версией магазинов в базе
+    один раз на пачку заказов, а если выбранный магазин удалили уже после
+    этого, заказ остается в очереди и пересчитывается следующим проходом.
+
+    Returns:
+        tuple[int, int]: Сколько заказов обработано и сколько отложено до повтора
+    """
+    now = timezone.now()
+    orders = list(_pending(Order, now).values('id', 'delivery_address', 'geocode_attempts')[:batch_size])
+    resolved = postponed = 0
+    shops = None
+    for order in orders:
+        updates = _geocode(f"заказа #{order['id']}", order['delivery_address'], order['geocode_attempts'], now)
+        if updates.get('geocode_status') == 'done':
+            if shops is None:
+                shops = get_shop_index()
+            updates.update(estimate_delivery(updates['coord_x'], updates['coord_y'], index=shops))
+        pending = Order.objects.filter(
+            id=order['id'], delivery_address=order['delivery_address'], geocode_status='pending',
+        )
+        if updates.get('nearest_shop_id'):
+            pending = pending.filter(Exists(Shop.objects.filter(id=updates['nearest_shop_id'])))
+        updated = pending.update(**updates)
+        if 'geocode_retry_at' in updates:
+            postponed += 1
+        elif updated:
+            resolved += 1
+    return resolved, postponed
@@ -0,0 +1,155 @@
+import datetime
+import hashlib
+import json
+import logging
+import re
+import time
+import uuid
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+# Ключи хранятся в таблице IdempotencyKey: повтор распознается, в какой бы
+# процесс сайта ни попал запрос
+FIELD_NAME = 'idempotency_key'
+HEADER_NAME = 'HTTP_X_IDEMPOTENCY_KEY'
+
+# Сколько хранится результат успешной отправки формы
+RESULT_TIMEOUT = 60 * 60
+# Через сколько отметку "запрос обрабатывается" можно забрать, если процесс упал
+PENDING_TIMEOUT = 30
+WAIT_STEPS = 40
+WAIT_INTERVAL = 0.05
+
+KEY_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def issue_key():
+    """Новый ключ идемпотентности для формы"""
+    return uuid.uuid4().hex
+
+
+def get_key(request):
+    """Ключ из поля формы или заголовка X-Idempotency-Key; None, если его нет или он некорректен"""
+    key = request.POST.get(FIELD_NAME) or request.META.get(HEADER_NAME, '')
+    key = key.strip().lower()
+    return key if KEY_RE.match(key) else None
+
+
+def _payload_fingerprint(request):
+    """
+    Отпечаток данных формы: ключ из закэшированной браузером страницы может
+    попасть в несколько разных заявок, повтором считается только та же самая.
+    """
+    items = sorted(
+        (name, value) for name, values in request.POST.lists() for value in values
+        if name not in (FIELD_NAME, 'csrfmiddlewaretoken')
+    )
+    return hashlib.md5(repr(items).encode()).hexdigest()[:12]
+
+
+def _replay(stored):
+    response = HttpResponse(bytes(stored.content), status=stored.status_code, content_type=stored.content_type)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _reserve(record_key):
+    """
+    Занимает ключ для первого запроса.
+
+    Ключ вставляется строкой с уникальным индексом, поэтому из одновременных
+    запросов в разных процессах его получает ровно один. Отметку запроса,
+    процесс которого упал, забирает условный UPDATE.
+
+    Returns:
+        bool: True, если запрос нужно обработать
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(key=record_key, created_at=now)
+    except IntegrityError:
+        return IdempotencyKey.objects.filter(
+            key=record_key, status_code__isnull=True,
+            created_at__lt=now - datetime.timedelta(seconds=PENDING_TIMEOUT),
+        ).update(created_at=now) > 0
+    # Устаревшие ключи удаляются при появлении новых: таблица не растет
+    IdempotencyKey.objects.filter(created_at__lt=now - datetime.timedelta(seconds=RESULT_TIMEOUT)).delete()
+    return True
+
+
+def _stored(record_key):
+    return IdempotencyKey.objects.filter(key=record_key).only('status_code', 'content_type', 'content').first()
+
+
+def idempotent(view_func):
+    """
+    Декоратор для представлений, отвечающих JSON: повторная отправка формы с
+    тем же ключом возвращает первоначальный ответ, не выполняя представление
+    и не отправляя уведомления заново.
+
+    Сохраняются только успешные ответы ({"success": true}), поэтому после
+    ошибки валидации форму можно исправить и отправить с тем же ключом.
+    Запросы без ключа обрабатываются как обычно.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = get_key(request)
+        if key is None:
+            return view_func(request, *args, **kwargs)
+
+        record_key = f'{view_func.__name__}:{key}:{_payload_fingerprint(request)}'
+        if _reserve(record_key):
+            return _run(view_func, record_key, request, *args, **kwargs)
+
+        # Первый запрос с этим ключом еще обрабатывается - ждем его результат
+        stored = _stored(record_key)
+        for _ in range(WAIT_STEPS):
+            if stored is None or stored.status_code is not None:
+                break
+            time.sleep(WAIT_INTERVAL)
+            stored = _stored(record_key)
+
+        if stored is None and _reserve(record_key):
+            # Первый запрос завершился ошибкой - обрабатываем заново
+            return _run(view_func, record_key, request, *args, **kwargs)
+        if stored is None or stored.status_code is None:
+            return JsonResponse({'success': False, 'error': 'Запрос уже обрабатывается, подождите'}, status=409)
+
+        logger.info(f"Повторная отправка {view_func.__name__} с ключом {key}, возвращаем сохраненный ответ")
+        return _replay(stored)
+
+    return wrapper
+
+
+def _is_success(response):
+    if not isinstance(response, JsonResponse) or response.status_code != 200:
+        return False
+    try:
+        return json.loads(response.content).get('success') is True
+    except (ValueError, AttributeError):
+        return False
+
+
+def _run(view_func, record_key, request, *args, **kwargs):
+    pending = IdempotencyKey.objects.filter(key=record_key, status_code__isnull=True)
+    try:
+        response = view_func(request, *args, **kwargs)
+    except Exception:
+        pending.delete()
+        raise
+
+    if _is_success(response):
+        pending.update(
+            status_code=response.status_code, content_type=response['Content-Type'], content=response.content,
+        )
+    else:
+        pending.delete()
+    return response
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from flowershopservice.models import Product
+from flowershopservice.pagination import paginate_by_cursor, encode_cursor
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает keyset-пагинацию каталога со старой пагинацией через OFFSET'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000, 100000],
+                            help='Размеры каталога для замера')
+        parser.add_argument('--repeat', type=int, default=20, help='Количество повторов на замер')
+        parser.add_argument('--limit', type=int, default=3, help='Размер страницы')
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        repeat = options['repeat']
+
+        self.stdout.write(f"{'букетов':>10} {'keyset, мс':>12} {'старый путь, мс':>16}")
+        for size in options['sizes']:
+            # Все тестовые данные создаются внутри транзакции и откатываются
+            with transaction.atomic():
+                self._fill_catalog(size)
+                queryset = Product.objects.filter(status='active')
+                ids = list(queryset.order_by('id').values_list('id', flat=True))
+                # Курсор на середину каталога - худший случай для OFFSET
+                middle_id = ids[len(ids) // 2]
+                cursor = encode_cursor(middle_id, middle_id)
+
+                keyset_ms = self._measure(
+                    lambda: paginate_by_cursor(queryset, cursor=cursor, limit=limit), repeat)
+                legacy_ms = self._measure(
+                    lambda: self._legacy_page(queryset, len(ids) // 2, limit), repeat)
+
+                self.stdout.write(f"{size:>10} {keyset_ms:>12.3f} {legacy_ms:>16.3f}")
+                transaction.set_rollback(True)
+
+    def _fill_catalog(self, size):
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=f'Букет {i}',
+                    description='Тестовый букет',
+                    composition='Розы',
+                    price=1000 + i % 5000,
+                    image='img/catalog/bench.jpg',
+                    status='active',
+                )
+                for i in range(size)
+            ],
+            batch_size=1000,
+        )
+
+    @staticmethod
+    def _legacy_page(queryset, offset, limit):
+        """Повторяет прежнюю логику load_more_bouquets: полный обход каталога и срез"""
+        bouquets = list(queryset)
+        for bouquet in bouquets:
+            bouquet.image_url = str(bouquet.image)
+        return bouquets[offset:offset + limit], len(bouquets) > offset + limit
+
+    @staticmethod
+    def _measure(func, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) / repeat * 1000
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from flowershopservice import geocoding
+from flowershopservice.models import GeocodeCache
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время ответа кэша геокодера: из таблицы GeocodeCache и из памяти процесса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--addresses', type=int, default=1000, help='Количество адресов')
+
+    def handle(self, *args, **options):
+        count = options['addresses']
+        # Адреса записываются так, как их ввел бы менеджер, а кэш заполняется
+        # по нормализованному ключу, поэтому геокодер не вызывается
+        addresses = [f'г. Красноярск, ул. Замерная, д. {number}' for number in range(count)]
+        variants = [f'улица  Замерная {number}' for number in range(count)]
+        GeocodeCache.objects.bulk_create([
+            GeocodeCache(address=geocoding.normalize_address(address), latitude=56.0 + number / 1e5, longitude=92.9)
+            for number, address in enumerate(addresses)
+        ])
+        try:
+            geocoding.clear_memory_cache()
+            self.stdout.write(f"{'источник':>22} {'мкс/адрес':>10}")
+            for title, batch in (('таблица GeocodeCache', addresses), ('память процесса', addresses),
+                                 ('память, другая запись', variants)):
+                started = time.perf_counter()
+                for address in batch:
+                    if geocoding.lookup(address) is None:
+                        raise RuntimeError(f'Адрес не найден в кэше: {address}')
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{title:>22} {elapsed / count * 1e6:>10.1f}")
+        finally:
+            GeocodeCache.objects.filter(
+                address__in=[geocoding.normalize_address(address) for address in addresses]
+            ).delete()
+            geocoding.clear_memory_cache()
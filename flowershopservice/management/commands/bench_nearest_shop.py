@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from flowershopservice import shop_index
+from flowershopservice.models import Shop
+from flowershopservice.tests.geocoder_fake import LATITUDE_RANGE, LONGITUDE_RANGE
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает поиск ближайшего магазина по сеточному индексу с перебором всех магазинов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000],
+                            help='Количество магазинов для замера')
+        parser.add_argument('--queries', type=int, default=500, help='Количество запросов на замер')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Расстояния считаются {'через NumPy' if shop_index.np is not None else 'без NumPy'}")
+        self.stdout.write(
+            f"{'магазинов':>10} {'построение, мс':>15} {'индекс, мкс':>12} {'перебор, мкс':>13}"
+        )
+        for size in options['sizes']:
+            # Магазины создаются внутри транзакции и откатываются
+            with transaction.atomic():
+                self._fill_shops(size)
+                shop_index.invalidate_index()
+                started = time.perf_counter()
+                index = shop_index.get_index()
+                build_ms = (time.perf_counter() - started) * 1000
+
+                points = [(random.uniform(*LATITUDE_RANGE), random.uniform(*LONGITUDE_RANGE))
+                          for _ in range(options['queries'])]
+                index_us, found = self._measure(lambda point: shop_index.nearest(*point, index=index)[0], points)
+                scan_us, expected = self._measure(lambda point: self._scan(index, *point), points)
+                transaction.set_rollback(True)
+
+            mismatches = sum(abs(a[1] - b[1]) > 1e-9 for a, b in zip(found, expected))
+            if mismatches:
+                raise CommandError(f'Индекс разошелся с перебором в {mismatches} запросах из {len(points)}')
+            self.stdout.write(f"{size:>10} {build_ms:>15.1f} {index_us:>12.1f} {scan_us:>13.1f}")
+        shop_index.invalidate_index()
+
+    @staticmethod
+    def _fill_shops(size):
+        Shop.objects.bulk_create(
+            [
+                Shop(
+                    title=f'Замерный магазин {number}',
+                    address=f'Замерная, {number}',
+                    phone='+73910000000',
+                    slug=f'bench-nearest-{number}',
+                    coord_x=random.uniform(*LATITUDE_RANGE),
+                    coord_y=random.uniform(*LONGITUDE_RANGE),
+                    geocode_status='done',
+                )
+                for number in range(size)
+            ],
+            batch_size=1000,
+        )
+
+    @staticmethod
+    def _scan(index, lat, lng):
+        """Перебор: расстояние до каждого магазина"""
+        distances = shop_index.haversine_many(lat, lng, index['lats'], index['lngs'])
+        position = min(range(len(distances)), key=distances.__getitem__) if shop_index.np is None \
+            else int(distances.argmin())
+        return index['shops'][position], float(distances[position])
+
+    @staticmethod
+    def _measure(func, arguments):
+        started = time.perf_counter()
+        results = [func(argument) for argument in arguments]
+        return (time.perf_counter() - started) / len(arguments) * 1e6, results
@@ -0,0 +1,86 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from flowershopservice import notifications
+from flowershopservice.models import Consultation, NotificationOutbox, Order, ShopUser
+
+# Номера объектов для замера, не пересекающиеся с настоящими заказами
+BENCH_ID_OFFSET = 10 ** 9
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает число сообщений менеджерам в минуту при отправке сразу и в режиме сводки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=240, help='Заказов и консультаций за время замера')
+        parser.add_argument('--minutes', type=int, default=2, help='Длительность пика, минуты')
+        parser.add_argument('--managers', type=int, default=3, help='Количество менеджеров')
+        parser.add_argument('--window', type=int, default=30, help='Окно сводки, секунды')
+        parser.add_argument('--express-every', type=int, default=10,
+                            help='Каждый N-й заказ срочный (0 - без срочных)')
+
+    def handle(self, *args, **options):
+        # Время моделируется: события равномерно распределяются по пику, воркер
+        # объединяет сводки каждые 2 секунды. Telegram не вызывается, считаются
+        # сообщения, которые воркер поставил бы на отправку
+        managers = [
+            ShopUser.objects.create(full_name=f'Менеджер {number}', phone=f'+7000000{number:04d}',
+                                    status='manager', telegram_id=str(900000 + number))
+            for number in range(options['managers'])
+        ]
+        last_message_id = NotificationOutbox.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        chat_ids = [manager.telegram_id for manager in managers]
+        try:
+            self.stdout.write(f"{'режим':>16} {'сообщений':>10} {'в минуту':>9} {'макс. за минуту':>16}")
+            for run, (title, window) in enumerate((('сразу', 0), (f"сводка {options['window']} с", options['window']))):
+                with override_settings(NOTIFICATION_DIGEST_WINDOW=window):
+                    sent_at = self._simulate(options, run, last_message_id)
+                sent_at = [moment for chat_id, moment in sent_at if chat_id in chat_ids]
+                per_minute = {}
+                for moment in sent_at:
+                    per_minute[moment // 60] = per_minute.get(moment // 60, 0) + 1
+                minutes = max(per_minute) + 1 if per_minute else 1
+                self.stdout.write(
+                    f"{title:>16} {len(sent_at):>10} {len(sent_at) / minutes:>9.1f} "
+                    f"{max(per_minute.values(), default=0):>16}"
+                )
+                NotificationOutbox.objects.filter(id__gt=last_message_id).delete()
+        finally:
+            NotificationOutbox.objects.filter(id__gt=last_message_id).delete()
+            for manager in managers:
+                manager.delete()
+
+    def _simulate(self, options, run, last_message_id):
+        """Возвращает пары (chat_id, секунда от начала пика) для сообщений, готовых к отправке"""
+        started = timezone.now()
+        duration = options['minutes'] * 60
+        events = options['events']
+        customer = ShopUser(full_name='Клиент', phone='+79990000000')
+        result = []
+        seen = last_message_id
+
+        for second in range(0, duration + options['window'] + 2, 2):
+            now = started + datetime.timedelta(seconds=second)
+            first = events * second // duration
+            last = min(events, events * (second + 2) // duration)
+            for number in range(first, last):
+                object_id = BENCH_ID_OFFSET + run * events + number
+                if number % 3 == 2:
+                    event = notifications.CONSULTATION_CREATED
+                    obj = Consultation(id=object_id, user=customer, creation_date=now)
+                else:
+                    express = bool(options['express_every']) and number % options['express_every'] == 0
+                    event = notifications.ORDER_CREATED
+                    obj = Order(id=object_id, user=customer, product_name='Букет', delivery_address='Адрес',
+                                is_express_delivery=express)
+                notifications.notify(event, obj)
+            NotificationOutbox.objects.filter(id__gt=seen).update(created_at=now, available_at=now)
+            notifications.flush_digests(now=now)
+
+            ready = NotificationOutbox.objects.filter(id__gt=seen, digest=False).values_list('chat_id', flat=True)
+            result.extend((chat_id, second) for chat_id in ready)
+            seen = NotificationOutbox.objects.order_by('-id').values_list('id', flat=True).first() or seen
+        return result
@@ -0,0 +1,92 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from flowershopservice import orders
+from flowershopservice.models import Product, ShopUser, Order, DeliveryTimeSlot, NotificationOutbox
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает количество запросов и время оформления заказа: прежний process_order и orders.create_order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=50, help='Количество заказов на каждый вариант')
+
+    def handle(self, *args, **options):
+        # Заказы и уведомления должны проходить коммит, поэтому данные создаются
+        # по-настоящему и удаляются в конце
+        product = Product.objects.create(
+            name='Тестовый букет', description='', composition='Розы', price=1000,
+            image='img/catalog/bench.jpg', status='archived',
+        )
+        slot = DeliveryTimeSlot.objects.create(
+            time_start=datetime.time(23, 0), time_end=datetime.time(23, 59),
+            display_name='Замер', is_available_tomorrow=False, capacity=0,
+        )
+        manager = ShopUser.objects.create(full_name='Менеджер', phone='+70000000000',
+                                          status='manager', telegram_id='1')
+        users_before = set(ShopUser.objects.values_list('id', flat=True))
+        last_message_id = NotificationOutbox.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        try:
+            # Уведомления ставятся в очередь, Telegram во время замера не вызывается
+            self.stdout.write(f"{'вариант':>14} {'запросов':>9} {'мс/заказ':>9}")
+            for title, create in (('прежний', self._legacy_create), ('create_order', orders.create_order)):
+                queries, elapsed = 0, 0.0
+                for number in range(options['orders']):
+                    order_data = self._order_data(number, slot)
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        create(order_data, product.id)
+                        elapsed += time.perf_counter() - started
+                    queries += len(captured.captured_queries)
+                count = options['orders']
+                self.stdout.write(f"{title:>14} {queries / count:>9.1f} {elapsed / count * 1000:>9.2f}")
+        finally:
+            NotificationOutbox.objects.filter(id__gt=last_message_id).delete()
+            Order.objects.filter(product=product).delete()
+            ShopUser.objects.exclude(id__in=users_before).delete()
+            manager.delete()
+            slot.delete()
+            product.delete()
+
+    @staticmethod
+    def _order_data(number, slot):
+        return {
+            'name': f'Клиент {number}',
+            'phone': f'+7999{number:07d}',
+            'address': 'ул. Тестовая, 1',
+            'delivery_date': datetime.date.today().isoformat(),
+            'is_express': False,
+            'delivery_slot_id': slot.id,
+            'delivery_time_from': slot.time_start.strftime('%H:%M:%S'),
+            'delivery_time_to': slot.time_end.strftime('%H:%M:%S'),
+        }
+
+    @staticmethod
+    def _legacy_create(order_data, bouquet_id):
+        """Повторяет прежнюю логику process_order: create, а затем второй save ради времени доставки"""
+        bouquet = Product.objects.get(id=bouquet_id)
+        user, _ = ShopUser.objects.get_or_create(
+            phone=order_data['phone'],
+            defaults={'full_name': order_data['name'], 'status': 'user', 'address': order_data['address']},
+        )
+        order = Order.objects.create(
+            user=user,
+            product=bouquet,
+            product_name=bouquet.name,
+            product_price=bouquet.price,
+            product_composition=bouquet.composition,
+            delivery_address=order_data['address'],
+            delivery_date=datetime.datetime.strptime(order_data['delivery_date'], '%Y-%m-%d').date(),
+            is_express_delivery=order_data['is_express'],
+            status='created',
+            creation_date=timezone.now(),
+        )
+        order.delivery_time_from = datetime.datetime.strptime(order_data['delivery_time_from'], '%H:%M:%S').time()
+        order.delivery_time_to = datetime.datetime.strptime(order_data['delivery_time_to'], '%H:%M:%S').time()
+        order.save()
+        return order
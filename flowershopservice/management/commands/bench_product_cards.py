@@ -0,0 +1,69 @@
+import pickle
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from flowershopservice.cards import fetch_cards
+from flowershopservice.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает память и время выборки карточек ProductCard с экземплярами Product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=10000, help='Количество букетов')
+        parser.add_argument('--repeat', type=int, default=5, help='Количество повторов замера времени')
+
+    def handle(self, *args, **options):
+        size = options['size']
+        repeat = options['repeat']
+
+        # Все тестовые данные создаются внутри транзакции и откатываются
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        name=f'Букет {i}',
+                        description='Нежный букет из роз и эвкалипта ' * 5,
+                        composition='Роза, эвкалипт, упаковка',
+                        price=1000 + i % 5000,
+                        image='img/catalog/bench.jpg',
+                        status='active',
+                    )
+                    for i in range(size)
+                ],
+                batch_size=1000,
+            )
+            queryset = Product.objects.filter(status='active')
+
+            self.stdout.write(f"{'путь':<10} {'время, мс':>10} {'пик памяти, КБ':>16} {'pickle, КБ':>12}")
+            for title, func in (('Product', lambda: self._model_path(queryset.all())),
+                                ('Card', lambda: fetch_cards(queryset))):
+                elapsed_ms = self._measure(func, repeat)
+
+                tracemalloc.start()
+                items = func()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                pickled = len(pickle.dumps(items))
+                self.stdout.write(f"{title:<10} {elapsed_ms:>10.1f} {peak / 1024:>16.0f} {pickled / 1024:>12.0f}")
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _model_path(queryset):
+        """Прежний путь: полные экземпляры модели и image_url, добавленный в цикле"""
+        bouquets = list(queryset)
+        for bouquet in bouquets:
+            bouquet.image_url = bouquet.image.url
+        return bouquets
+
+    @staticmethod
+    def _measure(func, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) / repeat * 1000
@@ -0,0 +1,84 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from flowershopservice import quiz_index
+from flowershopservice.models import Product, Category, PriceRange
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает выбор букета в квизе через индекс с ORDER BY RANDOM()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000, 50000],
+                            help='Размеры каталога для замера')
+        parser.add_argument('--repeat', type=int, default=50, help='Количество выборов на замер')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+
+        self.stdout.write(f"{'букетов':>10} {'индекс, мс':>12} {'ORDER BY RANDOM(), мс':>22}")
+        for size in options['sizes']:
+            # Все тестовые данные создаются внутри транзакции и откатываются
+            with transaction.atomic():
+                categories, price_ranges = self._fill_catalog(size)
+                quiz_index.invalidate_index()
+                quiz_index.get_index()
+
+                pairs = [(random.choice(categories), random.choice(price_ranges)) for _ in range(repeat)]
+                index_ms = self._measure(
+                    lambda pair: quiz_index.pick_random_product(pair[0].id, pair[1].id), pairs)
+                legacy_ms = self._measure(
+                    lambda pair: self._legacy_pick(*pair), pairs)
+
+                self.stdout.write(f"{size:>10} {index_ms:>12.3f} {legacy_ms:>22.3f}")
+                transaction.set_rollback(True)
+
+        quiz_index.invalidate_index()
+
+    def _fill_catalog(self, size):
+        categories = Category.objects.bulk_create([Category(name=f'Повод {i}') for i in range(5)])
+        price_ranges = PriceRange.objects.bulk_create([
+            PriceRange(min_price=0, max_price=1000),
+            PriceRange(min_price=1001, max_price=3000),
+            PriceRange(min_price=3001, max_price=5000),
+        ])
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=f'Букет {i}',
+                    description='Тестовый букет',
+                    composition='Розы',
+                    price=random.randint(500, 5000),
+                    image='img/catalog/bench.jpg',
+                    status='active',
+                )
+                for i in range(size)
+            ],
+            batch_size=1000,
+        )
+        through = Product.categories.through
+        through.objects.bulk_create(
+            [through(product_id=product.id, category_id=random.choice(categories).id) for product in products],
+            batch_size=1000,
+        )
+        PriceRange.rebuild_memberships()
+        return categories, price_ranges
+
+    @staticmethod
+    def _legacy_pick(category, price_range):
+        """Повторяет прежнюю логику result_filtered"""
+        bouquets = Product.objects.filter(categories=category, status='active')
+        bouquets = bouquets.filter(price__gte=price_range.min_price, price__lte=price_range.max_price)
+        if not bouquets.exists():
+            bouquets = Product.objects.filter(status='active')
+        return bouquets.order_by('?').first()
+
+    @staticmethod
+    def _measure(func, arguments):
+        started = time.perf_counter()
+        for argument in arguments:
+            func(argument)
+        return (time.perf_counter() - started) / len(arguments) * 1000
@@ -0,0 +1,86 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from flowershopservice import geocoding
+from flowershopservice.models import Shop
+from flowershopservice.shop_import import import_shops
+from flowershopservice.tests.geocoder_fake import FakeGeocoder
+
+IMAGES = 5
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает загрузку магазинов по одному и пакетный импорт на имитаторе геокодера'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=1000, help='Количество магазинов')
+        parser.add_argument('--latency', type=float, default=0.02, help='Задержка ответа геокодера, секунды')
+        parser.add_argument('--workers', type=int, default=geocoding.LOOKUP_WORKERS,
+                            help='Параллельных запросов к геокодеру')
+        parser.add_argument('--rate', type=int, default=200, help='Запросов к геокодеру в секунду')
+
+    def handle(self, *args, **options):
+        shops_data = [
+            {'fields': {
+                'title': f'Замерный магазин {number}',
+                'address': f'г. Красноярск, ул. Импортная, д. {number}',
+                'phone': f'+7391{number:07d}',
+                'slug': f'bench-import-{number}',
+            }}
+            for number in range(options['shops'])
+        ]
+        # Все изменения откатываются, изображения копируются во временную папку
+        with tempfile.TemporaryDirectory() as folder:
+            source = os.path.join(folder, 'source')
+            os.makedirs(source)
+            for number in range(IMAGES):
+                with open(os.path.join(source, f'shop{number}.jpg'), 'wb') as f:
+                    f.write(os.urandom(64 * 1024))
+
+            self.stdout.write(f"{'режим':>12} {'секунд':>8} {'запросов':>9} {'с координатами':>15}")
+            with FakeGeocoder(latency=options['latency']) as geocoder:
+                for title, run in (('по одному', self._one_by_one), ('пакетный', self._batch)):
+                    media = os.path.join(folder, title)
+                    geocoding.clear_memory_cache()
+                    geocoder.requests.clear()
+                    with override_settings(YANDEX_GEOCODER_URL=geocoder.url, MEDIA_ROOT=media):
+                        with transaction.atomic():
+                            started = time.perf_counter()
+                            run(shops_data, source, options)
+                            elapsed = time.perf_counter() - started
+                            geocoded = Shop.objects.filter(slug__startswith='bench-import-',
+                                                           geocode_status='done').count()
+                            transaction.set_rollback(True)
+                    self.stdout.write(f"{title:>12} {elapsed:>8.2f} {len(geocoder.requests):>9} {geocoded:>15}")
+            geocoding.clear_memory_cache()
+
+    @staticmethod
+    def _one_by_one(shops_data, source, options):
+        """Прежний порядок: update_or_create и копирование на каждый магазин, затем воркер геокодирования"""
+        image_files = os.listdir(source)
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'shops'), exist_ok=True)
+        for shop_data in shops_data:
+            fields = shop_data['fields']
+            image_file = random.choice(image_files)
+            dest_path = os.path.join('shops', image_file)
+            if not os.path.exists(os.path.join(settings.MEDIA_ROOT, dest_path)):
+                shutil.copy(os.path.join(source, image_file), os.path.join(settings.MEDIA_ROOT, dest_path))
+            Shop.objects.update_or_create(
+                title=fields['title'],
+                defaults={'address': fields['address'], 'phone': fields['phone'],
+                          'image': dest_path, 'slug': fields['slug']},
+            )
+        while geocoding.process_pending_shops()[0]:
+            pass
+
+    @staticmethod
+    def _batch(shops_data, source, options):
+        import_shops(shops_data, source, workers=options['workers'], rate=options['rate'])
@@ -0,0 +1,53 @@
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from flowershopservice.telegram_service import TelegramNotifier
+from flowershopservice.tests.telegram_fake import FakeBotAPI
+
+BENCH_TOKEN = 'bench-token'
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость рассылки в Telegram на локальном имитаторе Bot API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', nargs='+', type=int, default=[1, 10, 100],
+                            help='Количество получателей')
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='Задержка ответа имитатора, секунды')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'получателей':>12} {'вариант':>14} {'секунд':>8} {'сообщ./с':>9} {'доставлено':>11} {'ответов 429':>12}"
+        )
+        for count in options['recipients']:
+            recipients = [str(100000 + number) for number in range(count)]
+            for title, send in (('поочередно', self._legacy_send), ('send_many', self._engine_send)):
+                with FakeBotAPI(latency=options['latency']) as api:
+                    with override_settings(TELEGRAM_API_URL=api.url, TELEGRAM_BOT_TOKEN=BENCH_TOKEN):
+                        started = time.perf_counter()
+                        send(api.url, recipients)
+                        elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{count:>12} {title:>14} {elapsed:>8.2f} {count / elapsed:>9.1f} "
+                        f"{len(api.received):>11} {api.rate_limited:>12}"
+                    )
+                # Ограничитель скорости общий для процесса: даем ему восстановиться
+                time.sleep(1.5)
+
+    @staticmethod
+    def _legacy_send(url, recipients):
+        """Прежняя рассылка: по одному requests.post с новым соединением на каждого получателя"""
+        for chat_id in recipients:
+            requests.post(
+                f"{url}/bot{BENCH_TOKEN}/sendMessage",
+                json={'chat_id': chat_id, 'text': 'Новый заказ', 'parse_mode': 'HTML'},
+                timeout=10,
+            )
+
+    @staticmethod
+    def _engine_send(url, recipients):
+        TelegramNotifier.send_many((chat_id, 'Новый заказ') for chat_id in recipients)
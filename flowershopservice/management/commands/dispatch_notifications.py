@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from flowershopservice import notifications, outbox
+
+
+class Command(BaseCommand):
+    help = 'Отправляет уведомления из очереди NotificationOutbox в Telegram'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Разобрать очередь один раз и выйти')
+        parser.add_argument('--batch-size', type=int, default=50, help='Сообщений в одной пачке')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Пауза между проверками пустой очереди, секунды')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.stdout.write('Воркер уведомлений запущен')
+        try:
+            while True:
+                close_old_connections()
+                notifications.flush_digests()
+                sent, failed = outbox.dispatch_batch(batch_size)
+                if sent or failed:
+                    self.stdout.write(f'Отправлено: {sent}, ошибок: {failed}')
+                    # Пачка была полной - сразу берем следующую
+                    if sent + failed >= batch_size:
+                        continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Воркер уведомлений остановлен')
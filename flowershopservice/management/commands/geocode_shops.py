@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from flowershopservice import geocoding
+
+
+class Command(BaseCommand):
+    help = 'Определяет координаты магазинов, адрес которых изменился, и адресов доставки новых заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Обработать очередь один раз и выйти')
+        parser.add_argument('--batch-size', type=int, default=20, help='Магазинов и заказов за один проход')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Пауза между проверками пустой очереди, секунды')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.stdout.write('Воркер геокодирования запущен')
+        try:
+            while True:
+                close_old_connections()
+                full = False
+                for title, process in (('Магазинов', geocoding.process_pending_shops),
+                                       ('Заказов', geocoding.process_pending_orders)):
+                    resolved, postponed = process(batch_size)
+                    if resolved or postponed:
+                        self.stdout.write(f'{title} обработано: {resolved}, отложено до повтора: {postponed}')
+                    full = full or resolved + postponed >= batch_size
+                # Проход был полным - сразу берем следующий
+                if full:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Воркер геокодирования остановлен')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from flowershopservice import catalog_version
+from flowershopservice.models import Product, PriceRange
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает принадлежность всех букетов ценовым диапазонам'
+
+    def handle(self, *args, **options):
+        PriceRange.rebuild_memberships()
+        # Таблица пересчитывается SQL-запросом без сигналов, а по ней строятся
+        # индекс квиза и фасеты каталога: меняем общую версию каталога, чтобы
+        # их перестроили все процессы сайта, а не только эта команда
+        catalog_version.bump()
+
+        total = Product.price_ranges.through.objects.count()
+        self.stdout.write(self.style.SUCCESS(f"Таблица ценовых диапазонов пересчитана: {total} связей"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from flowershopservice import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс букетов (FTS5)'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Полнотекстовый индекс FTS5 доступен только на SQLite')
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
@@ -1,13 +1,59 @@
 from django.core.cache import cache
 from django.db import models
 
-class ShopManager(models.Manager):
+from . import versions
+
+
+class CatalogQuerySet(models.QuerySet):
+    """
+    QuerySet моделей каталога, который обновляет версию каталога при массовых
+    изменениях: update/delete/bulk_create/bulk_update не вызывают сигналы save.
+    """
+    # Версии (см. versions), которые меняются вместе с данными модели
+    version_names = (versions.CATALOG,)
+
+    def _bump_versions(self):
+        for name in self.version_names:
+            versions.bump(name)
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            self._bump_versions()
+        return rows
+
+    def delete(self):
+        result = super().delete()
+        self._bump_versions()
+        return result
+
+    def bulk_create(self, *args, **kwargs):
+        objs = super().bulk_create(*args, **kwargs)
+        self._bump_versions()
+        return objs
+
+    def bulk_update(self, *args, **kwargs):
+        rows = super().bulk_update(*args, **kwargs)
+        self._bump_versions()
+        return rows
+
+
+class ShopQuerySet(CatalogQuerySet):
+    # Магазины входят в каталог, но у них есть и своя версия: от нее зависят
+    # список и индекс магазинов, которым не важны изменения букетов
+    version_names = (versions.CATALOG, versions.SHOPS)
+
+
+class ShopManager(models.Manager.from_queryset(ShopQuerySet)):
     def get_active_shops(self):
-        cache_key = 'active_shops'
+        # Ключ включает общую версию магазинов: изменение магазинов в любом
+        # процессе (админка, воркер геокодирования, импорт) меняет версию,
+        # и устаревший список больше не читается
+        cache_key = f'active_shops:{versions.get(versions.SHOPS)}'
         shops = cache.get(cache_key)
         
         if not shops:
             shops = list(self.filter(is_active=True).order_by('order'))
             cache.set(cache_key, shops, 60*60*24)  # Кэш на 24 часа
         
-        return shops
\ No newline at end of file
+        return shops
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:45
+
+from django.db import migrations, models
+
+
+def fill_price_range_memberships(apps, schema_editor):
+    Product = apps.get_model('flowershopservice', 'Product')
+    PriceRange = apps.get_model('flowershopservice', 'PriceRange')
+    through = Product.price_ranges.through
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {through._meta.db_table} (product_id, pricerange_id) "
+            f"SELECT p.id, r.id FROM {Product._meta.db_table} p, {PriceRange._meta.db_table} r "
+            f"WHERE (r.min_price IS NULL OR r.min_price = 0 OR p.price >= r.min_price) "
+            f"AND (r.max_price IS NULL OR r.max_price = 0 OR p.price <= r.max_price)"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0009_product_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='price_ranges',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='products', to='flowershopservice.pricerange', verbose_name='Ценовые диапазоны'),
+        ),
+        migrations.RunPython(fill_price_range_memberships, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:10
+
+from django.db import migrations
+
+FTS_TABLE = 'flowershopservice_product_fts'
+
+
+def create_search_index(apps, schema_editor):
+    # Полнотекстовый индекс FTS5 есть только в SQLite
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Product = apps.get_model('flowershopservice', 'Product')
+    Category = apps.get_model('flowershopservice', 'Category')
+    through = Product.categories.through
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"name, description, composition, categories, "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, composition, categories) "
+            f"SELECT p.id, p.name, p.description, p.composition, "
+            f"COALESCE((SELECT group_concat(c.name, ' ') FROM {through._meta.db_table} pc "
+            f"JOIN {Category._meta.db_table} c ON c.id = pc.category_id WHERE pc.product_id = p.id), '') "
+            f"FROM {Product._meta.db_table} p"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0010_product_price_ranges'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0011_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliverytimeslot',
+            name='capacity',
+            field=models.PositiveIntegerField(default=0, help_text='Сколько заказов можно принять в слот на одну дату. 0 - без ограничений', verbose_name='Максимум заказов в слоте'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delivery_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='flowershopservice.deliverytimeslot', verbose_name='Слот доставки'),
+        ),
+        migrations.CreateModel(
+            name='SlotBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delivery_date', models.DateField(verbose_name='Дата доставки')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Количество заказов')),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='flowershopservice.deliverytimeslot', verbose_name='Слот доставки')),
+            ],
+            options={
+                'verbose_name': 'Загрузка слота',
+                'verbose_name_plural': 'Загрузка слотов',
+                'unique_together': {('slot', 'delivery_date')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:02
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0013_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shopuser',
+            name='telegram_id',
+            field=models.CharField(blank=True, max_length=50, null=True, validators=[django.core.validators.RegexValidator('^-?\\d+$', 'Telegram ID должен быть числом')], verbose_name='Telegram ID'),
+        ),
+    ]
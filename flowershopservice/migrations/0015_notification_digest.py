@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0014_telegram_id_validator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='digest',
+            field=models.BooleanField(default=False, verbose_name='Для сводки'),
+        ),
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='recipient_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Имя получателя'),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'В очереди'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('merged', 'Объединено в сводку'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус'),
+        ),
+    ]
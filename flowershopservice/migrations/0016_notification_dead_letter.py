@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def move_failed_to_dead_letters(apps, schema_editor):
+    # Сообщения со статусом "Ошибка" теперь хранятся в отдельной таблице
+    NotificationOutbox = apps.get_model('flowershopservice', 'NotificationOutbox')
+    NotificationDeadLetter = apps.get_model('flowershopservice', 'NotificationDeadLetter')
+    failed = NotificationOutbox.objects.filter(status='failed')
+    NotificationDeadLetter.objects.bulk_create([
+        NotificationDeadLetter(
+            chat_id=message.chat_id, recipient_name=message.recipient_name, text=message.text,
+            attempts=message.attempts, error=message.last_error, created_at=message.created_at,
+        )
+        for message in failed
+    ])
+    failed.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0015_notification_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.CharField(max_length=50, verbose_name='Telegram ID получателя')),
+                ('recipient_name', models.CharField(blank=True, max_length=255, verbose_name='Имя получателя')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(verbose_name='Создано')),
+                ('failed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Отклонено')),
+            ],
+            options={
+                'verbose_name': 'Неотправленное уведомление',
+                'verbose_name_plural': 'Неотправленные уведомления',
+            },
+        ),
+        migrations.AddField(
+            model_name='shopuser',
+            name='telegram_blocked',
+            field=models.BooleanField(default=False, verbose_name='Бот заблокирован'),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'В очереди'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('merged', 'Объединено в сводку')], default='pending', max_length=10, verbose_name='Статус'),
+        ),
+        migrations.RunPython(move_failed_to_dead_letters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0016_notification_dead_letter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=300, unique=True, verbose_name='Нормализованный адрес')),
+                ('latitude', models.FloatField(blank=True, null=True, verbose_name='Широта')),
+                ('longitude', models.FloatField(blank=True, null=True, verbose_name='Долгота')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Получено')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Действует до')),
+            ],
+            options={
+                'verbose_name': 'Координаты адреса',
+                'verbose_name_plural': 'Кэш геокодера',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def set_geocode_status(apps, schema_editor):
+    # Магазины с координатами уже геокодированы, остальные ждут воркера
+    Shop = apps.get_model('flowershopservice', 'Shop')
+    Shop.objects.filter(coord_x__isnull=False, coord_y__isnull=False).update(geocode_status='done')
+    Shop.objects.exclude(geocode_status='done').update(geocode_retry_at=django.utils.timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0017_geocode_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='geocode_attempts',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Попыток геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='geocode_error',
+            field=models.TextField(blank=True, editable=False, verbose_name='Ошибка геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='geocode_retry_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Повторить геокодирование'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='geocode_status',
+            field=models.CharField(choices=[('pending', 'Определяются'), ('done', 'Определены'), ('not_found', 'Адрес не найден'), ('failed', 'Ошибка геокодера')], default='pending', editable=False, max_length=10, verbose_name='Координаты'),
+        ),
+        migrations.RunPython(set_geocode_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0018_shop_geocode_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='coord_x',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Координата X (широта)'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='coord_y',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Координата Y (долгота)'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='distance_km',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Расстояние, км'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='eta_minutes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Время в пути, мин'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='geocode_attempts',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Попыток геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='geocode_error',
+            field=models.TextField(blank=True, editable=False, verbose_name='Ошибка геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='geocode_retry_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Повторить геокодирование'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='geocode_status',
+            field=models.CharField(choices=[('pending', 'Определяются'), ('done', 'Определены'), ('not_found', 'Адрес не найден'), ('failed', 'Ошибка геокодера')], default='pending', editable=False, max_length=10, verbose_name='Адрес на карте'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='nearest_shop',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='nearby_orders', to='flowershopservice.shop', verbose_name='Ближайший магазин'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['geocode_status', 'geocode_retry_at'], name='order_geocode_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['distance_km'], name='order_distance_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0021_outbox_dedupe_key'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='CatalogVersion',
+            new_name='DataVersion',
+        ),
+        migrations.AlterModelOptions(
+            name='dataversion',
+            options={'verbose_name': 'Версия данных', 'verbose_name_plural': 'Версии данных'},
+        ),
+        # Единственная существующая строка - версия каталога
+        migrations.AddField(
+            model_name='dataversion',
+            name='name',
+            field=models.CharField(default='catalog', max_length=50, unique=True, verbose_name='Данные'),
+            preserve_default=False,
+        ),
+    ]
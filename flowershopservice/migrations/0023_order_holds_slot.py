@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:10
+
+from django.db import migrations, models
+
+
+def mark_counted_orders(apps, schema_editor):
+    # Существующие счетчики SlotBooking считались по всем неотмененным
+    # заказам со слотом, поэтому такие заказы считаются занимающими место
+    Order = apps.get_model('flowershopservice', 'Order')
+    Order.objects.exclude(status='cancelled').filter(
+        delivery_slot__isnull=False, delivery_date__isnull=False,
+    ).update(holds_slot=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0022_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='holds_slot',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Занимает место в слоте'),
+        ),
+        migrations.RunPython(mark_counted_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flowershopservice', '0024_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsedWizardToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nonce', models.CharField(max_length=32, unique=True, verbose_name='Номер токена')),
+                ('used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Использован')),
+            ],
+            options={
+                'verbose_name': 'Использованный токен мастера заказа',
+                'verbose_name_plural': 'Использованные токены мастера заказа',
+            },
+        ),
+    ]
@@ -1,15 +1,28 @@
-from django.db import models
+from django.db import models, connection, transaction
 from phone_field import PhoneField
 import datetime
 from django.utils.html import mark_safe
 from django.utils import timezone
 import random
 from django.core.cache import cache
-from .managers import ShopManager
+from .managers import ShopManager, CatalogQuerySet
+from .cards import ProductCard, LIST_FIELDS
 from django.utils.text import slugify
-from .utils import get_coordinates_by_address
+from django.core.validators import RegexValidator
 from django.conf import settings
 import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Пул кандидатов для блока рекомендуемых товаров на главной
+FEATURED_CACHE_KEY = 'featured_products'
+FEATURED_LOCK_KEY = 'featured_products:lock'
+FEATURED_LOCK_TIMEOUT = 30
+FEATURED_POOL_SIZE = 30
+FEATURED_WAIT_STEPS = 20
+FEATURED_WAIT_INTERVAL = 0.05
 
 
 class ShopUser(models.Model):
@@ -23,8 +36,12 @@ class ShopUser(models.Model):
         'Telegram ID',
         max_length=50,
         blank=True,  # Разрешаем пустое значение в форме
-        null=True    # Разрешаем NULL в базе данных
+        null=True,   # Разрешаем NULL в базе данных
+        validators=[RegexValidator(r'^-?\d+$', 'Telegram ID должен быть числом')]
     )
+    # Выставляется автоматически, когда пользователь заблокировал бота;
+    # такому пользователю уведомления не отправляются
+    telegram_blocked = models.BooleanField('Бот заблокирован', default=False)
     STATUS_CHOICES = [
         ('owner', 'Владелец сервиса'),
         ('user', 'Пользователь'),
@@ -48,6 +65,8 @@ class Category(models.Model):
     """
     name = models.CharField(max_length=50, verbose_name='Название категории')
 
+    objects = CatalogQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -66,6 +85,8 @@ class PriceRange(models.Model):
     max_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True,
                                     verbose_name='Максимальная цена')
 
+    objects = CatalogQuerySet.as_manager()
+
     def __str__(self):
         if self.min_price and self.max_price:
             return f"{self.min_price} - {self.max_price} руб"
@@ -81,14 +102,59 @@ class PriceRange(models.Model):
         verbose_name_plural = "Ценовые диапазоны"
 
     def get_products(self):
-        if self.min_price and self.max_price:
-            return Product.objects.filter(price__gte=self.min_price, price__lte=self.max_price)
-        elif self.min_price:
-            return Product.objects.filter(price__gte=self.min_price)
-        elif self.max_price:
-            return Product.objects.filter(price__lte=self.max_price)
-        else:
-            return Product.objects.all()
+        # Принадлежность букетов диапазону хранится в таблице Product.price_ranges
+        return self.products.all()
+
+    @staticmethod
+    def rebuild_memberships(price_range_ids=None, product_ids=None):
+        """
+        Пересчитывает таблицу принадлежности букетов ценовым диапазонам.
+
+        Пересчет выполняется одним INSERT ... SELECT на стороне базы данных,
+        без загрузки букетов в Python. Пустая или нулевая граница диапазона
+        не ограничивает цену (как в __str__).
+
+        Args:
+            price_range_ids: Пересчитать только эти диапазоны (None - все)
+            product_ids: Пересчитать только эти букеты (None - все)
+        """
+        through = Product.price_ranges.through
+        membership_table = through._meta.db_table
+        product_table = Product._meta.db_table
+        price_range_table = PriceRange._meta.db_table
+
+        conditions = []
+        params = []
+        if price_range_ids is not None:
+            price_range_ids = list(price_range_ids)
+            conditions.append(f"r.id IN ({', '.join(['%s'] * len(price_range_ids))})")
+            params.extend(price_range_ids)
+        if product_ids is not None:
+            product_ids = list(product_ids)
+            conditions.append(f"p.id IN ({', '.join(['%s'] * len(product_ids))})")
+            params.extend(product_ids)
+        if (price_range_ids is not None and not price_range_ids) or (product_ids is not None and not product_ids):
+            return
+
+        where = ''.join(f' AND {condition}' for condition in conditions)
+
+        with transaction.atomic():
+            delete_qs = through.objects.all()
+            if price_range_ids is not None:
+                delete_qs = delete_qs.filter(pricerange_id__in=price_range_ids)
+            if product_ids is not None:
+                delete_qs = delete_qs.filter(product_id__in=product_ids)
+            delete_qs.delete()
+
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {membership_table} (product_id, pricerange_id) "
+                    f"SELECT p.id, r.id FROM {product_table} p, {price_range_table} r "
+                    f"WHERE (r.min_price IS NULL OR r.min_price = 0 OR p.price >= r.min_price) "
+                    f"AND (r.max_price IS NULL OR r.max_price = 0 OR p.price <= r.max_price)"
+                    f"{where}",
+                    params,
+                )
 
 
 class Product(models.Model):
@@ -101,6 +167,9 @@ class Product(models.Model):
     composition = models.TextField(verbose_name='Состав букета')
     price = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='Цена')
     categories = models.ManyToManyField(Category, verbose_name='Категории')
+    # Материализованная принадлежность ценовым диапазонам, пересчитывается сигналами
+    price_ranges = models.ManyToManyField(PriceRange, blank=True, editable=False,
+                                          related_name='products', verbose_name='Ценовые диапазоны')
     image = models.ImageField(upload_to='img/catalog/', verbose_name='Изображение')
     STATUS_CHOICES = [
         ('active', 'Актуальный'),
@@ -110,6 +179,8 @@ class Product(models.Model):
     is_featured = models.BooleanField(default=False, verbose_name='Показывать на главной')
     is_bestseller = models.BooleanField(default=False, verbose_name='Хит продаж')
 
+    objects = CatalogQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -121,45 +192,89 @@ class Product(models.Model):
     admin_image_preview.short_description = 'Превью'
 
     @classmethod
-    def get_featured_products(cls):
-        """Получение рекомендуемых товаров с кэшированием"""
-        # Ключ для кэширования
-        cache_key = 'featured_products'
-        
-        # Пробуем получить данные из кэша
-        featured_products = cache.get(cache_key)
-        
-        if featured_products is None:
-            # Получаем все активные товары с предзагрузкой изображений
-            featured = cls.objects.filter(status='active', is_featured=True).select_related()
-            non_featured = cls.objects.filter(status='active', is_featured=False).select_related()
-            
-            featured_count = featured.count()
-            
-            if featured_count >= 3:
-                # Если отмеченных товаров больше 3, берем случайные 3
-                featured_products = random.sample(list(featured), 3)
-            else:
-                # Если отмеченных товаров меньше 3, добавляем случайные неотмеченные
-                featured_products = list(featured)
-                needed_count = 3 - featured_count
-                if needed_count > 0 and non_featured.exists():
-                    random_products = random.sample(list(non_featured), min(needed_count, non_featured.count()))
-                    featured_products.extend(random_products)
-            
-            # Кэшируем результат на 1 час
-            cache.set(cache_key, featured_products, 60 * 60)
-        
-        return featured_products
+    def get_featured_products(cls, count=3):
+        """
+        Получение рекомендуемых товаров для главной страницы.
+
+        В кэше хранится компактный пул карточек-кандидатов, а случайная
+        выборка делается на каждый запрос, поэтому посетители видят разные букеты.
+        """
+        pool = cls._get_featured_pool()
+        featured = pool['featured']
+
+        if len(featured) >= count:
+            # Если отмеченных товаров достаточно, берем случайные из них
+            return random.sample(featured, count)
+
+        # Если отмеченных товаров не хватает, добавляем случайные неотмеченные
+        others = pool['others']
+        return featured + random.sample(others, min(count - len(featured), len(others)))
+
+    @classmethod
+    def _get_featured_pool(cls):
+        """Пул кандидатов из кэша; пересчитывает его только один воркер"""
+        pool = cache.get(FEATURED_CACHE_KEY)
+        if pool is not None:
+            return pool
+
+        if cache.add(FEATURED_LOCK_KEY, True, FEATURED_LOCK_TIMEOUT):
+            try:
+                pool = cls._build_featured_pool()
+                # Кэшируем пул на 1 час
+                cache.set(FEATURED_CACHE_KEY, pool, 60 * 60)
+            finally:
+                cache.delete(FEATURED_LOCK_KEY)
+            return pool
+
+        # Пул уже пересчитывает другой воркер - ждем его результат
+        for _ in range(FEATURED_WAIT_STEPS):
+            time.sleep(FEATURED_WAIT_INTERVAL)
+            pool = cache.get(FEATURED_CACHE_KEY)
+            if pool is not None:
+                return pool
+
+        logger.warning("Не дождались пересчета пула рекомендуемых товаров, считаем без кэша")
+        return cls._build_featured_pool()
+
+    @classmethod
+    def _build_featured_pool(cls):
+        """
+        Собирает пул ProductCard: все отмеченные товары и случайная выборка остальных.
+
+        Выполняет два запроса: легкий список ID и выборку нужных полей для пула.
+        """
+        candidates = cls.objects.filter(status='active').values_list('id', 'is_featured')
+        featured_ids = []
+        other_ids = []
+        for product_id, is_featured in candidates:
+            (featured_ids if is_featured else other_ids).append(product_id)
+
+        featured_ids = random.sample(featured_ids, min(FEATURED_POOL_SIZE, len(featured_ids)))
+        other_ids = random.sample(other_ids, min(FEATURED_POOL_SIZE, len(other_ids)))
+
+        pool = {'featured': [], 'others': []}
+        rows = cls.objects.filter(id__in=featured_ids + other_ids).values(*LIST_FIELDS, 'is_featured')
+        for row in rows:
+            pool['featured' if row['is_featured'] else 'others'].append(ProductCard.from_row(row))
+        return pool
 
     def save(self, *args, **kwargs):
         """Переопределяем метод save для инвалидации кэша при изменении товара"""
-        cache.delete('featured_products')
+        cache.delete(FEATURED_CACHE_KEY)
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        cache.delete(FEATURED_CACHE_KEY)
+        return super().delete(*args, **kwargs)
+
     class Meta:
         verbose_name = "Букет"
         verbose_name_plural = "Букеты"
+        # Индексы под keyset-пагинацию каталога по (поле сортировки, id)
+        indexes = [
+            models.Index(fields=['status', 'id'], name='product_status_id_idx'),
+            models.Index(fields=['status', 'price', 'id'], name='product_status_price_id_idx'),
+        ]
 
 
 class DeliveryTimeSlot(models.Model):
@@ -171,6 +286,8 @@ class DeliveryTimeSlot(models.Model):
     display_name = models.CharField(max_length=100, blank=True, verbose_name='Название слота на сайте')
     is_available_tomorrow = models.BooleanField(default=True, verbose_name='Доступен для доставки на завтра')
     is_express = models.BooleanField(default=False, verbose_name='"Как можно скорее"')
+    capacity = models.PositiveIntegerField(default=0, verbose_name='Максимум заказов в слоте',
+                                           help_text='Сколько заказов можно принять в слот на одну дату. 0 - без ограничений')
     
     class Meta:
         verbose_name = "Слот доставки"
@@ -195,6 +312,33 @@ class DeliveryTimeSlot(models.Model):
         return now < self.time_end
 
 
+class SlotBooking(models.Model):
+    """
+    Счетчик принятых заказов в слоте доставки на конкретную дату
+    """
+    slot = models.ForeignKey(DeliveryTimeSlot, on_delete=models.CASCADE,
+                             related_name='bookings', verbose_name='Слот доставки')
+    delivery_date = models.DateField(verbose_name='Дата доставки')
+    orders_count = models.PositiveIntegerField(default=0, verbose_name='Количество заказов')
+
+    class Meta:
+        verbose_name = "Загрузка слота"
+        verbose_name_plural = "Загрузка слотов"
+        unique_together = ['slot', 'delivery_date']
+
+    def __str__(self):
+        return f"{self.slot} на {self.delivery_date}: {self.orders_count}"
+
+
+# Состояние геокодирования адреса магазина или заказа
+GEOCODE_STATUS_CHOICES = [
+    ('pending', 'Определяются'),
+    ('done', 'Определены'),
+    ('not_found', 'Адрес не найден'),
+    ('failed', 'Ошибка геокодера'),
+]
+
+
 class Order(models.Model):
     """
     Модель заказа.
@@ -222,6 +366,8 @@ class Order(models.Model):
     )
     delivery_time_from = models.TimeField(verbose_name='Доставка с', null=True, blank=True)
     delivery_time_to = models.TimeField(verbose_name='Доставка до', null=True, blank=True)
+    delivery_slot = models.ForeignKey(DeliveryTimeSlot, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='orders', verbose_name='Слот доставки')
     actual_delivery_time = models.DateTimeField(verbose_name='Фактическое время доставки', null=True, blank=True)
     
     creation_date = models.DateTimeField(
@@ -241,6 +387,81 @@ class Order(models.Model):
     delivery_person = models.ForeignKey(ShopUser, on_delete=models.CASCADE,
                                         related_name='delivery_orders', null=True, blank=True, verbose_name='Доставщик')
     delivery_comments = models.TextField(null=True, blank=True, verbose_name='Комментарии к доставке')
+    # Заказ учтен в счетчике загрузки слота (SlotBooking): место занимает
+    # оформление заказа на сайте и перенос или восстановление заказа менеджером.
+    # Освобождается место только у таких заказов
+    holds_slot = models.BooleanField('Занимает место в слоте', default=False, editable=False)
+
+    # Координаты адреса доставки, ближайший магазин и расстояние до него
+    # определяет воркер geocode_shops после создания заказа
+    coord_x = models.FloatField('Координата X (широта)', null=True, blank=True, editable=False)
+    coord_y = models.FloatField('Координата Y (долгота)', null=True, blank=True, editable=False)
+    nearest_shop = models.ForeignKey('Shop', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                     related_name='nearby_orders', verbose_name='Ближайший магазин')
+    distance_km = models.FloatField('Расстояние, км', null=True, blank=True, editable=False)
+    eta_minutes = models.PositiveIntegerField('Время в пути, мин', null=True, blank=True, editable=False)
+    geocode_status = models.CharField('Адрес на карте', max_length=10, choices=GEOCODE_STATUS_CHOICES,
+                                      default='pending', editable=False)
+    geocode_attempts = models.PositiveIntegerField('Попыток геокодирования', default=0, editable=False)
+    geocode_retry_at = models.DateTimeField('Повторить геокодирование', null=True, blank=True, editable=False)
+    geocode_error = models.TextField('Ошибка геокодирования', blank=True, editable=False)
+
+    # Поля, которые сбрасываются при изменении адреса доставки
+    GEOCODE_FIELDS = ['coord_x', 'coord_y', 'nearest_shop', 'distance_km', 'eta_minutes',
+                      'geocode_status', 'geocode_attempts', 'geocode_retry_at', 'geocode_error']
+    # Поля, от которых зависит место в слоте (см. signals.update_slot_booking)
+    SLOT_FIELDS = {'status', 'delivery_slot', 'delivery_slot_id', 'delivery_date'}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Снимок значений на момент загрузки: по нему сигналы определяют смену
+        # статуса, доставщика и слота без повторного запроса к базе
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Новый адрес доставки геокодируется заново
+        loaded = getattr(self, '_loaded_values', {})
+        if self.pk and loaded.get('delivery_address', self.delivery_address) != self.delivery_address:
+            self.coord_x = self.coord_y = self.nearest_shop = self.distance_km = self.eta_minutes = None
+            self.geocode_status = 'pending'
+            self.geocode_attempts = 0
+            self.geocode_retry_at = None
+            self.geocode_error = ''
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], *self.GEOCODE_FIELDS}
+        # Сигнал pre_save меняет holds_slot вместе с местом в слоте
+        if kwargs.get('update_fields') is not None and self.SLOT_FIELDS & set(kwargs['update_fields']):
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'holds_slot'}
+
+        super().save(*args, **kwargs)
+        # После сохранения снимок соответствует базе
+        update_fields = kwargs.get('update_fields')
+        loaded = getattr(self, '_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (update_fields is None or field.name in update_fields
+                                                   or field.attname in update_fields):
+                loaded[field.attname] = self.__dict__[field.attname]
+        self._loaded_values = loaded
+
+    def get_previous_values(self, *field_names):
+        """
+        Значения полей в базе до текущего изменения.
+
+        Берутся из снимка, сделанного при загрузке заказа. Запрос к базе нужен
+        только для объектов, собранных вручную или загруженных без этих полей.
+
+        Args:
+            field_names: Имена атрибутов (для внешних ключей - delivery_person_id)
+
+        Returns:
+            dict | None: Значения полей или None, если заказа нет в базе
+        """
+        loaded = getattr(self, '_loaded_values', {})
+        if all(name in loaded for name in field_names):
+            return {name: loaded[name] for name in field_names}
+        return Order.objects.filter(pk=self.pk).values(*field_names).first()
 
     def __str__(self):
         return f'Заказ {self.product_name} для {self.user.full_name}'
@@ -248,6 +469,12 @@ class Order(models.Model):
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
+        indexes = [
+            # Очередь воркера геокодирования
+            models.Index(fields=['geocode_status', 'geocode_retry_at'], name='order_geocode_queue_idx'),
+            # Фильтр по расстоянию в админке
+            models.Index(fields=['distance_km'], name='order_distance_idx'),
+        ]
 
 
 # Черновик модели для менеджмента доставки
@@ -300,6 +527,149 @@ class Consultation(models.Model):
          return f'Консультация для {self.user.full_name} ({self.user.phone})'
     
 
+class NotificationOutbox(models.Model):
+    """
+    Исходящее уведомление в Telegram.
+
+    Записывается в той же транзакции, что и заказ или консультация, и
+    отправляется фоновым воркером (manage.py dispatch_notifications).
+    Неотправленные сообщения переносятся в NotificationDeadLetter.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлено'),
+        ('merged', 'Объединено в сводку'),
+    ]
+    chat_id = models.CharField(max_length=50, verbose_name='Telegram ID получателя')
+    recipient_name = models.CharField(max_length=255, blank=True, verbose_name='Имя получателя')
+    text = models.TextField(verbose_name='Текст')
+    # Сообщения для сводки не отправляются по одному: воркер объединяет их
+    # по получателю (см. notifications.flush_digests)
+    digest = models.BooleanField(default=False, verbose_name='Для сводки')
+    # Событие, объект и получатель (см. notifications.notify): уникальность
+    # не дает поставить одно уведомление дважды из разных процессов
+    dedupe_key = models.CharField(max_length=100, null=True, blank=True, unique=True, editable=False,
+                                  verbose_name='Ключ дедупликации')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='Статус')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Создано')
+    available_at = models.DateTimeField(default=timezone.now, verbose_name='Отправить не раньше')
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name='Захвачено до')
+    claimed_by = models.CharField(max_length=32, blank=True, verbose_name='Воркер')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Отправлено')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+
+    class Meta:
+        verbose_name = "Уведомление"
+        verbose_name_plural = "Очередь уведомлений"
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ]
+
+    def __str__(self):
+        return f"Уведомление #{self.id} для {self.chat_id} ({self.get_status_display()})"
+
+
+class NotificationDeadLetter(models.Model):
+    """
+    Уведомление, которое не удалось отправить: ошибка не исправится
+    повторной отправкой или исчерпаны попытки.
+    """
+    chat_id = models.CharField(max_length=50, verbose_name='Telegram ID получателя')
+    recipient_name = models.CharField(max_length=255, blank=True, verbose_name='Имя получателя')
+    text = models.TextField(verbose_name='Текст')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(verbose_name='Создано')
+    failed_at = models.DateTimeField(default=timezone.now, verbose_name='Отклонено')
+
+    class Meta:
+        verbose_name = "Неотправленное уведомление"
+        verbose_name_plural = "Неотправленные уведомления"
+
+    def __str__(self):
+        return f"Уведомление для {self.chat_id}: {self.error[:50]}"
+
+
+class UsedWizardToken(models.Model):
+    """
+    Одноразовый номер токена мастера заказа (см. wizard), по которому уже
+    оформлен заказ. Записи старше ORDER_WIZARD_MAX_AGE удаляются: такой
+    токен не примется и без них.
+    """
+    nonce = models.CharField('Номер токена', max_length=32, unique=True)
+    used_at = models.DateTimeField('Использован', default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = 'Использованный токен мастера заказа'
+        verbose_name_plural = 'Использованные токены мастера заказа'
+
+    def __str__(self):
+        return self.nonce
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ключ идемпотентности отправленной формы (см. idempotency) и сохраненный ответ.
+
+    Пока код ответа пуст, первый запрос с этим ключом еще обрабатывается.
+    Таблица общая для всех процессов сайта; записи старше
+    idempotency.RESULT_TIMEOUT удаляются.
+    """
+    key = models.CharField('Ключ', max_length=150, unique=True)
+    status_code = models.PositiveSmallIntegerField('Код ответа', null=True, blank=True)
+    content_type = models.CharField('Тип ответа', max_length=100, blank=True)
+    content = models.BinaryField('Ответ', blank=True, default=b'')
+    created_at = models.DateTimeField('Создан', default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+
+    def __str__(self):
+        return self.key
+
+
+class DataVersion(models.Model):
+    """
+    Версия набора данных (см. versions): каталога, магазинов и т.п.
+
+    Хранится в базе, а не в кэше процесса, чтобы все процессы сайта и
+    воркеры видели одну и ту же версию.
+    """
+    name = models.CharField('Данные', max_length=50, unique=True)
+    version = models.BigIntegerField('Версия', default=0)
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+
+class GeocodeCache(models.Model):
+    """
+    Результат геокодирования адреса.
+
+    Ключ - нормализованный адрес (см. geocoding.normalize_address). Для
+    ненайденных адресов координат нет, а запись действует до expires_at.
+    """
+    address = models.CharField('Нормализованный адрес', max_length=300, unique=True)
+    latitude = models.FloatField('Широта', null=True, blank=True)
+    longitude = models.FloatField('Долгота', null=True, blank=True)
+    created_at = models.DateTimeField('Получено', default=timezone.now)
+    expires_at = models.DateTimeField('Действует до', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Координаты адреса'
+        verbose_name_plural = 'Кэш геокодера'
+
+    def __str__(self):
+        return self.address
+
+
 class Shop(models.Model):
     title = models.CharField('Название', max_length=100)
     address = models.CharField('Адрес', max_length=200)
@@ -315,6 +685,13 @@ class Shop(models.Model):
     meta_title = models.CharField('Meta Title', max_length=150, blank=True)
     meta_description = models.TextField('Meta Description', blank=True)
     last_address = models.CharField(max_length=200, editable=False, null=True)
+    # Координаты определяет воркер geocode_shops, чтобы сохранение в админке
+    # не ждало ответа геокодера
+    geocode_status = models.CharField('Координаты', max_length=10, choices=GEOCODE_STATUS_CHOICES,
+                                      default='pending', editable=False)
+    geocode_attempts = models.PositiveIntegerField('Попыток геокодирования', default=0, editable=False)
+    geocode_retry_at = models.DateTimeField('Повторить геокодирование', null=True, blank=True, editable=False)
+    geocode_error = models.TextField('Ошибка геокодирования', blank=True, editable=False)
 
     class Meta:
         ordering = ['order']
@@ -327,7 +704,7 @@ class Shop(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
-        from .utils import get_coordinates_by_address
+        from .geocoding import peek
         logger = logging.getLogger(__name__)
  
         if not self.slug:
@@ -339,19 +716,25 @@ class Shop(models.Model):
         logger.info(f"Предыдущий адрес: {self.last_address}")
 
         if self.address != self.last_address:
-            logger.info(f"Адрес изменился, получаем новые координаты")
-            # Получаем координаты только если адрес изменился
-            coordinates = get_coordinates_by_address(self.address)
-            if coordinates:
-                self.coord_x, self.coord_y = coordinates
-                self.last_address = self.address
-                logger.info(f"Получены новые координаты: широта={self.coord_x}, долгота={self.coord_y}")
+            self.last_address = self.address
+            # Координаты берутся из кэша геокодера, а если их там нет -
+            # магазин сохраняется сразу, и координаты определит воркер
+            found, coordinates = peek(self.address)
+            self.coord_x, self.coord_y = coordinates or (None, None)
+            self.geocode_attempts = 0
+            self.geocode_error = ''
+            if not found:
+                self.geocode_status = 'pending'
+                self.geocode_retry_at = timezone.now()
+                logger.info(f"Адрес изменился, координаты будут определены воркером")
+            elif coordinates:
+                self.geocode_status = 'done'
+                logger.info(f"Координаты из кэша: широта={self.coord_x}, долгота={self.coord_y}")
             else:
+                self.geocode_status = 'not_found'
                 logger.warning(f"Не удалось получить координаты для адреса: {self.address}")
      
         super().save(*args, **kwargs)
-        # Инвалидируем кэш при сохранении
-        cache.delete('active_shops')
         logger.info(f"Магазин {self.title} сохранен")
 
     def admin_image_preview(self):
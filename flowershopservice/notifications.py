@@ -0,0 +1,213 @@
+import logging
+
+from django.conf import settings
+
+from . import outbox, recipients
+from .telegram_service import MAX_MESSAGE_LENGTH, message_length
+
+logger = logging.getLogger(__name__)
+
+# События, о которых отправляются уведомления
+ORDER_CREATED = 'order_created'
+CONSULTATION_CREATED = 'consultation_created'
+ORDER_IN_DELIVERY = 'order_in_delivery'
+ORDER_HANDED_TO_DELIVERY = 'order_handed_to_delivery'
+
+# Повторное уведомление о том же событии тому же получателю в течение этого
+# времени не отправляется
+DEDUPE_TTL = 60 * 10
+
+
+def _delivery_time(order):
+    if order.is_express_delivery:
+        return "⚡ СРОЧНАЯ доставка!"
+    date = order.delivery_date.strftime('%d.%m.%Y') if order.delivery_date else '-'
+    time_from = order.delivery_time_from.strftime('%H:%M') if order.delivery_time_from else '-'
+    time_to = order.delivery_time_to.strftime('%H:%M') if order.delivery_time_to else '-'
+    return f"Доставка: {date}, {time_from} - {time_to}"
+
+
+def _format_order_created(order):
+    return (
+        f"🛒 Новый заказ #{order.id}\n"
+        f"Клиент: {order.user.full_name}\n"
+        f"Телефон: {order.user.phone}\n"
+        f"Букет: {order.product_name}\n"
+        f"Адрес: {order.delivery_address}"
+    )
+
+
+def _format_consultation_created(consultation):
+    return (
+        f"📞 Новая заявка на консультацию\n"
+        f"Клиент: {consultation.user.full_name}\n"
+        f"Телефон: {consultation.user.phone}\n"
+        f"Время: {consultation.creation_date.strftime('%d.%m.%Y %H:%M')}"
+    )
+
+
+def _format_order_in_delivery(order):
+    return (
+        f"🚚 Заказ #{order.id} готов к доставке!\n"
+        f"Клиент: {order.user.full_name}\n"
+        f"Телефон: {order.user.phone}\n"
+        f"Букет: {order.product_name}\n"
+        f"Адрес: {order.delivery_address}\n"
+        f"{_delivery_time(order)}"
+    )
+
+
+def _format_order_handed_to_delivery(order):
+    return (
+        f"📋 Заказ #{order.id} передан в доставку\n"
+        f"Доставщик: {order.delivery_person.full_name}\n"
+        f"Клиент: {order.user.full_name}\n"
+        f"Букет: {order.product_name}"
+    )
+
+
+MANAGER_GREETING = "👋 {name}, у вас новое уведомление!\n\n"
+DELIVERY_GREETING = "👋 {name}, у вас новый заказ на доставку!\n\n"
+DIGEST_GREETING = "👋 {name}, у вас новые уведомления ({count}):\n\n"
+DIGEST_SEPARATOR = "\n\n➖➖➖\n\n"
+
+# События, которые в режиме сводки копятся и отправляются одним сообщением;
+# срочные заказы отправляются сразу
+DIGEST_EVENTS = {ORDER_CREATED, CONSULTATION_CREATED}
+
+# Событие -> (роль получателей, приветствие, форматирование текста)
+EVENTS = {
+    ORDER_CREATED: ('manager', MANAGER_GREETING, _format_order_created),
+    CONSULTATION_CREATED: ('manager', MANAGER_GREETING, _format_consultation_created),
+    ORDER_IN_DELIVERY: ('delivery', DELIVERY_GREETING, _format_order_in_delivery),
+    ORDER_HANDED_TO_DELIVERY: ('manager', MANAGER_GREETING, _format_order_handed_to_delivery),
+}
+
+
+def format_message(event, obj, recipient=None):
+    """
+    Текст уведомления о событии.
+
+    Args:
+        event: Тип события (ORDER_CREATED, ...)
+        obj: Заказ или заявка на консультацию
+        recipient: Получатель; если указан, добавляется личное приветствие
+    """
+    _, greeting, formatter = EVENTS[event]
+    text = formatter(obj)
+    if recipient is not None:
+        text = greeting.format(name=recipient.full_name) + text
+    return text
+
+
+def get_event_recipients(event, obj):
+    """Получатели уведомления: менеджеры или доставщик заказа"""
+    role = EVENTS[event][0]
+    if role == 'delivery':
+        recipient = recipients.get_recipient(obj.delivery_person_id)
+        return [recipient] if recipient else []
+    return recipients.get_recipients(role)
+
+
+def _dedupe_key(event, obj, recipient):
+    return f'{event}:{obj.pk}:{recipient.id}'
+
+
+def digest_window():
+    """Окно накопления сводки в секундах; 0 - режим сводки выключен"""
+    return settings.NOTIFICATION_DIGEST_WINDOW
+
+
+def _use_digest(event, obj):
+    return digest_window() > 0 and event in DIGEST_EVENTS and not getattr(obj, 'is_express_delivery', False)
+
+
+def _cut(text, limit):
+    """Делит текст на куски не длиннее limit, по возможности по переводам строк"""
+    pieces = []
+    while message_length(text) > limit:
+        end = limit
+        while message_length(text[:end]) > limit:
+            end -= message_length(text[:end]) - limit
+        line_end = text.rfind('\n', 0, end)
+        if line_end > 0:
+            end = line_end
+        pieces.append(text[:end])
+        text = text[end:].lstrip('\n')
+    pieces.append(text)
+    return pieces
+
+
+def format_digest(rows, limit=MAX_MESSAGE_LENGTH):
+    """
+    Тексты сводки из накопленных сообщений одного получателя.
+
+    Сводка делится на несколько сообщений не длиннее limit: Telegram
+    отклоняет более длинные, и такая сводка не была бы отправлена целиком.
+    Сообщения разделяются между уведомлениями, а не посреди них.
+
+    Returns:
+        list[str]: Тексты сообщений по порядку
+    """
+    name = rows[0].recipient_name
+    if len(rows) == 1:
+        greeting = MANAGER_GREETING.format(name=name)
+    else:
+        greeting = DIGEST_GREETING.format(name=name, count=len(rows))
+
+    texts = []
+    current = None
+    for row in rows:
+        for piece in _cut(row.text, limit - message_length(greeting)):
+            if current is None:
+                current = greeting + piece
+            elif message_length(current) + message_length(DIGEST_SEPARATOR + piece) > limit:
+                texts.append(current)
+                current = piece
+            else:
+                current += DIGEST_SEPARATOR + piece
+    texts.append(current)
+    return texts
+
+
+def flush_digests(now=None):
+    """
+    Ставит в очередь сводки, окно накопления которых истекло.
+
+    Вызывается воркером dispatch_notifications перед отправкой очередной пачки.
+    Сообщения, накопленные до выключения режима, отправляются сразу.
+
+    Returns:
+        int: Сколько сводок поставлено в очередь
+    """
+    return outbox.flush_digests(digest_window(), format_digest, now=now)
+
+
+def notify(event, obj):
+    """
+    Ставит в очередь уведомления о событии всем его получателям.
+
+    Повторное уведомление о том же событии для того же объекта и получателя
+    в течение DEDUPE_TTL подавляется (см. outbox.enqueue_once).
+
+    Returns:
+        int: Сколько сообщений поставлено в очередь
+    """
+    targets = get_event_recipients(event, obj)
+    _, greeting, formatter = EVENTS[event]
+    text = formatter(obj)
+    digest = _use_digest(event, obj)
+    queued = outbox.enqueue_once(
+        (
+            (_dedupe_key(event, obj, recipient), recipient.telegram_id, recipient.full_name,
+             text if digest else greeting.format(name=recipient.full_name) + text)
+            for recipient in targets
+        ),
+        DEDUPE_TTL,
+        digest=digest,
+    )
+    if not queued:
+        logger.info(f"Уведомление {event} #{obj.pk}: получателей нет или уже уведомлены")
+        return 0
+    logger.info(f"Уведомление {event} #{obj.pk} поставлено в очередь для {queued} получателей")
+    return queued
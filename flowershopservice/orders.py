@@ -0,0 +1,82 @@
+import datetime
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Product, ShopUser, Order
+from . import delivery_slots, wizard
+
+logger = logging.getLogger(__name__)
+
+
+class SlotUnavailable(Exception):
+    """Выбранный слот доставки заполнен"""
+
+
+def _parse_time(value):
+    return datetime.datetime.strptime(value, '%H:%M:%S').time() if value else None
+
+
+def create_order(order_data, bouquet_id, wizard_nonce=None):
+    """
+    Оформляет заказ из данных мастера заказа одной транзакцией.
+
+    Заказ собирается целиком (включая время доставки) и вставляется одним
+    INSERT, поэтому pre_save с повторным чтением заказа не срабатывает, а
+    уведомления менеджерам уходят только после коммита (см. signals.py).
+
+    Args:
+        order_data: Данные шага оформления (имя, телефон, адрес, слот и дата)
+        bouquet_id: ID букета
+        wizard_nonce: Одноразовый номер токена мастера заказа (см. wizard.consume)
+
+    Returns:
+        Order: Созданный заказ
+
+    Raises:
+        Product.DoesNotExist: Букет не найден
+        SlotUnavailable: Слот доставки заполнен
+        wizard.TokenAlreadyUsed: Заказ по этому токену уже оформлен
+    """
+    bouquet = Product.objects.only('id', 'name', 'price', 'composition').get(id=bouquet_id)
+    delivery_date = datetime.datetime.strptime(order_data['delivery_date'], '%Y-%m-%d').date()
+    slot = delivery_slots.get_slot(order_data.get('delivery_slot_id'))
+
+    with transaction.atomic():
+        # Транзакция начинается с записи (номер токена, место в слоте), а не
+        # с чтения; и номер, и место освобождаются, если создать заказ не удастся
+        if wizard_nonce:
+            wizard.consume(wizard_nonce)
+        if slot and not delivery_slots.reserve_slot(slot.id, delivery_date, slot.capacity):
+            raise SlotUnavailable(f"Slot {slot.id} is full for {delivery_date}")
+
+        user, created = ShopUser.objects.get_or_create(
+            phone=order_data['phone'],
+            defaults={
+                'full_name': order_data['name'],
+                'status': 'user',
+                'address': order_data['address']
+            }
+        )
+        logger.info(f"User: {user.full_name}, Created: {created}")
+
+        order = Order.objects.create(
+            user=user,
+            product=bouquet,
+            product_name=bouquet.name,
+            product_price=bouquet.price,
+            product_composition=bouquet.composition,
+            delivery_address=order_data['address'],
+            delivery_date=delivery_date,
+            is_express_delivery=order_data['is_express'],
+            delivery_slot_id=slot.id if slot else None,
+            holds_slot=slot is not None,
+            delivery_time_from=_parse_time(order_data.get('delivery_time_from')),
+            delivery_time_to=_parse_time(order_data.get('delivery_time_to')),
+            status='created',
+            creation_date=timezone.now(),
+        )
+        logger.info(f"Created order with ID: {order.id}")
+
+    return order
@@ -0,0 +1,274 @@
+import datetime
+import logging
+import random
+import uuid
+
+from django.db import connection, transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from . import recipients
+from .models import NotificationOutbox, NotificationDeadLetter
+from .telegram_service import TelegramNotifier, SendResult
+
+logger = logging.getLogger(__name__)
+
+# На сколько воркер захватывает пачку: если он упадет, сообщения снова
+# станут доступны другим воркерам по истечении этого времени
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 5
+# Пауза перед повторной отправкой удваивается с каждой попыткой, но не больше
+# MAX_RETRY_DELAY_SECONDS
+RETRY_DELAY_SECONDS = 30
+MAX_RETRY_DELAY_SECONDS = 60 * 60
+
+
+def enqueue(chat_id, text):
+    """Ставит сообщение в очередь; вызывается внутри транзакции бизнес-операции"""
+    return NotificationOutbox.objects.create(chat_id=str(chat_id), text=text)
+
+
+def enqueue_many(messages):
+    """
+    Ставит в очередь несколько сообщений одним INSERT.
+
+    Args:
+        messages: Итерируемый объект пар (chat_id, text)
+    """
+    return NotificationOutbox.objects.bulk_create(
+        [NotificationOutbox(chat_id=str(chat_id), text=text) for chat_id, text in messages]
+    )
+
+
+def enqueue_once(messages, ttl_seconds, digest=False):
+    """
+    Ставит в очередь сообщения, которых еще нет в очереди, одним INSERT.
+
+    Повторы отсекает уникальный ключ сообщения в базе, поэтому дубликат не
+    появится и при одновременных запросах из разных процессов, а ключ из
+    откатившейся транзакции не мешает поставить сообщение снова. Ключи
+    сообщений старше ttl_seconds освобождаются.
+
+    Args:
+        messages: Итерируемый объект четверок (ключ, chat_id, recipient_name, text)
+        ttl_seconds: Сколько секунд повтор с тем же ключом подавляется
+        digest: Сообщения для сводки (см. flush_digests)
+
+    Returns:
+        int: Сколько сообщений поставлено в очередь
+    """
+    messages = {key: (chat_id, name, text) for key, chat_id, name, text in messages}
+    if not messages:
+        return 0
+    expired_before = timezone.now() - datetime.timedelta(seconds=ttl_seconds)
+    existing = dict(
+        NotificationOutbox.objects.filter(dedupe_key__in=list(messages)).values_list('dedupe_key', 'created_at')
+    )
+    expired = [key for key, created_at in existing.items() if created_at < expired_before]
+    if expired:
+        NotificationOutbox.objects.filter(dedupe_key__in=expired).update(dedupe_key=None)
+
+    new = [
+        NotificationOutbox(dedupe_key=key, chat_id=str(chat_id), recipient_name=name, text=text, digest=digest)
+        for key, (chat_id, name, text) in messages.items()
+        if key not in existing or key in expired
+    ]
+    # Ключ, занятый параллельной транзакцией после проверки, пропускается базой
+    NotificationOutbox.objects.bulk_create(new, ignore_conflicts=True)
+    return len(new)
+
+
+def flush_digests(window_seconds, format_digest, now=None):
+    """
+    Объединяет накопленные сообщения для сводки в сводку на получателя.
+
+    Сводка получателя формируется, когда с его первого накопленного сообщения
+    прошло window_seconds. Исходные строки помечаются как merged, а сводка
+    ставится в очередь обычными сообщениями (длинная - несколькими).
+
+    Args:
+        window_seconds: Окно накопления, секунды
+        format_digest: Функция, получающая список строк получателя и
+            возвращающая тексты сообщений сводки
+        now: Текущее время (для замеров)
+
+    Returns:
+        int: Сколько сводок поставлено в очередь
+    """
+    now = now or timezone.now()
+    pending = NotificationOutbox.objects.filter(digest=True, status='pending')
+    due_chats = (
+        pending.values('chat_id')
+        .annotate(first_at=Min('created_at'))
+        .filter(first_at__lte=now - datetime.timedelta(seconds=window_seconds))
+        .values_list('chat_id', flat=True)
+    )
+
+    flushed = 0
+    for chat_id in list(due_chats):
+        rows = list(pending.filter(chat_id=chat_id).order_by('id'))
+        if not rows:
+            continue
+        with transaction.atomic():
+            # Условный UPDATE: если строки уже объединил другой воркер,
+            # сводка не создается
+            merged = NotificationOutbox.objects.filter(
+                id__in=[row.id for row in rows], status='pending',
+            ).update(status='merged', sent_at=now)
+            if merged != len(rows):
+                transaction.set_rollback(True)
+                continue
+            NotificationOutbox.objects.bulk_create([
+                NotificationOutbox(
+                    chat_id=chat_id, recipient_name=rows[0].recipient_name,
+                    text=text, created_at=now, available_at=now,
+                )
+                for text in format_digest(rows)
+            ])
+        flushed += 1
+    return flushed
+
+
+def _claimable(now):
+    # Новые сообщения и пачки, захваченные упавшим воркером; сообщения для
+    # сводки отправляются только в ее составе
+    return Q(status='pending', digest=False, available_at__lte=now) | Q(status='sending', locked_until__lt=now)
+
+
+def _lock(ids, now, token, lease_seconds):
+    if ids:
+        NotificationOutbox.objects.filter(_claimable(now), id__in=ids).update(
+            status='sending',
+            claimed_by=token,
+            locked_until=now + datetime.timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+        )
+
+
+def claim_batch(batch_size=50, lease_seconds=LEASE_SECONDS):
+    """
+    Захватывает пачку сообщений для отправки.
+
+    На PostgreSQL строки выбираются через SELECT ... FOR UPDATE SKIP LOCKED,
+    поэтому параллельные воркеры не ждут друг друга. На SQLite захват - это
+    условный UPDATE, который повторно проверяет, что строка еще свободна.
+
+    Returns:
+        list[NotificationOutbox]: Захваченные сообщения
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    candidates = NotificationOutbox.objects.filter(_claimable(now)).order_by('id').values_list('id', flat=True)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(candidates.select_for_update(skip_locked=True)[:batch_size])
+            _lock(ids, now, token, lease_seconds)
+    else:
+        # Без транзакции: на SQLite чтение с последующей записью в одной
+        # транзакции приводит к "database is locked" у параллельных воркеров
+        _lock(list(candidates[:batch_size]), now, token, lease_seconds)
+
+    return list(NotificationOutbox.objects.filter(claimed_by=token, status='sending').order_by('id'))
+
+
+def mark_sent(message):
+    NotificationOutbox.objects.filter(id=message.id, claimed_by=message.claimed_by).update(
+        status='sent', sent_at=timezone.now(), locked_until=None, last_error='',
+    )
+
+
+def retry_delay(attempts):
+    """
+    Пауза перед следующей попыткой, секунды.
+
+    Экспоненциальная с разбросом (jitter): сообщения, упавшие одновременно,
+    например при недоступности API, не повторяются одной волной.
+    """
+    delay = min(MAX_RETRY_DELAY_SECONDS, RETRY_DELAY_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def _dead_letter(message, error):
+    return NotificationDeadLetter(
+        chat_id=message.chat_id, recipient_name=message.recipient_name, text=message.text,
+        attempts=message.attempts, error=str(error), created_at=message.created_at,
+    )
+
+
+def move_to_dead_letters(message, error):
+    """Переносит сообщение в таблицу неотправленных"""
+    with transaction.atomic():
+        deleted, _ = NotificationOutbox.objects.filter(id=message.id, claimed_by=message.claimed_by).delete()
+        if deleted:
+            _dead_letter(message, error).save()
+    logger.error(f"Уведомление #{message.id} для {message.chat_id} не отправлено: {error}")
+
+
+def drop_pending_for_chat(chat_id, error):
+    """
+    Переносит в таблицу неотправленных все ожидающие сообщения чата.
+
+    Returns:
+        int: Сколько сообщений перенесено
+    """
+    messages = list(NotificationOutbox.objects.filter(chat_id=chat_id, status='pending'))
+    if not messages:
+        return 0
+    with transaction.atomic():
+        NotificationOutbox.objects.filter(id__in=[message.id for message in messages], status='pending').delete()
+        NotificationDeadLetter.objects.bulk_create([_dead_letter(message, error) for message in messages])
+    return len(messages)
+
+
+def mark_failed(message, result):
+    """
+    Обрабатывает неудачную отправку.
+
+    Временная ошибка возвращает сообщение в очередь с паузой, постоянная или
+    исчерпанные попытки переносят его в таблицу неотправленных. Если
+    получатель заблокировал бота, уведомления ему отключаются, а остальные его
+    сообщения тоже переносятся в неотправленные.
+    """
+    if result.blocked:
+        recipients.block(message.chat_id)
+        move_to_dead_letters(message, result.error)
+        drop_pending_for_chat(message.chat_id, result.error)
+    elif not result.retryable:
+        move_to_dead_letters(message, result.error)
+    elif message.attempts >= MAX_ATTEMPTS:
+        move_to_dead_letters(message, f"Попытки исчерпаны ({message.attempts}): {result.error}")
+    else:
+        delay = datetime.timedelta(seconds=retry_delay(message.attempts))
+        NotificationOutbox.objects.filter(id=message.id, claimed_by=message.claimed_by).update(
+            status='pending', available_at=timezone.now() + delay, locked_until=None, last_error=result.error,
+        )
+
+
+def dispatch_batch(batch_size=50):
+    """
+    Отправляет одну пачку сообщений из очереди.
+
+    Returns:
+        tuple[int, int]: Количество отправленных и неудачных сообщений
+    """
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    # Пачка отправляется параллельно с учетом лимитов Bot API
+    try:
+        results = TelegramNotifier.send_many((message.chat_id, message.text) for message in batch)
+    except Exception as e:
+        logger.error(f"Ошибка отправки пачки уведомлений: {e}")
+        results = [SendResult(False, retryable=True, error=str(e))] * len(batch)
+
+    sent = failed = 0
+    for message, result in zip(batch, results):
+        if result:
+            mark_sent(message)
+            sent += 1
+        else:
+            mark_failed(message, result)
+            failed += 1
+    return sent, failed
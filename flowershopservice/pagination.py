@@ -0,0 +1,105 @@
+import base64
+import binascii
+import json
+import logging
+from typing import Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(sort_value, pk) -> str:
+    """
+    Кодирует позицию последнего показанного букета в непрозрачный курсор.
+
+    Args:
+        sort_value: Значение поля сортировки у последнего элемента страницы
+        pk: ID последнего элемента страницы
+
+    Returns:
+        str: Курсор, безопасный для передачи в URL
+    """
+    raw = json.dumps([str(sort_value), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, field=None) -> Optional[Tuple[object, int]]:
+    """
+    Декодирует курсор, полученный от клиента.
+
+    Args:
+        cursor: Курсор из запроса
+        field: Поле модели, по которому идет сортировка; значение курсора
+            приводится к его типу
+
+    Returns:
+        Tuple[object, int]: (значение поля сортировки, ID) или None, если курсор
+        поврежден или не подходит к полю сортировки
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if field is not None:
+            sort_value = field.to_python(sort_value)
+            if sort_value is None:
+                raise ValueError('пустое значение сортировки')
+        return sort_value, int(pk)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError, ValidationError):
+        logger.warning(f"Некорректный курсор пагинации: {cursor}")
+        return None
+
+
+def paginate_by_cursor(queryset, cursor=None, limit=6, sort_field='id', descending=False):
+    """
+    Keyset-пагинация по паре (sort_field, id).
+
+    Вместо OFFSET страница начинается сразу после последнего показанного
+    элемента, поэтому из базы читается только limit + 1 строка независимо
+    от размера каталога. Лишняя строка нужна только чтобы понять, есть ли
+    следующая страница.
+
+    Args:
+        queryset: Отфильтрованный QuerySet букетов (можно после .values())
+        cursor: Курсор из предыдущего ответа (None для первой страницы)
+        limit: Количество элементов на странице
+        sort_field: Поле сортировки (уникальность обеспечивает добавочный id)
+        descending: Сортировка по убыванию
+
+    Returns:
+        Tuple[list, Optional[str]]: (элементы страницы, курсор следующей страницы)
+    """
+    direction = '-' if descending else ''
+    lookup = 'lt' if descending else 'gt'
+
+    if sort_field == 'id':
+        ordering = [f'{direction}id']
+    else:
+        ordering = [f'{direction}{sort_field}', f'{direction}id']
+
+    if cursor:
+        # Курсор, не подходящий к полю сортировки, считается запросом первой страницы
+        position = decode_cursor(cursor, queryset.model._meta.get_field(sort_field))
+        if position is not None:
+            sort_value, last_id = position
+            if sort_field == 'id':
+                queryset = queryset.filter(**{f'id__{lookup}': last_id})
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{sort_field}__{lookup}': sort_value})
+                    | Q(**{sort_field: sort_value, f'id__{lookup}': last_id})
+                )
+
+    items = list(queryset.order_by(*ordering)[:limit + 1])
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last[sort_field], last['id'])
+        else:
+            next_cursor = encode_cursor(getattr(last, sort_field), last.id)
+
+    return items, next_cursor
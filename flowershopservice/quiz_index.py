@@ -0,0 +1,109 @@
+import logging
+import random
+from array import array
+
+from django.core.cache import cache
+
+from . import catalog_version
+from .models import Product, Category, PriceRange
+from .cards import get_card
+
+logger = logging.getLogger(__name__)
+
+INDEX_CACHE_KEY = 'quiz_pick_index'
+# Индексы прежних версий каталога больше не читаются и вытесняются по времени
+INDEX_TIMEOUT = 60 * 60 * 24
+
+
+def build_index():
+    """
+    Строит индекс для случайного выбора букета в квизе.
+
+    Индекс хранит компактные массивы ID активных букетов:
+        - 'all': все активные букеты (для result и запасного варианта)
+        - 'buckets': {(category_id, price_range_id): массив ID}
+        - 'categories' / 'price_ranges': известные ID для проверки параметров URL
+
+    Returns:
+        dict: Индекс, готовый к сохранению в кэш
+    """
+    active = Product.objects.filter(status='active')
+    product_ids = list(active.values_list('id', flat=True))
+
+    # Принадлежность диапазонам берется из материализованной таблицы - это
+    # соединение по равенству индексированных ключей, без сравнения цен
+    buckets = {}
+    for category_id, price_range_id, product_id in active.values_list('categories', 'price_ranges', 'id'):
+        if category_id is None or price_range_id is None:
+            continue
+        buckets.setdefault((category_id, price_range_id), array('l')).append(product_id)
+
+    index = {
+        'all': array('l', sorted(product_ids)),
+        'buckets': buckets,
+        'categories': set(Category.objects.values_list('id', flat=True)),
+        'price_ranges': set(PriceRange.objects.values_list('id', flat=True)),
+    }
+    logger.info(f"Индекс квиза построен: {len(product_ids)} букетов, {len(buckets)} корзин")
+    return index
+
+
+def _cache_key():
+    return f'{INDEX_CACHE_KEY}:{catalog_version.get_version()}'
+
+
+def get_index():
+    """
+    Возвращает индекс из кэша, при отсутствии строит его заново.
+
+    Ключ включает общую версию каталога из базы: любое изменение букетов,
+    их категорий, категорий или ценовых диапазонов в любом процессе меняет
+    версию, и каждый процесс один раз перестраивает индекс. Построенный
+    индекс не изменяется, поэтому блокировки не нужны.
+    """
+    cache_key = _cache_key()
+    index = cache.get(cache_key)
+    if index is None:
+        index = build_index()
+        cache.set(cache_key, index, INDEX_TIMEOUT)
+    return index
+
+
+def invalidate_index():
+    """Сбрасывает индекс текущей версии в этом процессе, следующий запрос построит его заново"""
+    cache.delete(_cache_key())
+
+
+def has_category(category_id):
+    return category_id in get_index()['categories']
+
+
+def has_price_range(price_range_id):
+    return price_range_id in get_index()['price_ranges']
+
+
+def pick_random_product(category_id=None, price_range_id=None):
+    """
+    Выбирает случайный активный букет за O(1) и один запрос по первичному ключу.
+
+    Если для пары (категория, ценовой диапазон) нет букетов,
+    выбирается случайный букет из всего каталога.
+
+    Returns:
+        ProductCard: Карточка случайного букета или None, если активных букетов нет
+    """
+    index = get_index()
+    candidates = index['all']
+    if category_id is not None and price_range_id is not None:
+        candidates = index['buckets'].get((category_id, price_range_id)) or candidates
+
+    if not candidates:
+        return None
+
+    product_id = candidates[random.randrange(len(candidates))]
+    product = get_card(Product.objects.filter(status='active'), pk=product_id)
+    if product is None:
+        # Индекс отстал от базы (например, после QuerySet.update) - перестраиваем
+        logger.warning(f"Букет {product_id} из индекса квиза не найден, индекс сброшен")
+        invalidate_index()
+    return product
@@ -0,0 +1,102 @@
+import logging
+import re
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import versions
+from .models import ShopUser
+
+logger = logging.getLogger(__name__)
+
+RECIPIENTS_CACHE_KEY = 'notification_recipients'
+# Реестры прежних версий больше не читаются и вытесняются по времени
+RECIPIENTS_TIMEOUT = 60 * 60 * 24
+# Роли, которым отправляются уведомления
+ROLES = ('manager', 'delivery')
+
+TELEGRAM_ID_RE = re.compile(r'^-?\d+$')
+
+Recipient = namedtuple('Recipient', ['id', 'full_name', 'telegram_id'])
+
+
+def is_valid_telegram_id(value):
+    """Telegram ID - целое число (у групп и каналов отрицательное)"""
+    return bool(value) and TELEGRAM_ID_RE.match(value.strip()) is not None
+
+
+def _build_registry():
+    """
+    Загружает получателей уведомлений одним запросом.
+
+    Пользователи с некорректным Telegram ID отбрасываются здесь, один раз
+    при построении реестра, а не при каждой отправке. Пользователи,
+    заблокировавшие бота, в реестр не попадают.
+    """
+    registry = {role: [] for role in ROLES}
+    users = ShopUser.objects.filter(
+        status__in=ROLES, telegram_id__isnull=False, telegram_blocked=False,
+    ).exclude(telegram_id='')
+    for user_id, full_name, telegram_id, status in users.values_list('id', 'full_name', 'telegram_id', 'status'):
+        if not is_valid_telegram_id(telegram_id):
+            logger.warning(f"Неправильный формат Telegram ID у {full_name}: {telegram_id}, уведомления отключены")
+            continue
+        registry[status].append(Recipient(user_id, full_name, telegram_id.strip()))
+    return registry
+
+
+def _get_registry():
+    # Ключ включает общую версию получателей из базы: изменение пользователей
+    # в любом процессе (админка, воркер уведомлений) меняет версию, и
+    # устаревший реестр из памяти этого процесса больше не читается
+    cache_key = f'{RECIPIENTS_CACHE_KEY}:{versions.get(versions.RECIPIENTS)}'
+    registry = cache.get(cache_key)
+    if registry is None:
+        registry = _build_registry()
+        cache.set(cache_key, registry, RECIPIENTS_TIMEOUT)
+    return registry
+
+
+def get_recipients(role):
+    """
+    Возвращает получателей уведомлений с ролью role.
+
+    Returns:
+        list[Recipient]: Пользователи с корректным Telegram ID
+    """
+    return _get_registry().get(role, [])
+
+
+def get_recipient(user_id, role='delivery'):
+    """Получатель по ID пользователя или None, если ему нельзя отправить уведомление"""
+    for recipient in get_recipients(role):
+        if recipient.id == user_id:
+            return recipient
+    return None
+
+
+def invalidate():
+    """Сбрасывает реестр получателей во всех процессах"""
+    versions.bump(versions.RECIPIENTS)
+
+
+def block(chat_id):
+    """
+    Отключает уведомления пользователям, заблокировавшим бота.
+
+    Флаг снимается вручную в админке, когда пользователь снова запустит бота.
+
+    Returns:
+        int: Сколько пользователей отключено
+    """
+    with transaction.atomic():
+        blocked = ShopUser.objects.filter(telegram_id=chat_id, telegram_blocked=False).update(telegram_blocked=True)
+        if blocked:
+            # update() не вызывает сигналы ShopUser, поэтому версия получателей
+            # меняется здесь, вместе с флагом: блокировку узнает воркер
+            # уведомлений, а процессы сайта перестают ставить сообщения в этот чат
+            invalidate()
+    if blocked:
+        logger.warning(f"Пользователь с Telegram ID {chat_id} заблокировал бота, уведомления отключены")
+    return blocked
@@ -0,0 +1,167 @@
+import logging
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'flowershopservice_product_fts'
+
+# Окончания, которые отбрасываются при поиске: простой стеммер для русского
+# языка, чтобы "розы", "розами" и "розовый" находили друг друга через префикс
+RUSSIAN_ENDINGS = sorted([
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ой', 'ей', 'ий', 'ый', 'ая', 'яя',
+    'ое', 'ее', 'ые', 'ие', 'ых', 'их', 'ов', 'ев', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ую', 'юю',
+    'а', 'я', 'ы', 'и', 'у', 'ю', 'о', 'е', 'ь',
+], key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+# Сколько самых релевантных совпадений можно пролистать в выдаче поиска
+SEARCH_MAX_CANDIDATES = 1000
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available():
+    """FTS5 используется только на SQLite, для других СУБД работает запасной поиск"""
+    return connection.vendor == 'sqlite'
+
+
+def create_index(cursor):
+    """Создает виртуальную таблицу FTS5, если ее еще нет"""
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"name, description, composition, categories, "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+
+def stem(word):
+    """Отбрасывает типичное окончание, оставляя основу не короче MIN_STEM_LENGTH"""
+    word = word.lower().replace('ё', 'е')
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def build_match_query(text):
+    """
+    Превращает пользовательский запрос в выражение MATCH для FTS5.
+
+    Каждое слово ищется по основе как префикс, слова объединяются через AND.
+
+    Returns:
+        str: Выражение для MATCH или пустая строка, если искать нечего
+    """
+    terms = [stem(word) for word in WORD_RE.findall(text)]
+    return ' AND '.join(f'"{term}"*' for term in terms if term)
+
+
+def rebuild_index(product_ids=None):
+    """
+    Перестраивает поисковый индекс одним INSERT ... SELECT.
+
+    Args:
+        product_ids: Переиндексировать только эти букеты (None - весь каталог)
+    """
+    if not is_available():
+        return
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+
+    product_table = Product._meta.db_table
+    through = Product.categories.through
+    category_table = through._meta.get_field('category').related_model._meta.db_table
+
+    where = ''
+    params = []
+    if product_ids is not None:
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        where = f" WHERE {{column}} IN ({placeholders})"
+        params = product_ids
+
+    with connection.cursor() as cursor:
+        create_index(cursor)
+        cursor.execute(f"DELETE FROM {FTS_TABLE}" + where.format(column='rowid'), params)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, composition, categories) "
+            f"SELECT p.id, p.name, p.description, p.composition, "
+            f"COALESCE((SELECT group_concat(c.name, ' ') FROM {through._meta.db_table} pc "
+            f"JOIN {category_table} c ON c.id = pc.category_id WHERE pc.product_id = p.id), '') "
+            f"FROM {product_table} p" + where.format(column='p.id'),
+            params,
+        )
+
+    if product_ids is None:
+        logger.info("Поисковый индекс букетов перестроен")
+
+
+def index_product(product_id):
+    """Переиндексирует один букет (после сохранения или изменения категорий)"""
+    rebuild_index(product_ids=[product_id])
+
+
+def remove_product(product_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+
+def filter_queryset(queryset, text):
+    """
+    Ограничивает queryset букетами, подходящими под поисковый запрос.
+
+    На SQLite это подзапрос к индексу FTS5, на остальных СУБД - icontains.
+    """
+    if is_available():
+        match = build_match_query(text)
+        if not match:
+            return queryset.none()
+        return queryset.filter(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]))
+
+    condition = Q()
+    for word in WORD_RE.findall(text):
+        condition &= Q(name__icontains=word) | Q(description__icontains=word) | Q(composition__icontains=word)
+    return queryset.filter(condition)
+
+
+def search_product_ids(text, offset=0, limit=6):
+    """
+    Ищет активные букеты и возвращает их ID в порядке релевантности.
+
+    Returns:
+        list[int]: Не более limit ID начиная с offset
+    """
+    if not is_available():
+        queryset = filter_queryset(Product.objects.filter(status='active'), text)
+        return list(queryset.order_by('id').values_list('id', flat=True)[offset:offset + limit])
+
+    match = build_match_query(text)
+    if not match:
+        return []
+
+    # Листать дальше SEARCH_MAX_CANDIDATES самых релевантных букетов нельзя:
+    # SQLite выбирает верхние offset + limit строк без сортировки всех совпадений
+    if offset >= SEARCH_MAX_CANDIDATES:
+        return []
+    limit = min(limit, SEARCH_MAX_CANDIDATES - offset)
+
+    # Статус проверяется до ранжирования, а ограничение применяется после
+    # сортировки по bm25, поэтому лучшие совпадения не теряются
+    product_table = Product._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT p.id FROM {FTS_TABLE} JOIN {product_table} p ON p.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND p.status = 'active' "
+            f"ORDER BY bm25({FTS_TABLE}, 10.0, 2.0, 2.0, 5.0), p.id LIMIT %s OFFSET %s",
+            [match, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import os
+import random
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import geocoding
+from .models import Shop
+
+logger = logging.getLogger(__name__)
+
+IMAGE_WORKERS = 8
+UPSERT_BATCH_SIZE = 500
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Поля, которые перезаписываются у уже существующих магазинов
+UPSERT_FIELDS = [
+    'title', 'address', 'phone', 'image', 'working_hours', 'description', 'meta_title', 'meta_description',
+    'order', 'is_active', 'last_address',
+]
+# Координаты и состояние геокодирования: у магазина с прежним адресом не
+# перезаписываются, если геокодер вернул ошибку
+GEOCODE_UPSERT_FIELDS = [
+    'coord_x', 'coord_y', 'geocode_status', 'geocode_attempts', 'geocode_retry_at', 'geocode_error',
+]
+
+
+def _file_hash(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy_image(source_path, destination_path):
+    """Копирует файл, если такого же файла в медиа еще нет; возвращает True при копировании"""
+    if os.path.exists(destination_path) and _file_hash(destination_path) == _file_hash(source_path):
+        return False
+    shutil.copy(source_path, destination_path)
+    return True
+
+
+def copy_images(image_files, source_folder, workers=IMAGE_WORKERS):
+    """
+    Параллельно копирует изображения в MEDIA_ROOT/shops.
+
+    Файл пропускается, если в медиа уже лежит файл с тем же содержимым.
+
+    Returns:
+        tuple[set, int, int]: Успешно скопированные или уже имеющиеся файлы,
+        количество скопированных и пропущенных
+    """
+    destination_folder = os.path.join(settings.MEDIA_ROOT, 'shops')
+    os.makedirs(destination_folder, exist_ok=True)
+
+    def copy(image_file):
+        try:
+            return image_file, _copy_image(os.path.join(source_folder, image_file),
+                                           os.path.join(destination_folder, image_file))
+        except OSError as e:
+            logger.error(f"Ошибка копирования изображения {image_file}: {e}")
+            return image_file, None
+
+    available, copied, skipped = set(), 0, 0
+    if image_files:
+        with ThreadPoolExecutor(max_workers=min(workers, len(image_files))) as executor:
+            for image_file, result in executor.map(copy, sorted(image_files)):
+                if result is None:
+                    continue
+                available.add(image_file)
+                copied += result
+                skipped += not result
+    return available, copied, skipped
+
+
+def import_shops(shops_data, image_folder, workers=geocoding.LOOKUP_WORKERS, rate=geocoding.LOOKUP_RATE):
+    """
+    Пакетный импорт магазинов из фикстуры.
+
+    Уникальные адреса геокодируются параллельно через кэш геокодера,
+    изображения копируются параллельно, а магазины записываются пачками
+    INSERT ... ON CONFLICT по slug. Новые магазины и магазины с новым
+    адресом, для которых геокодер вернул ошибку, сохраняются в статусе
+    pending и обрабатываются воркером geocode_shops; у магазинов с прежним
+    адресом в этом случае остаются их координаты.
+
+    Args:
+        shops_data: Записи фикстуры shops.json
+        image_folder: Папка с изображениями магазинов
+        workers: Параллельных запросов к геокодеру
+        rate: Запросов к геокодеру в секунду
+
+    Returns:
+        dict: Статистика импорта
+    """
+    image_files = [name for name in os.listdir(image_folder) if name.lower().endswith(IMAGE_EXTENSIONS)]
+    chosen_images = [random.choice(image_files) if image_files else None for _ in shops_data]
+    available_images, images_copied, images_skipped = copy_images(
+        {image for image in chosen_images if image}, image_folder,
+    )
+
+    records = [shop_data['fields'] for shop_data in shops_data]
+    coordinates = geocoding.lookup_many([fields['address'] for fields in records], workers=workers, rate=rate)
+
+    # Адреса уже загруженных магазинов, для которых геокодер вернул ошибку
+    failed_slugs = [fields['slug'] for fields in records if fields['address'] not in coordinates]
+    known_addresses = dict(Shop.objects.filter(slug__in=failed_slugs).values_list('slug', 'address'))
+
+    now = timezone.now()
+    shops, kept = [], []
+    for fields, image in zip(records, chosen_images):
+        address = fields['address']
+        shop = Shop(
+            title=fields['title'],
+            address=address,
+            last_address=address,
+            phone=fields['phone'],
+            image=os.path.join('shops', image) if image in available_images else '',
+            working_hours=fields.get('working_hours', '10:00-20:00'),
+            description=fields.get('description', ''),
+            slug=fields['slug'],
+            meta_title=fields.get('meta_title', ''),
+            meta_description=fields.get('meta_description', ''),
+            order=fields.get('order', 0),
+            is_active=fields.get('is_active', True),
+        )
+        if address not in coordinates:
+            if known_addresses.get(shop.slug) == address:
+                kept.append(shop)
+                continue
+            shop.geocode_status, shop.geocode_retry_at = 'pending', now
+        elif coordinates[address]:
+            shop.geocode_status = 'done'
+            shop.coord_x, shop.coord_y = coordinates[address]
+        else:
+            shop.geocode_status = 'not_found'
+        shops.append(shop)
+
+    for batch, update_fields in ((shops, UPSERT_FIELDS + GEOCODE_UPSERT_FIELDS), (kept, UPSERT_FIELDS)):
+        if batch:
+            Shop.objects.bulk_create(
+                batch, batch_size=UPSERT_BATCH_SIZE, update_conflicts=True,
+                unique_fields=['slug'], update_fields=update_fields,
+            )
+
+    return {
+        'shops': len(shops) + len(kept),
+        'geocoded': sum(shop.geocode_status == 'done' for shop in shops),
+        'not_found': sum(shop.geocode_status == 'not_found' for shop in shops),
+        'pending': sum(shop.geocode_status == 'pending' for shop in shops),
+        'kept': len(kept),
+        'images_copied': images_copied,
+        'images_skipped': images_skipped,
+    }
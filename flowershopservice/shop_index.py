@@ -0,0 +1,276 @@
+import heapq
+import logging
+import math
+import threading
+from array import array
+
+from django.conf import settings
+
+from . import versions
+from .models import Shop
+
+try:
+    import numpy as np
+except ImportError:  # NumPy есть в requirements.txt; без него расстояния считаются в цикле
+    np = None
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+# Размер ячейки сетки подбирается так, чтобы в ячейке было около
+# SHOPS_PER_CELL магазинов, но в пределах от 100 м до 50 км по широте
+SHOPS_PER_CELL = 4
+MIN_CELL_DEGREES = 0.001
+MAX_CELL_DEGREES = 0.5
+# Сколько ближайших магазинов можно запросить за раз
+MAX_LIMIT = 20
+
+_lock = threading.Lock()
+# (версия магазинов, индекс) последнего построения в этом процессе
+_current = (None, None)
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Расстояние между двумя точками по поверхности Земли, км"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def haversine_many(lat, lng, lats, lngs):
+    """
+    Расстояния от точки до набора точек, км.
+
+    С NumPy считается векторно и возвращается ndarray, без него - список.
+    """
+    if np is not None:
+        lat, lng = math.radians(lat), math.radians(lng)
+        lats = np.radians(np.asarray(lats, dtype=float))
+        lngs = np.radians(np.asarray(lngs, dtype=float))
+        a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return [haversine(lat, lng, other_lat, other_lng) for other_lat, other_lng in zip(lats, lngs)]
+
+
+def _smallest(distances, limit):
+    """Позиции limit наименьших расстояний по возрастанию"""
+    if np is not None:
+        if limit < len(distances):
+            positions = np.argpartition(distances, limit)[:limit]
+        else:
+            positions = np.arange(len(distances))
+        return positions[np.argsort(distances[positions])].tolist()
+    return heapq.nsmallest(limit, range(len(distances)), key=distances.__getitem__)
+
+
+def _cell(lat, lng, size):
+    return math.floor(lat / size), math.floor(lng / size)
+
+
+def _spread(values):
+    """Разброс значений без 5% крайних с каждой стороны: отдельные далекие магазины не укрупняют сетку"""
+    values = sorted(values)
+    margin = len(values) // 20
+    return max(values[-1 - margin] - values[margin], MIN_CELL_DEGREES)
+
+
+def _cell_size(rows):
+    """Размер ячейки в градусах по плотности магазинов"""
+    if len(rows) < 2:
+        return MAX_CELL_DEGREES
+    area = _spread(row['coord_x'] for row in rows) * _spread(row['coord_y'] for row in rows)
+    size = math.sqrt(area * SHOPS_PER_CELL / len(rows))
+    return min(MAX_CELL_DEGREES, max(MIN_CELL_DEGREES, size))
+
+
+def build_index():
+    """
+    Строит сеточный индекс активных магазинов с координатами.
+
+    Индекс хранит:
+        - 'shops': данные магазинов для ответа (id, название, адрес, ...)
+        - 'lats' / 'lngs': координаты магазинов по позициям
+        - 'cell_size': размер ячейки сетки в градусах
+        - 'cells': {(строка, столбец) сетки: позиции магазинов в ячейке}
+        - 'bounds': крайние ячейки, дальше которых поиск не идет
+
+    Returns:
+        dict: Индекс
+    """
+    rows = list(
+        Shop.objects.filter(is_active=True, coord_x__isnull=False, coord_y__isnull=False)
+        .order_by('order', 'id')
+        .values('id', 'title', 'slug', 'address', 'phone', 'working_hours', 'coord_x', 'coord_y')
+    )
+    cell_size = _cell_size(rows)
+    cells = {}
+    for position, row in enumerate(rows):
+        cells.setdefault(_cell(row['coord_x'], row['coord_y'], cell_size), array('l')).append(position)
+
+    lats = array('d', (row['coord_x'] for row in rows))
+    lngs = array('d', (row['coord_y'] for row in rows))
+    if np is not None:
+        lats, lngs = np.array(lats), np.array(lngs)
+        cells = {key: np.array(positions, dtype=np.intp) for key, positions in cells.items()}
+
+    bounds = None
+    if cells:
+        bounds = (min(key[0] for key in cells), max(key[0] for key in cells),
+                  min(key[1] for key in cells), max(key[1] for key in cells))
+    logger.info(f"Индекс магазинов построен: {len(rows)} магазинов, {len(cells)} ячеек")
+    return {'shops': rows, 'lats': lats, 'lngs': lngs, 'cell_size': cell_size, 'cells': cells, 'bounds': bounds}
+
+
+def get_index():
+    """
+    Индекс из памяти процесса; перестраивается, если магазины изменились.
+
+    Любое изменение магазинов (сохранение, массовые update и bulk_create,
+    воркер геокодирования) меняет версию магазинов, поэтому отдельные
+    сигналы для сброса индекса не нужны. Изменения букетов и категорий
+    эту версию не меняют и индекс не перестраивают.
+    """
+    global _current
+    version = versions.get(versions.SHOPS)
+    built_version, index = _current
+    if built_version == version:
+        return index
+    with _lock:
+        built_version, index = _current
+        if built_version != version:
+            index = build_index()
+            _current = (version, index)
+    return index
+
+
+def invalidate_index():
+    global _current
+    _current = (None, None)
+
+
+def _ring(center, radius, bounds):
+    """
+    Ячейки на расстоянии radius от центральной (по большей из координат),
+    попадающие в границы сетки
+    """
+    row, column = center
+    min_row, max_row, min_column, max_column = bounds
+    if radius == 0:
+        yield center
+        return
+    first_column, last_column = max(column - radius, min_column), min(column + radius, max_column)
+    for edge_row in (row - radius, row + radius):
+        if min_row <= edge_row <= max_row:
+            for edge_column in range(first_column, last_column + 1):
+                yield edge_row, edge_column
+    first_row, last_row = max(row - radius + 1, min_row), min(row + radius - 1, max_row)
+    for edge_column in (column - radius, column + radius):
+        if min_column <= edge_column <= max_column:
+            for edge_row in range(first_row, last_row + 1):
+                yield edge_row, edge_column
+
+
+def _ring_bound(lat, radius, size):
+    """
+    Нижняя граница расстояния до магазинов за пределами первых radius колец, км.
+
+    Такой магазин отстоит от точки не меньше чем на radius ячеек по широте
+    или по долготе; по долготе расстояние оценивается через расстояние до
+    меридиана на самой высокой широте, где он может находиться.
+    """
+    step = math.radians(radius * size)
+    by_latitude = EARTH_RADIUS_KM * step
+    highest = math.radians(min(90.0, abs(lat) + (radius + 1) * size))
+    by_longitude = EARTH_RADIUS_KM * math.asin(min(1.0, math.cos(highest) * math.sin(min(step, math.pi / 2))))
+    return min(by_latitude, by_longitude)
+
+
+def _candidates(index, members, lat, lng):
+    """Позиции магазинов из списка ячеек и расстояния до них"""
+    if not members:
+        return [], []
+    if np is not None:
+        positions = np.concatenate(members)
+        return positions.tolist(), haversine_many(lat, lng, index['lats'][positions], index['lngs'][positions])
+    positions = [position for cell in members for position in cell]
+    return positions, haversine_many(
+        lat, lng, [index['lats'][p] for p in positions], [index['lngs'][p] for p in positions],
+    )
+
+
+def nearest(lat, lng, limit=1, index=None):
+    """
+    Ближайшие к точке активные магазины.
+
+    Поиск идет кольцами ячеек вокруг точки и останавливается, когда
+    найденные магазины ближе любого магазина за пределами просмотренных колец.
+    Если точка далеко от магазинов и пустых ячеек приходится просматривать
+    больше, чем всего магазинов, расстояния считаются до всех магазинов сразу.
+
+    Returns:
+        list[tuple[dict, float]]: (магазин, расстояние в км) по возрастанию расстояния
+    """
+    index = index or get_index()
+    if not index['cells']:
+        return []
+    limit = max(1, min(limit, len(index['shops'])))
+
+    center = _cell(lat, lng, index['cell_size'])
+    min_row, max_row, min_column, max_column = index['bounds']
+    # Кольца ближе first_radius не пересекают сетку, дальше last_radius - пусты
+    first_radius = max(min_row - center[0], center[0] - max_row, min_column - center[1], center[1] - max_column, 0)
+    last_radius = max(abs(center[0] - min_row), abs(center[0] - max_row),
+                      abs(center[1] - min_column), abs(center[1] - max_column))
+
+    # Лучшие limit кандидатов: куча (-расстояние, позиция), на вершине самый дальний
+    best = []
+    cells = index['cells']
+    visited = 0
+    for radius in range(first_radius, last_radius + 1):
+        ring = list(_ring(center, radius, index['bounds']))
+        visited += len(ring)
+        if visited > len(index['shops']):
+            positions, distances = _candidates(index, list(cells.values()), lat, lng)
+            return [(index['shops'][positions[i]], float(distances[i])) for i in _smallest(distances, limit)]
+        positions, distances = _candidates(index, [cells[key] for key in ring if key in cells], lat, lng)
+        for i in _smallest(distances, min(limit, len(positions))) if positions else ():
+            item = (-float(distances[i]), positions[i])
+            if len(best) < limit:
+                heapq.heappush(best, item)
+            elif item > best[0]:
+                heapq.heapreplace(best, item)
+        if len(best) == limit and -best[0][0] <= _ring_bound(lat, radius, index['cell_size']):
+            break
+
+    return [(index['shops'][position], -distance) for distance, position in sorted(best, reverse=True)]
+
+
+def nearest_shop(lat, lng, index=None):
+    """
+    Ближайший к точке активный магазин.
+
+    Returns:
+        tuple[dict, float]: (магазин, расстояние в км) или None, если магазинов с координатами нет
+    """
+    result = nearest(lat, lng, limit=1, index=index)
+    return result[0] if result else None
+
+
+def estimate_delivery(lat, lng, index=None):
+    """
+    Ближайший магазин, расстояние до него по прямой и оценка времени в пути.
+
+    Время считается по DELIVERY_SPEED_KMH с поправкой DELIVERY_ROUTE_FACTOR
+    на то, что путь по дорогам длиннее прямой. Без index индекс берется
+    из get_index, то есть с чтением версии магазинов из базы.
+
+    Returns:
+        dict: Поля заказа nearest_shop_id, distance_km, eta_minutes
+        (None, если магазинов с координатами нет)
+    """
+    found = nearest_shop(lat, lng, index=index)
+    if found is None:
+        return {'nearest_shop_id': None, 'distance_km': None, 'eta_minutes': None}
+    shop, distance = found
+    eta_minutes = math.ceil(distance * settings.DELIVERY_ROUTE_FACTOR / settings.DELIVERY_SPEED_KMH * 60)
+    return {'nearest_shop_id': shop['id'], 'distance_km': round(distance, 3), 'eta_minutes': eta_minutes}
@@ -1,7 +1,7 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Order, Consultation, ShopUser
-from .telegram_service import TelegramNotifier
+from .models import Order, Consultation, ShopUser, Product, Category, PriceRange, Shop, DeliveryTimeSlot
+from . import search, catalog_version, versions, delivery_slots, notifications, recipients
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,20 +12,9 @@ def notify_order_created(sender, instance, created, **kwargs):
     logger.info(f"Signal received for Order. Created: {created}")
     if created:
         logger.info("Сработал сигнал для нового заказа")
-        message = (
-            f"🛒 Новый заказ #{instance.id}\n"
-            f"Клиент: {instance.user.full_name}\n"
-            f"Телефон: {instance.user.phone}\n"
-            f"Букет: {instance.product_name}\n"
-            f"Адрес: {instance.delivery_address}"
-        )
-        
-        # # Отправка в общий чат (закомментировано)
-        # result = TelegramNotifier.send_message(message)
-        # logger.info(f"Message sent to main channel: {result}")
-        
-        # Индивидуальные уведомления менеджерам
-        send_to_managers(message)
+        # Уведомления менеджерам ставятся в очередь в той же транзакции,
+        # что и заказ; отправляет их воркер dispatch_notifications
+        notifications.notify(notifications.ORDER_CREATED, instance)
 
 @receiver(pre_save, sender=Order)
 def notify_order_status_changed(sender, instance, **kwargs):
@@ -33,54 +22,33 @@ def notify_order_status_changed(sender, instance, **kwargs):
     Обработчик сигнала изменения статуса заказа.
     Отправляет уведомление доставщику, когда заказ переходит в статус "В доставке".
     """
-    # Получаем текущий заказ из базы данных
+    if not instance.pk:
+        # Заказ новый, ничего не делаем
+        return
     try:
-        # Проверяем, существует ли заказ в базе данных
-        if instance.pk:
-            # Получаем текущее состояние заказа из базы данных
-            current_order = Order.objects.get(pk=instance.pk)
+        # Прежние значения берутся из снимка, сделанного при загрузке заказа
+        previous = instance.get_previous_values('status', 'delivery_person_id')
+        if previous is None:
+            return
+        
+        logger.info(
+            f"Сигнал pre_save для заказа #{instance.id}: "
+            f"статус {previous['status']} -> {instance.status}, "
+            f"доставщик {previous['delivery_person_id'] or 'не назначен'} -> "
+            f"{instance.delivery_person_id or 'не назначен'}"
+        )
+        
+        # Уведомление отправляется, когда заказ переходит в статус "В доставке"
+        # или когда заказу в доставке назначается другой доставщик
+        if (instance.status == 'inDelivery' and instance.delivery_person_id is not None and
+                (previous['status'] != 'inDelivery' or
+                 previous['delivery_person_id'] != instance.delivery_person_id)):
             
-            # Логируем подробную информацию о заказе
-            logger.info(f"Сигнал pre_save для заказа #{instance.id}")
-            logger.info(f"Текущий статус заказа: {current_order.status}")
-            logger.info(f"Новый статус заказа: {instance.status}")
-            logger.info(f"Текущий доставщик: {current_order.delivery_person.full_name if current_order.delivery_person else 'не назначен'}")
-            logger.info(f"Новый доставщик: {instance.delivery_person.full_name if instance.delivery_person else 'не назначен'}")
+            logger.info(f"Order #{instance.id} status changed to 'inDelivery'")
+            
+            # Уведомление получает только доставщик
+            notifications.notify(notifications.ORDER_IN_DELIVERY, instance)
             
-            # Проверяем изменение статуса на "В доставке" или изменение доставщика вместе со статусом "В доставке"
-            # Первое условие - если статус заказа изменился на "inDelivery"
-            # Второе условие - если одновременно назначается доставщик и устанавливается статус "inDelivery"
-            if ((current_order.status != 'inDelivery' and instance.status == 'inDelivery' and instance.delivery_person is not None) or
-                (instance.status == 'inDelivery' and
-                 instance.delivery_person is not None and
-                 (current_order.delivery_person is None or current_order.delivery_person.id != instance.delivery_person.id))):
-                
-                logger.info(
-                    f"Order #{instance.id} status changed to 'inDelivery'. "
-                    f"Sending notification to delivery person: {instance.delivery_person.full_name}"
-                )
-                
-                # Формируем текст уведомления для доставщика
-                message = (
-                    f"🚚 Заказ #{instance.id} готов к доставке!\n"
-                    f"Клиент: {instance.user.full_name}\n"
-                    f"Телефон: {instance.user.phone}\n"
-                    f"Букет: {instance.product_name}\n"
-                    f"Адрес: {instance.delivery_address}\n"
-                    f"Доставка: {instance.delivery_date.strftime('%d.%m.%Y')}, "
-                    f"{instance.delivery_time_from.strftime('%H:%M') if instance.delivery_time_from else '-'} - "
-                    f"{instance.delivery_time_to.strftime('%H:%M') if instance.delivery_time_to else '-'}"
-                )
-                
-                # Отправляем уведомление только доставщику
-                send_to_delivery_person(instance.delivery_person, message)
-                
-                # Убираем отправку уведомления менеджерам о заказе в доставке
-                # Это сообщение больше не отправляется менеджерам
-                
-    except Order.DoesNotExist:
-        # Заказ новый, ничего не делаем
-        pass
     except Exception as e:
         logger.error(f"Error in order status change signal: {str(e)}")
 
@@ -89,128 +57,138 @@ def notify_consultation_created(sender, instance, created, **kwargs):
     """Обработчик сигнала создания новой заявки на консультацию."""
     logger.info(f"Signal received for Consultation. Created: {created}")
     if created:
-        message = (
-            f"📞 Новая заявка на консультацию\n"
-            f"Клиент: {instance.user.full_name}\n"
-            f"Телефон: {instance.user.phone}\n"
-            f"Время: {instance.creation_date.strftime('%d.%m.%Y %H:%M')}"
-        )
-        
-        # # Отправка в общий чат (закомментировано)
-        # result = TelegramNotifier.send_message(message)
-        # logger.info(f"Message sent to main channel: {result}")
-        
-        # Индивидуальные уведомления менеджерам
-        send_to_managers(message)
+        # Индивидуальные уведомления менеджерам (через очередь)
+        notifications.notify(notifications.CONSULTATION_CREATED, instance)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_price_ranges(sender, instance, **kwargs):
+    """Пересчитывает принадлежность букета ценовым диапазонам"""
+    PriceRange.rebuild_memberships(product_ids=[instance.id])
+
+
+@receiver(post_save, sender=PriceRange)
+def refresh_price_range_members(sender, instance, **kwargs):
+    """Пересчитывает состав ценового диапазона после изменения его границ"""
+    PriceRange.rebuild_memberships(price_range_ids=[instance.id])
+
+
+@receiver(post_save, sender=Product)
+def update_search_index_for_product(sender, instance, **kwargs):
+    search.index_product(instance.id)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search_index(sender, instance, **kwargs):
+    search.remove_product(instance.id)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def update_search_index_for_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    """Названия категорий тоже участвуют в поиске"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        search.index_product(instance.id)
+    elif pk_set:
+        search.rebuild_index(product_ids=pk_set)
+    else:
+        # category.product_set.clear(): букеты уже отвязаны, проще перестроить индекс
+        search.rebuild_index()
+
+
+@receiver(post_save, sender=Category)
+def update_search_index_for_category(sender, instance, created, **kwargs):
+    """Переименование категории меняет документы всех ее букетов"""
+    if not created:
+        search.rebuild_index(product_ids=instance.product_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_products(sender, instance, **kwargs):
+    instance._search_product_ids = list(instance.product_set.values_list('id', flat=True))
 
-def send_to_managers(message, delay=0.5):
+
+@receiver(post_delete, sender=Category)
+def update_search_index_after_category_delete(sender, instance, **kwargs):
+    search.rebuild_index(product_ids=getattr(instance, '_search_product_ids', []))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=PriceRange)
+@receiver(post_delete, sender=PriceRange)
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+def bump_catalog_version(sender, **kwargs):
     """
-    Отправляет уведомления всем менеджерам с telegram_id.
-    
-    Args:
-        message: Текст сообщения
-        delay: Задержка между отправками в секундах (не используется)
+    Любое изменение каталога меняет его версию: от нее зависят ETag страниц
+    каталога и ключи кэша фасетов и индекса квиза.
     """
-    # Получаем всех менеджеров с указанным telegram_id
-    managers = ShopUser.objects.filter(
-        status='manager',
-        telegram_id__isnull=False
-    ).exclude(telegram_id='')
-    
-    if not managers.exists():
-        logger.warning("No managers with Telegram ID found")
-        return
-    
-    logger.info(f"Sending notifications to {managers.count()} managers")
-    
-    # Отправка индивидуальных сообщений каждому менеджеру
-    for manager in managers:
-        personal_message = (
-            f"👋 {manager.full_name}, у вас новое уведомление!\n\n{message}"
-        )
-        
-        try:
-            result = TelegramNotifier.send_to_user(
-                manager.telegram_id, 
-                personal_message
-            )
-            
-            if result:
-                logger.info(
-                    f"Notification sent to {manager.full_name}"
-                )
-            else:
-                logger.warning(
-                    f"Failed to send to {manager.full_name}"
-                )
-        except Exception as e:
-            logger.error(
-                f"Error sending to {manager.full_name}: {str(e)}"
-            )
-            
-    # # Групповая рассылка (закомментирована)
-    # telegram_ids = [m.telegram_id for m in managers]
-    # try:
-    #     group_message = f"📢 Групповое уведомление!\n\n{message}"
-    #     results = TelegramNotifier.send_to_multiple_users(
-    #         telegram_ids, group_message, delay
-    #     )
-    #     success = sum(1 for r in results.values() if r)
-    #     logger.info(f"Group message: {success}/{len(telegram_ids)} sent")
-    # except Exception as e:
-    #     logger.error(f"Error in group message: {str(e)}")
-
-def send_to_delivery_person(delivery_person, message):
+    if kwargs.get('action', 'post_').startswith('post_'):
+        catalog_version.bump()
+
+
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+def bump_shops_version(sender, **kwargs):
+    """От версии магазинов зависят список активных магазинов и индекс ближайших магазинов"""
+    versions.bump(versions.SHOPS)
+
+
+@receiver(post_save, sender=DeliveryTimeSlot)
+@receiver(post_delete, sender=DeliveryTimeSlot)
+def invalidate_delivery_slots(sender, **kwargs):
+    """Расписание доставки кэшируется целиком, поэтому сбрасывается при любом изменении слота"""
+    delivery_slots.invalidate_slots()
+
+
+def _booking_key(order):
+    """Слот и дата, которые занимает заказ (отмененный заказ слот не занимает)"""
+    if order.status == 'cancelled' or not order.delivery_slot_id or not order.delivery_date:
+        return None
+    return order.delivery_slot_id, order.delivery_date
+
+
+@receiver(pre_save, sender=Order)
+def update_slot_booking(sender, instance, **kwargs):
     """
-    Отправляет уведомление доставщику о новом заказе на доставку.
-    
-    Args:
-        delivery_person: Объект ShopUser с ролью доставщика
-        message: Текст сообщения
+    Поддерживает счетчики загрузки слотов при отмене заказа, ее откате
+    или переносе заказа на другой слот/дату.
+
+    Освобождается место только у заказа, который его занимал (holds_slot):
+    заказ, созданный в админке или из shell, в счетчике не учтен.
     """
-    if not delivery_person:
-        logger.warning("No delivery person specified for notification")
+    if not instance.pk:
         return
-    
-    logger.info(f"Подготовка отправки уведомления доставщику {delivery_person.full_name}")
-    logger.info(f"Telegram ID доставщика: {delivery_person.telegram_id}")
-    
-    if not delivery_person.telegram_id:
-        logger.warning(
-            f"Delivery person {delivery_person.full_name} has no Telegram ID"
-        )
+    current = instance.get_previous_values('status', 'delivery_slot_id', 'delivery_date', 'holds_slot')
+    if current is None:
         return
-    
-    # Проверяем валидность telegram_id - должен быть числом
-    try:
-        int(delivery_person.telegram_id)
-    except ValueError:
-        logger.error(f"Неправильный формат Telegram ID: {delivery_person.telegram_id}")
+    holds_slot = current.pop('holds_slot')
+    old_key = _booking_key(Order(**current))
+    new_key = _booking_key(instance)
+    if old_key == new_key:
         return
-    
-    personal_message = (
-        f"👋 {delivery_person.full_name}, у вас новый заказ на доставку!\n\n"
-        f"{message}"
-    )
-    
-    logger.info(f"Отправка сообщения доставщику {delivery_person.full_name} (ID: {delivery_person.telegram_id})")
-    
-    try:
-        result = TelegramNotifier.send_to_user(
-            delivery_person.telegram_id, personal_message
-        )
-        
-        if result:
-            logger.info(
-                f"✅ Delivery notification sent to {delivery_person.full_name}"
-            )
-        else:
-            logger.warning(
-                f"❌ Failed to send delivery notification to "
-                f"{delivery_person.full_name}"
-            )
-    except Exception as e:
-        logger.error(
-            f"❌ Error sending to delivery person {delivery_person.full_name}: "
-            f"{str(e)}"
-        )
\ No newline at end of file
+    if old_key and holds_slot:
+        delivery_slots.release_slot(*old_key)
+    if new_key:
+        # Изменение вносит менеджер, поэтому лимит слота не проверяется
+        delivery_slots.reserve_slot(*new_key, capacity=0, force=True)
+    instance.holds_slot = bool(new_key)
+
+
+@receiver(post_delete, sender=Order)
+def release_slot_for_deleted_order(sender, instance, **kwargs):
+    key = _booking_key(instance)
+    if key and instance.holds_slot:
+        delivery_slots.release_slot(*key)
+
+
+@receiver(post_save, sender=ShopUser)
+@receiver(post_delete, sender=ShopUser)
+def invalidate_recipients(sender, **kwargs):
+    """Реестр получателей уведомлений перестраивается после изменения пользователей"""
+    recipients.invalidate()
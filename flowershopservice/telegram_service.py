@@ -1,99 +1,282 @@
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
-import time
 
 logger = logging.getLogger(__name__)
 
+REQUEST_TIMEOUT = 10
+# Сколько сообщений отправляется параллельно
+MAX_WORKERS = 8
+# Ограничения Bot API: около 30 сообщений в секунду всего и 1 в секунду в один чат
+GLOBAL_RATE = 30
+GLOBAL_BURST = 30
+PER_CHAT_RATE = 1
+PER_CHAT_BURST = 1
+# Сколько раз повторять отправку после ответа 429 Too Many Requests
+MAX_RATE_LIMIT_RETRIES = 3
+# Сообщения длиннее Bot API отклоняет ответом 400 "message is too long"
+MAX_MESSAGE_LENGTH = 4096
+# Ответы, после которых повторная отправка того же сообщения бессмысленна
+PERMANENT_STATUS_CODES = (400, 403)
+# Описания ошибок Bot API, означающие, что получатель недоступен для бота
+BLOCKED_DESCRIPTIONS = (
+    'bot was blocked by the user',
+    'user is deactivated',
+    'chat not found',
+    'bot was kicked',
+)
+
+
+class SendResult:
+    """
+    Результат отправки сообщения.
+
+    Приводится к bool (успешна ли отправка). При ошибке retryable говорит,
+    стоит ли повторить отправку позже (5xx, таймауты, 429), а blocked -
+    что получатель заблокировал бота или удален.
+    """
+
+    def __init__(self, ok, retryable=False, blocked=False, error=''):
+        self.ok = ok
+        self.retryable = retryable
+        self.blocked = blocked
+        self.error = error
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        if self.ok:
+            return 'SendResult(ok)'
+        kind = 'blocked' if self.blocked else 'retryable' if self.retryable else 'permanent'
+        return f'SendResult({kind}: {self.error})'
+
+
+SENT = SendResult(True)
+
+
+def message_length(text):
+    """Длина текста так, как ее считает Telegram: в единицах UTF-16 (эмодзи - две)"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+class TokenBucket:
+    """
+    Ограничитель скорости "ведро токенов".
+
+    Токены восполняются со скоростью rate в секунду, но не больше capacity.
+    Если токена нет, вызывающий поток ждет своей очереди: токены можно брать
+    в долг, поэтому потоки обслуживаются в порядке обращения.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def try_acquire(self):
+        """Берет токен без ожидания; False, если токенов нет"""
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def pause(self, seconds):
+        """Запрещает отправку на seconds секунд (ответ 429 с retry_after)"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class RateLimiter:
+    """Общий лимит бота и отдельные лимиты для каждого чата"""
+
+    def __init__(self, global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST,
+                 chat_rate=PER_CHAT_RATE, chat_burst=PER_CHAT_BURST):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}
+        self.lock = threading.Lock()
+
+    def chat_bucket(self, chat_id):
+        chat_id = str(chat_id)
+        with self.lock:
+            bucket = self.chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            return bucket
+
+    def acquire(self, chat_id):
+        self.chat_bucket(chat_id).acquire()
+        self.global_bucket.acquire()
+
+
+def _create_session():
+    # Одна сессия на процесс: соединения с API переиспользуются (keep-alive)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = _create_session()
+_limiter = RateLimiter()
+
+
+def _retry_after(response):
+    try:
+        return float(response.json().get('parameters', {}).get('retry_after', 1))
+    except ValueError:
+        return 1.0
+
+
+def _error_result(response):
+    """Классифицирует ответ Bot API с ошибкой"""
+    try:
+        description = response.json().get('description', '')
+    except ValueError:
+        description = response.text[:200]
+    error = f"HTTP {response.status_code}: {description}"
+    if response.status_code not in PERMANENT_STATUS_CODES:
+        return SendResult(False, retryable=True, error=error)
+    blocked = any(reason in description.lower() for reason in BLOCKED_DESCRIPTIONS)
+    return SendResult(False, blocked=blocked, error=error)
+
+
 class TelegramNotifier:
     @staticmethod
-    def send_message(text: str):
-        """Отправка сообщения в общий чат Telegram."""
+    def _post(chat_id, text):
+        """
+        Отправляет сообщение через sendMessage с учетом лимитов Bot API.
+
+        При ответе 429 чат ставится на паузу на retry_after секунд, после чего
+        отправка повторяется (не больше MAX_RATE_LIMIT_RETRIES раз).
+
+        Returns:
+            SendResult: Результат отправки с классификацией ошибки
+        """
         token = settings.TELEGRAM_BOT_TOKEN
-        chat_id = settings.TELEGRAM_CHAT_ID
-        
-        if not token or not chat_id:
-            logger.error("Telegram credentials not configured!")
-            return False
+        if not token:
+            logger.error("Telegram BOT TOKEN not configured!")
+            return SendResult(False, retryable=True, error='Telegram BOT TOKEN not configured')
 
-        url = f"https://api.telegram.org/bot{token}/sendMessage"
+        url = f"{settings.TELEGRAM_API_URL}/bot{token}/sendMessage"
         payload = {
             "chat_id": chat_id,
             "text": text,
             "parse_mode": "HTML"
         }
 
-        try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            return True
-        except Exception as e:
-            logger.error(f"Telegram send error: {str(e)}")
-            return False
-    
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            _limiter.acquire(chat_id)
+            try:
+                response = _session.post(url, json=payload, timeout=REQUEST_TIMEOUT)
+            except requests.RequestException as e:
+                # Таймауты и сетевые ошибки временные
+                logger.error(f"Telegram send error to {chat_id}: {e}")
+                return SendResult(False, retryable=True, error=str(e))
+
+            if response.status_code == 429:
+                retry_after = _retry_after(response)
+                logger.warning(f"Telegram rate limit for {chat_id}, retry after {retry_after} s")
+                _limiter.chat_bucket(chat_id).pause(retry_after)
+                continue
+
+            if response.ok:
+                return SENT
+            result = _error_result(response)
+            logger.error(f"Telegram send error to {chat_id}: {result.error}")
+            return result
+
+        logger.error(f"Telegram rate limit retries exhausted for {chat_id}")
+        return SendResult(False, retryable=True, error='HTTP 429: rate limit retries exhausted')
+
+    @staticmethod
+    def send_message(text: str):
+        """Отправка сообщения в общий чат Telegram."""
+        chat_id = settings.TELEGRAM_CHAT_ID
+
+        if not settings.TELEGRAM_BOT_TOKEN or not chat_id:
+            logger.error("Telegram credentials not configured!")
+            return SendResult(False, retryable=True, error='Telegram credentials not configured')
+
+        return TelegramNotifier._post(chat_id, text)
+
     @staticmethod
     def send_to_user(telegram_id: str, text: str):
         """Отправка сообщения пользователю по его Telegram ID."""
         if not telegram_id:
             logger.warning("Telegram ID not provided for message")
-            return False
-            
-        token = settings.TELEGRAM_BOT_TOKEN
-        
-        if not token:
-            logger.error("Telegram BOT TOKEN not configured!")
-            return False
+            return SendResult(False, error='Telegram ID not provided')
 
-        url = f"https://api.telegram.org/bot{token}/sendMessage"
-        payload = {
-            "chat_id": telegram_id,
-            "text": text,
-            "parse_mode": "HTML"
-        }
+        return TelegramNotifier._post(telegram_id, text)
+
+    @staticmethod
+    def send_many(messages):
+        """
+        Параллельно отправляет сообщения (не больше MAX_WORKERS одновременно).
+
+        Скорость ограничивается общим лимитом бота и лимитом каждого чата.
+
+        Args:
+            messages: Список пар (telegram_id, text)
+
+        Returns:
+            list[SendResult]: Результаты в порядке messages
+        """
+        messages = list(messages)
+        if not messages:
+            return []
+        if len(messages) == 1:
+            return [TelegramNotifier.send_to_user(*messages[0])]
+
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(messages))) as executor:
+            return list(executor.map(lambda message: TelegramNotifier.send_to_user(*message), messages))
 
-        try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            return True
-        except Exception as e:
-            logger.error(
-                f"Telegram send error to user {telegram_id}: {e}"
-            )
-            return False
-    
     @staticmethod
     def send_to_multiple_users(
-        telegram_ids: list, 
-        text: str, 
-        delay: float = 0.5
+        telegram_ids: list,
+        text: str,
+        delay: float = None
     ):
         """
-        Отправка сообщения нескольким пользователям с задержкой.
-        
+        Отправка сообщения нескольким пользователям.
+
         Args:
             telegram_ids: Список Telegram ID получателей
             text: Текст сообщения
-            delay: Задержка между отправками в секундах (по умолчанию 0.5 сек)
-        
+            delay: Не используется: темп отправки задает ограничитель скорости
+
         Returns:
             dict: Словарь с результатами отправки для каждого получателя
         """
+        telegram_ids = [tid for tid in telegram_ids if tid]
         if not telegram_ids:
             logger.warning("No Telegram IDs provided for messages")
             return {}
-            
-        results = {}
-        
-        for tid in telegram_ids:
-            if not tid:
-                continue
-                
-            # Отправляем сообщение текущему получателю
-            success = TelegramNotifier.send_to_user(tid, text)
-            results[tid] = success
-            
-            # Делаем задержку если это не последний получатель
-            if tid != telegram_ids[-1]:
-                time.sleep(delay)
-        
-        return results
\ No newline at end of file
+
+        results = TelegramNotifier.send_many((tid, text) for tid in telegram_ids)
+        return dict(zip(telegram_ids, results))
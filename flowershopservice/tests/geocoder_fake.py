@@ -0,0 +1,113 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Область, в которую попадают координаты имитатора (Красноярск)
+LATITUDE_RANGE = (55.95, 56.10)
+LONGITUDE_RANGE = (92.75, 93.05)
+
+
+class FakeGeocoder:
+    """
+    Локальный сервер, имитирующий HTTP API Яндекс.Геокодера.
+
+    Для каждого адреса возвращает одни и те же координаты, вычисленные по
+    хэшу адреса. Задержка ответа, ненайденные адреса и ошибки API задаются
+    параметрами и методом fail().
+
+    Пример:
+        with FakeGeocoder(latency=0.05) as geocoder:
+            with override_settings(YANDEX_GEOCODER_URL=geocoder.url):
+                geocoding.lookup('ул. Ленина, 112')
+    """
+
+    def __init__(self, latency=0.0, not_found=()):
+        self.latency = latency
+        self.not_found = set(not_found)
+        self.failures = 0
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+        self.stopped = False
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/1.x/'
+
+    def start(self):
+        geocoder = self
+        self.stopped = False
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Заголовки и тело уходят разными пакетами: без этого keep-alive
+            # соединение ждет подтверждения по 40 мс на каждый ответ
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                if geocoder.stopped:
+                    self.close_connection = True
+                    return
+                query = parse_qs(urlparse(self.path).query)
+                status, data = geocoder.handle(query.get('geocode', [''])[0])
+                content = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped = True
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fail(self, count):
+        """Следующие count запросов получат ответ 500"""
+        with self.lock:
+            self.failures += count
+
+    @staticmethod
+    def coordinates_for(address):
+        digest = hashlib.md5(address.encode()).digest()
+        latitude = LATITUDE_RANGE[0] + digest[0] / 255 * (LATITUDE_RANGE[1] - LATITUDE_RANGE[0])
+        longitude = LONGITUDE_RANGE[0] + digest[1] / 255 * (LONGITUDE_RANGE[1] - LONGITUDE_RANGE[0])
+        return round(latitude, 6), round(longitude, 6)
+
+    def handle(self, address):
+        """Обрабатывает запрос геокодирования; возвращает (HTTP статус, тело ответа)"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests.append(address)
+            if self.failures:
+                self.failures -= 1
+                return 500, {'statusCode': 500, 'error': 'Internal Server Error'}
+
+        members = []
+        if address not in self.not_found:
+            latitude, longitude = self.coordinates_for(address)
+            members.append({'GeoObject': {'Point': {'pos': f'{longitude} {latitude}'}}})
+        return 200, {'response': {'GeoObjectCollection': {'featureMember': members}}}
@@ -0,0 +1,161 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flowershopservice.telegram_service import (
+    TokenBucket, GLOBAL_RATE, GLOBAL_BURST, PER_CHAT_RATE, PER_CHAT_BURST, MAX_MESSAGE_LENGTH, message_length,
+)
+
+PATH_RE = re.compile(r'^/bot[^/]+/sendMessage$')
+# Запас на сетевой разброс: сервер считает запросы по времени их прихода,
+# а клиент - по времени отправки
+LIMIT_TOLERANCE = 1.1
+
+
+class FakeBotAPI:
+    """
+    Локальный сервер, имитирующий метод sendMessage Telegram Bot API.
+
+    Нужен для замеров и проверки отправки без обращения к настоящему Telegram:
+    добавляет задержку ответа и, как Telegram, отвечает 429 с retry_after при
+    превышении общего лимита или лимита чата и 400 на слишком длинный текст. Ошибки для отдельных чатов
+    задаются через script() и block().
+
+    Пример:
+        with FakeBotAPI(latency=0.05) as api:
+            with override_settings(TELEGRAM_API_URL=api.url, TELEGRAM_BOT_TOKEN='test'):
+                TelegramNotifier.send_to_user('1', 'Привет')
+    """
+
+    def __init__(self, latency=0.0, enforce_limits=True, retry_after=1):
+        self.latency = latency
+        self.enforce_limits = enforce_limits
+        self.retry_after = retry_after
+        self.global_bucket = TokenBucket(GLOBAL_RATE * LIMIT_TOLERANCE, GLOBAL_BURST)
+        self.chat_buckets = {}
+        self.lock = threading.Lock()
+        self.received = []
+        self.rate_limited = 0
+        self.scripts = {}
+        self.blocked = set()
+        self.server = None
+        self.thread = None
+        self.stopped = False
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        api = self
+        self.stopped = False
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                if api.stopped:
+                    # Соединение keep-alive пережило остановку сервера: закрываем
+                    # его без ответа, как недоступный API
+                    self.close_connection = True
+                    return
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if not PATH_RE.match(self.path):
+                    self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                    return
+                payload = json.loads(body or b'{}')
+                status, data = api.handle(str(payload.get('chat_id')), payload.get('text', ''))
+                self._reply(status, data)
+
+            def _reply(self, status, data):
+                content = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped = True
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def script(self, chat_id, *errors):
+        """
+        Задает ошибки, которыми по очереди ответят запросы в чат.
+
+        Args:
+            errors: Пары (HTTP статус, описание); после них чат работает обычно
+        """
+        with self.lock:
+            self.scripts.setdefault(str(chat_id), []).extend(errors)
+
+    def block(self, chat_id):
+        """Чат отвечает 403, как если бы пользователь заблокировал бота"""
+        with self.lock:
+            self.blocked.add(str(chat_id))
+
+    def _scripted_error(self, chat_id):
+        with self.lock:
+            if chat_id in self.blocked:
+                return 403, 'Forbidden: bot was blocked by the user'
+            errors = self.scripts.get(chat_id)
+            if errors:
+                return errors.pop(0)
+        return None
+
+    def _chat_bucket(self, chat_id):
+        with self.lock:
+            bucket = self.chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self.chat_buckets[chat_id] = TokenBucket(PER_CHAT_RATE * LIMIT_TOLERANCE, PER_CHAT_BURST)
+            return bucket
+
+    def handle(self, chat_id, text):
+        """Обрабатывает sendMessage; возвращает (HTTP статус, тело ответа)"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        error = self._scripted_error(chat_id)
+        if error:
+            status, description = error
+            return status, {'ok': False, 'error_code': status, 'description': description}
+
+        if message_length(text) > MAX_MESSAGE_LENGTH:
+            return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: message is too long'}
+
+        if self.enforce_limits and not (self._chat_bucket(chat_id).try_acquire()
+                                        and self.global_bucket.try_acquire()):
+            with self.lock:
+                self.rate_limited += 1
+            return 429, {
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after},
+            }
+
+        with self.lock:
+            self.received.append((chat_id, text, time.monotonic()))
+            message_id = len(self.received)
+        return 200, {'ok': True, 'result': {'message_id': message_id, 'chat': {'id': chat_id}, 'text': text}}
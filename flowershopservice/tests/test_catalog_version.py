@@ -0,0 +1,63 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from flowershopservice import catalog_version, versions
+from flowershopservice.models import Category, DataVersion, Product, Shop
+
+
+class CatalogVersionTests(TestCase):
+    def test_version_is_stored_in_database(self):
+        version = catalog_version.get_version()
+        cache.clear()
+        self.assertEqual(catalog_version.get_version(), version)
+        self.assertEqual(DataVersion.objects.get(name=versions.CATALOG).version, version)
+
+    def test_bump_grows_even_if_clock_is_behind(self):
+        version = catalog_version.get_version()
+        with mock.patch.object(versions, '_now_version', return_value=version - 1000):
+            catalog_version.bump()
+            catalog_version.bump()
+        self.assertEqual(catalog_version.get_version(), version + 2)
+
+    def test_bump_creates_missing_row(self):
+        DataVersion.objects.all().delete()
+        catalog_version.bump()
+        self.assertEqual(DataVersion.objects.filter(name=versions.CATALOG).count(), 1)
+
+    def test_catalog_change_bumps_version(self):
+        version = catalog_version.get_version()
+        Category.objects.create(name='Свадебные')
+        self.assertGreater(catalog_version.get_version(), version)
+
+    def test_shops_version_ignores_bouquets(self):
+        shops_version = versions.get(versions.SHOPS)
+        Product.objects.create(name='Букет', price=1000)
+        Product.objects.update(price=1500)
+        self.assertEqual(versions.get(versions.SHOPS), shops_version)
+        Shop.objects.create(title='Магазин', address='ул. Ленина, 1', phone='-', image='shops/test.jpg', slug='lenina')
+        self.assertGreater(versions.get(versions.SHOPS), shops_version)
+        shops_version = versions.get(versions.SHOPS)
+        Shop.objects.update(is_active=False)
+        self.assertGreater(versions.get(versions.SHOPS), shops_version)
+
+
+class CatalogConditionalTests(TestCase):
+    def test_unchanged_catalog_is_not_modified(self):
+        # Первый ответ выставляет CSRF-cookie, от которой зависит ETag
+        self.client.get(reverse('catalog'))
+        response = self.client.get(reverse('catalog'))
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"catalog-'))
+        # Версия каталога читается один раз на запрос, хотя нужна и для ETag, и для Last-Modified
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('catalog'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_change_invalidates_etag(self):
+        self.client.get(reverse('catalog'))
+        etag = self.client.get(reverse('catalog'))['ETag']
+        Category.objects.create(name='Свадебные')
+        self.assertEqual(self.client.get(reverse('catalog'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,145 @@
+import datetime
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+
+from flowershopservice import delivery_slots, orders, versions
+from flowershopservice.models import DeliveryTimeSlot, Order, Product, ShopUser, SlotBooking
+
+# Сколько раз поток повторяет заказ, получив ошибку блокировки базы
+LOCK_RETRIES = 200
+
+
+class SlotCapacityTests(TestCase):
+    def setUp(self):
+        self.delivery_date = datetime.date.today() + datetime.timedelta(days=1)
+
+    def test_slot_without_capacity_is_unlimited(self):
+        slot = DeliveryTimeSlot.objects.create(time_start=datetime.time(10), time_end=datetime.time(12))
+        self.assertEqual(slot.capacity, 0)
+        for _ in range(20):
+            self.assertTrue(delivery_slots.reserve_slot(slot.id, self.delivery_date, slot.capacity))
+        self.assertTrue(delivery_slots.has_capacity(slot, {slot.id: 20}))
+
+    def test_full_slot_is_rejected(self):
+        slot = DeliveryTimeSlot.objects.create(time_start=datetime.time(10), time_end=datetime.time(12), capacity=2)
+        results = [delivery_slots.reserve_slot(slot.id, self.delivery_date, slot.capacity) for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(SlotBooking.objects.get(slot=slot).orders_count, 2)
+
+
+class OrderSlotBookingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.delivery_date = datetime.date.today() + datetime.timedelta(days=1)
+        self.slot = DeliveryTimeSlot.objects.create(time_start=datetime.time(10), time_end=datetime.time(12),
+                                                    capacity=5)
+        self.bouquet = Product.objects.create(name='Букет', description='-', composition='-', price=1000,
+                                              image='img/catalog/test.jpg')
+
+    def booked(self):
+        return SlotBooking.objects.filter(slot=self.slot).values_list('orders_count', flat=True).first() or 0
+
+    def create_order(self):
+        return orders.create_order({
+            'name': 'Анна', 'phone': '+79991234567', 'address': 'ул. Мира, 10',
+            'delivery_date': self.delivery_date.isoformat(), 'delivery_slot_id': self.slot.id,
+            'is_express': False, 'delivery_time_from': '10:00:00', 'delivery_time_to': '12:00:00',
+        }, self.bouquet.id)
+
+    def test_cancel_and_restore_of_site_order(self):
+        order = self.create_order()
+        self.assertEqual(self.booked(), 1)
+        order.status = 'cancelled'
+        order.save()
+        self.assertEqual(self.booked(), 0)
+        order.status = 'created'
+        order.save(update_fields=['status'])
+        self.assertEqual(self.booked(), 1)
+        Order.objects.get(id=order.id).delete()
+        self.assertEqual(self.booked(), 0)
+
+    def test_order_created_outside_site_does_not_release_others(self):
+        self.create_order()
+        user = ShopUser.objects.create(full_name='Борис', phone='+79990000002')
+        order = Order.objects.create(user=user, product_name='Букет', delivery_address='ул. Мира, 12',
+                                     delivery_slot=self.slot, delivery_date=self.delivery_date)
+        self.assertEqual(self.booked(), 1)
+        order.status = 'cancelled'
+        order.save()
+        order.delete()
+        self.assertEqual(self.booked(), 1)
+
+
+class SlotScheduleCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.slot = DeliveryTimeSlot.objects.create(time_start=datetime.time(10), time_end=datetime.time(12))
+
+    def test_schedule_is_cached(self):
+        delivery_slots.get_slots()
+        # В кэше расписание; из базы читается только его версия
+        with self.assertNumQueries(1):
+            self.assertEqual([slot.id for slot in delivery_slots.get_slots()], [self.slot.id])
+
+    def test_schedule_follows_version_bumped_by_another_process(self):
+        delivery_slots.get_slots()
+        # Изменение без сигналов: расписание берется из кэша процесса
+        DeliveryTimeSlot.objects.filter(id=self.slot.id).update(capacity=3)
+        self.assertEqual(delivery_slots.get_slot(self.slot.id).capacity, 0)
+        # Слот изменили в админке другого процесса, версия в базе обновилась
+        versions.bump(versions.DELIVERY_SLOTS)
+        self.assertEqual(delivery_slots.get_slot(self.slot.id).capacity, 3)
+
+
+class ConcurrentSlotBookingTests(TransactionTestCase):
+    THREADS = 20
+    CAPACITY = 5
+
+    @staticmethod
+    def reserve_concurrently(slot, delivery_date, threads_count):
+        barrier = threading.Barrier(threads_count)
+        results = [None] * threads_count
+
+        def worker(index):
+            barrier.wait()
+            try:
+                for _ in range(LOCK_RETRIES):
+                    try:
+                        with transaction.atomic():
+                            results[index] = delivery_slots.reserve_slot(slot.id, delivery_date, slot.capacity)
+                        return
+                    except OperationalError:
+                        # Тестовая база SQLite в памяти не ждет снятия блокировки,
+                        # а сразу отвечает "database table is locked": заказ повторяется
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads_count)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return results
+
+    def test_parallel_orders_do_not_exceed_capacity(self):
+        slot = DeliveryTimeSlot.objects.create(time_start=datetime.time(23), time_end=datetime.time(23, 59),
+                                               is_available_tomorrow=False, capacity=self.CAPACITY)
+        for round_number in range(5):
+            delivery_date = datetime.date(2000, 1, 1) + datetime.timedelta(days=round_number)
+            with self.subTest(round=round_number):
+                results = self.reserve_concurrently(slot, delivery_date, self.THREADS)
+                self.assertNotIn(None, results)
+                self.assertEqual(results.count(True), self.CAPACITY)
+                booking = SlotBooking.objects.get(slot=slot, delivery_date=delivery_date)
+                self.assertEqual(booking.orders_count, self.CAPACITY)
+
+                # Отмена всех заказов возвращает счетчик к нулю
+                for _ in range(self.CAPACITY):
+                    delivery_slots.release_slot(slot.id, delivery_date)
+                booking.refresh_from_db()
+                self.assertEqual(booking.orders_count, 0)
@@ -0,0 +1,165 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from flowershopservice import geocoding, shop_index
+from flowershopservice.admin import DistanceBandFilter, ShopAdmin
+from flowershopservice.geocoding import normalize_address
+from flowershopservice.models import GeocodeCache, Order, Shop, ShopUser
+from flowershopservice.tests.geocoder_fake import FakeGeocoder
+
+
+@override_settings(GEOCODER_CITY='Красноярск')
+class NormalizeAddressTests(SimpleTestCase):
+    def test_abbreviations_are_expanded(self):
+        self.assertEqual(normalize_address('г. Красноярск, ул. Ленина, д. 112'), normalize_address('улица Ленина 112'))
+        self.assertEqual(normalize_address('пр-т Мира, 10'), normalize_address('проспект Мира 10'))
+
+    def test_ambiguous_abbreviation_is_kept(self):
+        # "пр." - и проспект, и проезд: разные адреса не должны получить один ключ
+        self.assertEqual(normalize_address('пр. Заводской, 5'), 'пр заводской 5')
+        self.assertNotEqual(normalize_address('пр. Мира, 10'), normalize_address('проспект Мира 10'))
+
+
+class OrderDeliveryEstimateTests(TestCase):
+    def setUp(self):
+        shop_index.invalidate_index()
+        self.shop = self.create_shop('far', 56.10, 93.10)
+        user = ShopUser.objects.create(full_name='Анна', phone='+79991234567')
+        self.order = Order.objects.create(user=user, product_name='Букет', delivery_address='ул. Мира, 10')
+
+    @staticmethod
+    def create_shop(slug, latitude, longitude):
+        shop = Shop.objects.create(title=slug, address=f'ул. {slug}', phone='-', image='shops/test.jpg', slug=slug)
+        Shop.objects.filter(id=shop.id).update(coord_x=latitude, coord_y=longitude, geocode_status='done')
+        return shop
+
+    def process(self):
+        located = {'geocode_status': 'done', 'coord_x': 56.01, 'coord_y': 92.87, 'geocode_error': ''}
+        with mock.patch.object(geocoding, '_geocode', return_value=located):
+            return geocoding.process_pending_orders()
+
+    def test_worker_sees_shops_added_after_index_was_built(self):
+        shop_index.get_index()
+        near = self.create_shop('near', 56.02, 92.88)
+        self.assertEqual(self.process(), (1, 0))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.nearest_shop_id, near.id)
+
+    def test_shop_index_is_checked_once_per_batch(self):
+        user = self.order.user
+        for number in range(3):
+            Order.objects.create(user=user, product_name='Букет', delivery_address=f'ул. Мира, {number}')
+        with mock.patch.object(geocoding, 'get_shop_index', wraps=shop_index.get_index) as get_index:
+            self.assertEqual(self.process(), (4, 0))
+        self.assertEqual(get_index.call_count, 1)
+        self.assertEqual(set(Order.objects.values_list('nearest_shop_id', flat=True)), {self.shop.id})
+
+    def test_deleted_shop_is_not_written_to_order(self):
+        estimate = {'nearest_shop_id': self.shop.id + 100, 'distance_km': 1.0, 'eta_minutes': 5}
+        with mock.patch.object(geocoding, 'estimate_delivery', return_value=estimate):
+            self.assertEqual(self.process(), (0, 0))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.geocode_status, 'pending')
+        self.assertIsNone(self.order.nearest_shop_id)
+        # Следующий проход считает заказ по актуальным магазинам
+        self.assertEqual(self.process(), (1, 0))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.nearest_shop_id, self.shop.id)
+
+
+class ShopGeocodingTests(TestCase):
+    def setUp(self):
+        geocoding.clear_memory_cache()
+        self.addCleanup(geocoding.clear_memory_cache)
+        shop_index.invalidate_index()
+        self.geocoder = self.enterContext(FakeGeocoder())
+        self.enterContext(override_settings(YANDEX_GEOCODER_URL=self.geocoder.url))
+
+    @staticmethod
+    def create_shop(address):
+        return Shop.objects.create(title=address, address=address, phone='-', image='shops/test.jpg',
+                                   slug=f'shop-{Shop.objects.count()}')
+
+    def test_save_does_not_wait_for_geocoder(self):
+        self.geocoder.latency = 3
+        started = time.perf_counter()
+        shop = self.create_shop('ул. Проверочная, 1')
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(self.geocoder.requests, [])
+        self.assertEqual(shop.geocode_status, 'pending')
+        self.assertIn('определяются', ShopAdmin.get_map_preview(None, shop))
+
+    def test_worker_fills_coordinates(self):
+        shop = self.create_shop('ул. Проверочная, 1')
+        Shop.objects.get_active_shops()
+        self.assertEqual(geocoding.process_pending_shops(), (1, 0))
+        shop.refresh_from_db()
+        self.assertEqual(shop.geocode_status, 'done')
+        self.assertEqual((shop.coord_x, shop.coord_y), FakeGeocoder.coordinates_for('ул. Проверочная, 1'))
+        self.assertEqual([item.coord_x for item in Shop.objects.get_active_shops()], [shop.coord_x])
+        # Повторное сохранение с тем же адресом геокодер не вызывает
+        shop.phone = '+7 000'
+        shop.save()
+        self.assertEqual(shop.geocode_status, 'done')
+        self.assertEqual(len(self.geocoder.requests), 1)
+
+    def test_regeocode_from_another_process_skips_worker_memory(self):
+        shop = self.create_shop('ул. Проверочная, 1')
+        geocoding.process_pending_shops()
+        # Админка в другом процессе удаляет запись кэша; память воркера не сбрасывается
+        GeocodeCache.objects.all().delete()
+        Shop.objects.filter(id=shop.id).update(geocode_status='pending')
+        self.geocoder.not_found.add('ул. Проверочная, 1')
+        geocoding.process_pending_shops()
+        shop.refresh_from_db()
+        self.assertEqual(shop.geocode_status, 'not_found')
+        self.assertEqual(len(self.geocoder.requests), 2)
+
+    def test_geocoder_errors_are_retried(self):
+        shop = self.create_shop('ул. Проверочная, 2')
+        self.geocoder.fail(1)
+        self.assertEqual(geocoding.process_pending_shops(), (0, 1))
+        shop.refresh_from_db()
+        self.assertEqual((shop.geocode_status, shop.geocode_attempts), ('pending', 1))
+        self.assertGreater(shop.geocode_retry_at, timezone.now())
+        Shop.objects.filter(id=shop.id).update(geocode_retry_at=timezone.now())
+        geocoding.process_pending_shops()
+        shop.refresh_from_db()
+        self.assertEqual(shop.geocode_status, 'done')
+
+    def test_address_not_found(self):
+        shop = self.create_shop('ул. Несуществующая, 404')
+        self.geocoder.not_found.add('ул. Несуществующая, 404')
+        geocoding.process_pending_shops()
+        shop.refresh_from_db()
+        self.assertEqual(shop.geocode_status, 'not_found')
+        self.assertIn('не найден', ShopAdmin.get_map_preview(None, shop))
+
+    def test_order_gets_nearest_shop_distance_and_eta(self):
+        self.create_shop('ул. Проверочная, 1')
+        geocoding.process_pending_shops()
+        user = ShopUser.objects.create(full_name='Анна', phone='+79991234567')
+        order = Order.objects.create(user=user, product_name='Букет', delivery_address='ул. Доставочная, 5')
+        self.assertEqual(order.geocode_status, 'pending')
+
+        geocoding.process_pending_orders()
+        order.refresh_from_db()
+        shop, distance = shop_index.nearest_shop(*FakeGeocoder.coordinates_for('ул. Доставочная, 5'))
+        self.assertEqual((order.geocode_status, order.nearest_shop_id), ('done', shop['id']))
+        self.assertAlmostEqual(order.distance_km, distance, places=3)
+        self.assertTrue(order.eta_minutes)
+
+        band = next(value for value, (_, low, high) in DistanceBandFilter.BANDS.items()
+                    if (low is None or order.distance_km >= low) and (high is None or order.distance_km < high))
+        distance_filter = DistanceBandFilter(None, {'distance': [band]}, Order, None)
+        self.assertTrue(distance_filter.queryset(None, Order.objects.filter(id=order.id)).exists())
+
+        # Новый адрес доставки геокодируется заново
+        order.delivery_address = 'ул. Доставочная, 6'
+        order.save()
+        order.refresh_from_db()
+        self.assertEqual(order.geocode_status, 'pending')
+        self.assertIsNone(order.distance_km)
@@ -0,0 +1,71 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from flowershopservice import idempotency
+from flowershopservice.models import Consultation, IdempotencyKey, NotificationOutbox, ShopUser
+
+
+class IdempotentFormTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ShopUser.objects.create(full_name='Менеджер', phone='+79990000001', status='manager', telegram_id='1001')
+        self.key = idempotency.issue_key()
+        self.data = {'fname': 'Анна', 'tel': '+79991234567', idempotency.FIELD_NAME: self.key}
+
+    def submit(self, **data):
+        return self.client.post(reverse('consultation'), {**self.data, **data})
+
+    def record_key(self):
+        return IdempotencyKey.objects.get().key
+
+    def test_repeated_submission_is_replayed(self):
+        first = self.submit()
+        second = self.submit()
+        self.assertTrue(first.json()['success'])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Consultation.objects.count(), 1)
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+    def test_failed_submission_can_be_corrected(self):
+        self.assertFalse(self.submit(tel='123').json()['success'])
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertTrue(self.submit().json()['success'])
+
+    def test_concurrent_submission_waits_for_first(self):
+        # Первый запрос с тем же ключом обрабатывается другим процессом
+        self.submit()
+        IdempotencyKey.objects.update(status_code=None, content=b'')
+        with mock.patch.object(idempotency, 'WAIT_STEPS', 2):
+            response = self.submit()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Consultation.objects.count(), 1)
+
+        # Другой процесс закончил обработку и сохранил ответ
+        IdempotencyKey.objects.update(status_code=200, content_type='application/json', content=b'{"success": true}')
+        response = self.submit()
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(Consultation.objects.count(), 1)
+
+    def test_key_of_crashed_process_is_taken_over(self):
+        self.submit()
+        # Процесс, обрабатывавший первый запрос, упал, не сохранив ответ
+        IdempotencyKey.objects.update(
+            status_code=None, created_at=timezone.now() - datetime.timedelta(seconds=idempotency.PENDING_TIMEOUT + 1),
+        )
+        self.assertTrue(self.submit().json()['success'])
+        self.assertEqual(Consultation.objects.count(), 2)
+
+    def test_expired_keys_are_purged(self):
+        self.submit()
+        IdempotencyKey.objects.update(
+            created_at=timezone.now() - datetime.timedelta(seconds=idempotency.RESULT_TIMEOUT + 1),
+        )
+        self.submit(**{idempotency.FIELD_NAME: idempotency.issue_key()})
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+        self.assertNotIn(self.key, self.record_key())
@@ -0,0 +1,193 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DatabaseError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from flowershopservice import notifications, outbox, recipients, telegram_service, versions
+from flowershopservice.models import Consultation, NotificationDeadLetter, NotificationOutbox, ShopUser
+from flowershopservice.telegram_service import MAX_MESSAGE_LENGTH, TelegramNotifier, message_length
+from flowershopservice.tests.telegram_fake import FakeBotAPI
+
+
+class NotificationTestCase(TestCase):
+    def setUp(self):
+        # Реестр получателей и ключи дедупликации живут в кэше
+        cache.clear()
+        self.manager = ShopUser.objects.create(full_name='Менеджер', phone='+79990000001',
+                                               status='manager', telegram_id='1001')
+
+
+class ConsultationNotificationTests(NotificationTestCase):
+    def submit(self):
+        return self.client.post(reverse('consultation'), {'fname': 'Анна', 'tel': '+79991234567'}).json()
+
+    def test_consultation_is_queued_for_managers(self):
+        self.assertTrue(self.submit()['success'])
+        self.assertEqual(Consultation.objects.count(), 1)
+        self.assertEqual(list(NotificationOutbox.objects.values_list('chat_id', flat=True)), ['1001'])
+
+    def test_consultation_is_not_saved_without_notification(self):
+        with mock.patch('flowershopservice.outbox.enqueue_once', side_effect=DatabaseError('outbox')):
+            self.assertFalse(self.submit()['success'])
+        self.assertFalse(Consultation.objects.exists())
+        self.assertFalse(ShopUser.objects.filter(phone='+79991234567').exists())
+
+
+class NotificationDedupeTests(NotificationTestCase):
+    def setUp(self):
+        super().setUp()
+        user = ShopUser.objects.create(full_name='Анна', phone='+79991234567')
+        self.consultation = Consultation.objects.create(user=user)
+        NotificationOutbox.objects.all().delete()
+
+    def notify(self):
+        return notifications.notify(notifications.CONSULTATION_CREATED, self.consultation)
+
+    def test_repeated_event_is_queued_once(self):
+        self.assertEqual(self.notify(), 1)
+        cache.clear()
+        self.assertEqual(self.notify(), 0)
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+    def test_rolled_back_notification_can_be_queued_again(self):
+        with transaction.atomic():
+            self.assertEqual(self.notify(), 1)
+            transaction.set_rollback(True)
+        self.assertEqual(self.notify(), 1)
+
+    def test_event_is_queued_again_after_ttl(self):
+        self.notify()
+        NotificationOutbox.objects.update(
+            created_at=timezone.now() - datetime.timedelta(seconds=notifications.DEDUPE_TTL + 1),
+        )
+        self.assertEqual(self.notify(), 1)
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+
+
+class DigestSplitTests(NotificationTestCase):
+    def rows(self, count, text):
+        return [NotificationOutbox(chat_id='1001', recipient_name='Менеджер', text=f'{number}: {text}', digest=True)
+                for number in range(count)]
+
+    def test_long_digest_is_split_between_notifications(self):
+        rows = self.rows(60, '🛒 Новый заказ\n' + 'Адрес: ' + 'д' * 150)
+        texts = notifications.format_digest(rows)
+        self.assertGreater(len(texts), 1)
+        self.assertTrue(all(message_length(text) <= MAX_MESSAGE_LENGTH for text in texts))
+        joined = notifications.DIGEST_SEPARATOR.join(texts)
+        self.assertTrue(all(row.text in joined for row in rows))
+
+    def test_oversized_notification_is_cut(self):
+        texts = notifications.format_digest(self.rows(1, 'строка\n' * 1000))
+        self.assertEqual(len(texts), 2)
+        self.assertTrue(all(message_length(text) <= MAX_MESSAGE_LENGTH for text in texts))
+
+    def test_flush_queues_every_part(self):
+        created_at = timezone.now() - datetime.timedelta(minutes=5)
+        NotificationOutbox.objects.bulk_create(self.rows(60, 'д' * 150))
+        NotificationOutbox.objects.update(created_at=created_at)
+        self.assertEqual(outbox.flush_digests(60, notifications.format_digest), 1)
+        self.assertGreater(NotificationOutbox.objects.filter(digest=False, status='pending').count(), 1)
+
+    def test_fake_api_rejects_too_long_message(self):
+        with FakeBotAPI(enforce_limits=False) as api:
+            with override_settings(TELEGRAM_API_URL=api.url, TELEGRAM_BOT_TOKEN='test'):
+                result = TelegramNotifier.send_to_user('1001', 'д' * (MAX_MESSAGE_LENGTH + 1))
+                self.assertTrue(TelegramNotifier.send_to_user('1001', 'д' * MAX_MESSAGE_LENGTH))
+        self.assertFalse(result)
+        self.assertFalse(result.retryable)
+        self.assertIn('too long', result.error)
+
+
+class TelegramDeliveryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Лимиты Bot API проверяет сам имитатор; повторы не ждут лимита чата
+        limiter = telegram_service.RateLimiter(chat_rate=1000, chat_burst=1000)
+        self.enterContext(mock.patch.object(telegram_service, '_limiter', limiter))
+        self.api = self.enterContext(FakeBotAPI(enforce_limits=False))
+        self.enterContext(override_settings(TELEGRAM_API_URL=self.api.url, TELEGRAM_BOT_TOKEN='test'))
+
+    @staticmethod
+    def run_worker(rounds, batch_size=50):
+        """Разбирает очередь, не дожидаясь пауз между повторами"""
+        for _ in range(rounds):
+            NotificationOutbox.objects.filter(status='pending').update(available_at=timezone.now())
+            outbox.dispatch_batch(batch_size)
+
+    def test_transient_errors_are_retried(self):
+        self.api.script('7001', (502, 'Bad Gateway'), (502, 'Bad Gateway'))
+        message = outbox.enqueue('7001', 'Проверка повторов')
+        self.run_worker(3)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('sent', 3))
+
+    def test_bad_request_goes_to_dead_letters_at_once(self):
+        self.api.script('7002', (400, 'Bad Request: chat_id is empty'))
+        message = outbox.enqueue('7002', 'Проверка ошибки 400')
+        self.run_worker(1)
+        self.assertFalse(NotificationOutbox.objects.filter(id=message.id).exists())
+        self.assertEqual(NotificationDeadLetter.objects.get(chat_id='7002').attempts, 1)
+
+    def test_exhausted_attempts_go_to_dead_letters(self):
+        self.api.script('7003', *[(500, 'Internal Server Error')] * outbox.MAX_ATTEMPTS)
+        outbox.enqueue('7003', 'Проверка исчерпания попыток')
+        self.run_worker(outbox.MAX_ATTEMPTS)
+        self.assertEqual(NotificationDeadLetter.objects.get(chat_id='7003').attempts, outbox.MAX_ATTEMPTS)
+
+    def test_recipient_who_blocked_bot_is_disabled(self):
+        user = ShopUser.objects.create(full_name='Менеджер', phone='+70000007004', status='manager', telegram_id='7004')
+        self.api.block('7004')
+        # Второе сообщение поставлено до того, как воркер узнал о блокировке:
+        # после первого ответа 403 оно не должно отправляться
+        outbox.enqueue('7004', 'Первое сообщение')
+        outbox.enqueue('7004', 'Второе сообщение')
+        self.run_worker(2, batch_size=1)
+        user.refresh_from_db()
+        self.assertTrue(user.telegram_blocked)
+        self.assertNotIn(user.id, [recipient.id for recipient in recipients.get_recipients('manager')])
+        self.assertEqual(NotificationDeadLetter.objects.filter(chat_id='7004', attempts__lte=1).count(), 2)
+
+    def test_unreachable_api_postpones_message(self):
+        self.api.stop()
+        message = outbox.enqueue('7005', 'Проверка недоступного API')
+        outbox.dispatch_batch()
+        message.refresh_from_db()
+        self.assertEqual(message.status, 'pending')
+        self.assertGreater(message.available_at, timezone.now())
+
+    def test_retry_delay_grows_up_to_limit(self):
+        for attempts in range(1, outbox.MAX_ATTEMPTS + 1):
+            delay = min(outbox.MAX_RETRY_DELAY_SECONDS, outbox.RETRY_DELAY_SECONDS * 2 ** (attempts - 1))
+            self.assertTrue(delay / 2 <= outbox.retry_delay(attempts) <= delay)
+
+
+class RecipientsRegistryTests(NotificationTestCase):
+    def test_registry_follows_version_bumped_by_another_process(self):
+        self.assertEqual([recipient.id for recipient in recipients.get_recipients('manager')], [self.manager.id])
+        # Изменение без сигналов: реестр берется из кэша процесса
+        ShopUser.objects.filter(id=self.manager.id).update(status='user')
+        self.assertEqual(len(recipients.get_recipients('manager')), 1)
+        # Пользователя изменил другой процесс, версия в базе обновилась
+        versions.bump(versions.RECIPIENTS)
+        self.assertEqual(recipients.get_recipients('manager'), [])
+
+    def test_chat_blocked_by_worker_is_not_queued_by_site(self):
+        consultation = Consultation.objects.create(user=self.manager)
+        NotificationOutbox.objects.all().delete()
+        recipients.get_recipients('manager')
+        # Воркер уведомлений работает в другом процессе, со своим кэшем
+        with mock.patch.object(recipients, 'cache', LocMemCache('worker', {})):
+            self.assertEqual(recipients.block('1001'), 1)
+        self.assertEqual(notifications.notify(notifications.CONSULTATION_CREATED, consultation), 0)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_user_save_rebuilds_registry(self):
+        recipients.get_recipients('manager')
+        ShopUser.objects.create(full_name='Второй менеджер', phone='+79990000002', status='manager', telegram_id='1002')
+        self.assertEqual(len(recipients.get_recipients('manager')), 2)
@@ -0,0 +1,102 @@
+import datetime
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from flowershopservice import delivery_slots, orders, outbox, telegram_service, wizard
+from flowershopservice.models import DeliveryTimeSlot, NotificationOutbox, Order, Product, ShopUser, UsedWizardToken
+from flowershopservice.tests.telegram_fake import FakeBotAPI
+
+
+class OrderTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        ShopUser.objects.create(full_name='Менеджер', phone='+79990000001', status='manager', telegram_id='1001')
+        self.bouquet = Product.objects.create(name='Букет', description='-', composition='-', price=1000,
+                                              image='img/catalog/test.jpg')
+        self.order_data = {
+            'name': 'Анна', 'phone': '+79991234567', 'address': 'ул. Мира, 10',
+            'delivery_date': (datetime.date.today() + datetime.timedelta(days=1)).isoformat(),
+            'is_express': False, 'delivery_slot_id': None, 'delivery_time_from': None, 'delivery_time_to': None,
+        }
+
+
+class CreateOrderTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.slot = DeliveryTimeSlot.objects.create(time_start=datetime.time(10), time_end=datetime.time(12),
+                                                    capacity=5)
+        self.order_data.update(delivery_slot_id=self.slot.id, delivery_time_from='10:00:00',
+                               delivery_time_to='12:00:00')
+        ShopUser.objects.create(full_name='Анна', phone=self.order_data['phone'])
+        # Расписание слотов и реестр получателей уже в кэше, как на работающем сайте
+        delivery_slots.get_slots()
+        orders.create_order(self.order_data, self.bouquet.id)
+
+    def test_query_count(self):
+        # Букет, версия расписания, SAVEPOINT, место в слоте, клиент, INSERT заказа,
+        # версия получателей, ключи дедупликации, INSERT уведомления, RELEASE
+        with self.assertNumQueries(10):
+            orders.create_order(self.order_data, self.bouquet.id)
+
+    def test_notification_leaves_only_after_commit(self):
+        limiter = telegram_service.RateLimiter(chat_rate=1000, chat_burst=1000)
+        self.enterContext(mock.patch.object(telegram_service, '_limiter', limiter))
+        api = self.enterContext(FakeBotAPI(enforce_limits=False))
+        self.enterContext(override_settings(TELEGRAM_API_URL=api.url, TELEGRAM_BOT_TOKEN='test'))
+        NotificationOutbox.objects.all().delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order = orders.create_order(self.order_data, self.bouquet.id)
+            # В транзакции заказа уведомление только ставится в очередь
+            self.assertEqual(api.received, [])
+            self.assertEqual(list(NotificationOutbox.objects.values_list('chat_id', 'status')), [('1001', 'pending')])
+        # После коммита его отправляет воркер, а не сам заказ
+        self.assertEqual(api.received, [])
+        outbox.dispatch_batch()
+        self.assertEqual(len(api.received), 1)
+        self.assertIn(str(order.id), api.received[0][1])
+
+    def test_rolled_back_order_queues_nothing(self):
+        NotificationOutbox.objects.all().delete()
+        with transaction.atomic():
+            orders.create_order(self.order_data, self.bouquet.id)
+            transaction.set_rollback(True)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+
+class WizardReplayTests(OrderTestCase):
+    def token(self):
+        return wizard.dumps({'order_data': self.order_data, 'bouquet_data': {'id': self.bouquet.id}})
+
+    def submit(self, token):
+        return self.client.post(reverse('process_order'), {wizard.FIELD_NAME: token}).json()
+
+    def test_replayed_token_is_rejected(self):
+        token = self.token()
+        self.assertTrue(self.submit(token)['success'])
+        self.assertFalse(self.submit(token)['success'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+    def test_each_token_places_its_own_order(self):
+        self.assertTrue(self.submit(self.token())['success'])
+        self.assertTrue(self.submit(self.token())['success'])
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_rolled_back_order_does_not_use_token(self):
+        slot = DeliveryTimeSlot.objects.create(time_start=datetime.time(10), time_end=datetime.time(12), capacity=1)
+        delivery_date = datetime.date.fromisoformat(self.order_data['delivery_date'])
+        delivery_slots.reserve_slot(slot.id, delivery_date, slot.capacity)
+        self.order_data['delivery_slot_id'] = slot.id
+        token = self.token()
+        # Слот заполнен: заказ откатывается вместе с отметкой токена
+        self.assertFalse(self.submit(token)['success'])
+        self.assertFalse(UsedWizardToken.objects.exists())
+        delivery_slots.release_slot(slot.id, delivery_date)
+        self.assertTrue(self.submit(token)['success'])
@@ -0,0 +1,34 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from flowershopservice.models import Product
+from flowershopservice.pagination import decode_cursor, encode_cursor, paginate_by_cursor
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([
+            Product(name=f'Букет {number}', description='-', composition='-', price=100 + number,
+                    image='img/catalog/test.jpg')
+            for number in range(10)
+        ])
+
+    def test_pages_follow_each_other(self):
+        queryset = Product.objects.values('id', 'price')
+        first, cursor = paginate_by_cursor(queryset, limit=4, sort_field='price')
+        second, _ = paginate_by_cursor(queryset, cursor=cursor, limit=4, sort_field='price')
+        self.assertEqual([row['price'] for row in first + second], sorted(row['price'] for row in first + second))
+        self.assertFalse({row['id'] for row in first} & {row['id'] for row in second})
+
+    def test_value_not_matching_sort_field_is_rejected(self):
+        price = Product._meta.get_field('price')
+        for value in ('abc', 'NaN', 'None'):
+            with self.subTest(value=value):
+                self.assertIsNone(decode_cursor(encode_cursor(value, 1), price))
+
+    def test_tampered_cursor_returns_first_page(self):
+        response = self.client.get(reverse('filter_bouquets'),
+                                   {'sort': 'price_asc', 'cursor': encode_cursor('abc', 3)})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['has_more'])
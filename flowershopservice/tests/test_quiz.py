@@ -0,0 +1,54 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import models
+from django.test import TestCase
+
+from flowershopservice import catalog_version, quiz_index
+from flowershopservice.models import Category, PriceRange, Product
+
+
+class QuizIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Свадебные')
+        self.price_range = PriceRange.objects.create(min_price=1, max_price=2000)
+        self.product = self.create_product('Букет', 1000)
+
+    def create_product(self, name, price):
+        product = Product.objects.create(name=name, description='-', composition='-', price=price,
+                                         image='img/catalog/test.jpg', status='active')
+        product.categories.add(self.category)
+        return product
+
+    def bucket(self):
+        return list(quiz_index.get_index()['buckets'].get((self.category.id, self.price_range.id), []))
+
+    def test_index_follows_catalog_changes(self):
+        self.assertEqual(self.bucket(), [self.product.id])
+        second = self.create_product('Второй букет', 1500)
+        self.assertEqual(sorted(self.bucket()), [self.product.id, second.id])
+        second.price = 5000
+        second.save()
+        self.assertEqual(self.bucket(), [self.product.id])
+        new_range = PriceRange.objects.create(min_price=4000, max_price=6000)
+        self.assertIn(new_range.id, quiz_index.get_index()['price_ranges'])
+        self.assertEqual(quiz_index.pick_random_product(self.category.id, new_range.id).id, second.id)
+
+    def test_index_follows_version_bumped_by_another_process(self):
+        self.bucket()
+        # Изменение без обновления версии: индекс берется из кэша
+        models.QuerySet.update(Product.objects.filter(id=self.product.id), status='archived')
+        self.assertEqual(self.bucket(), [self.product.id])
+        # Букет снял с продажи другой процесс, версия в базе обновилась
+        catalog_version.bump()
+        self.assertEqual(self.bucket(), [])
+
+    def test_rebuild_price_ranges_command_resets_index(self):
+        self.bucket()
+        PriceRange.objects.filter(id=self.price_range.id).update(max_price=500)
+        # Версия изменилась, но принадлежность диапазонам еще старая
+        self.assertEqual(self.bucket(), [self.product.id])
+        call_command('rebuild_price_ranges', stdout=StringIO())
+        self.assertEqual(self.bucket(), [])
@@ -0,0 +1,32 @@
+from django.test import TestCase
+
+from flowershopservice import search
+from flowershopservice.models import Product
+
+
+class SearchRankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Совпадений больше SEARCH_MAX_CANDIDATES, неактивные идут первыми,
+        # а самое релевантное совпадение - последним
+        products = [
+            Product(name=f'Букет {number}', description='-', composition='пионы и розы',
+                    price=1000, image='img/catalog/test.jpg', status='inactive' if number < 500 else 'active')
+            for number in range(search.SEARCH_MAX_CANDIDATES + 700)
+        ]
+        products.append(Product(name='Розы', description='Розы', composition='розы', price=1000,
+                                image='img/catalog/test.jpg'))
+        Product.objects.bulk_create(products)
+        cls.best = Product.objects.get(name='Розы')
+        search.rebuild_index()
+
+    def test_best_match_beyond_candidate_limit_comes_first(self):
+        self.assertEqual(search.search_product_ids('розы', limit=3)[0], self.best.id)
+
+    def test_only_active_products(self):
+        ids = search.search_product_ids('розы', limit=search.SEARCH_MAX_CANDIDATES)
+        self.assertEqual(len(ids), search.SEARCH_MAX_CANDIDATES)
+        self.assertFalse(Product.objects.filter(id__in=ids).exclude(status='active').exists())
+
+    def test_no_pages_beyond_candidate_limit(self):
+        self.assertEqual(search.search_product_ids('розы', offset=search.SEARCH_MAX_CANDIDATES), [])
@@ -0,0 +1,44 @@
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from flowershopservice import geocoding
+from flowershopservice.models import Shop
+from flowershopservice.shop_import import import_shops
+
+
+class ImportShopsTests(TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.shop = Shop.objects.create(title='Центральный', address='ул. Ленина, 1', phone='-',
+                                        image='shops/test.jpg', slug='central')
+        Shop.objects.filter(id=self.shop.id).update(coord_x=56.01, coord_y=92.87, geocode_status='done')
+
+    def run_import(self, records, coordinates):
+        shops_data = [{'fields': {'phone': '-', **fields}} for fields in records]
+        with override_settings(MEDIA_ROOT=self.folder.name), \
+                mock.patch.object(geocoding, 'lookup_many', return_value=coordinates):
+            return import_shops(shops_data, self.folder.name)
+
+    def test_failed_lookup_keeps_coordinates_of_unchanged_address(self):
+        stats = self.run_import([{'title': 'Центральный салон', 'address': 'ул. Ленина, 1', 'slug': 'central'}], {})
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.title, 'Центральный салон')
+        self.assertEqual((self.shop.coord_x, self.shop.coord_y, self.shop.geocode_status), (56.01, 92.87, 'done'))
+        self.assertEqual((stats['kept'], stats['pending']), (1, 0))
+
+    def test_failed_lookup_of_new_address_waits_for_worker(self):
+        self.run_import([
+            {'title': 'Центральный', 'address': 'ул. Мира, 2', 'slug': 'central'},
+            {'title': 'Новый', 'address': 'ул. Мира, 3', 'slug': 'new'},
+        ], {})
+        for shop in Shop.objects.all():
+            self.assertEqual((shop.coord_x, shop.geocode_status), (None, 'pending'))
+
+    def test_found_coordinates_are_updated(self):
+        self.run_import([{'title': 'Центральный', 'address': 'ул. Ленина, 1', 'slug': 'central'}],
+                        {'ул. Ленина, 1': (56.02, 92.88)})
+        self.shop.refresh_from_db()
+        self.assertEqual((self.shop.coord_x, self.shop.coord_y), (56.02, 92.88))
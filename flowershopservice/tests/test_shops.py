@@ -0,0 +1,33 @@
+from django.core.cache import cache
+from django.db import models
+from django.test import TestCase
+
+from flowershopservice import catalog_version, versions
+from flowershopservice.models import Shop
+
+
+class ActiveShopsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = Shop.objects.create(title='Центральный', address='ул. Ленина, 1', phone='-',
+                                        image='shops/test.jpg', slug='central')
+
+    def test_list_follows_shop_changes(self):
+        self.assertEqual(Shop.objects.get_active_shops(), [self.shop])
+        Shop.objects.filter(id=self.shop.id).update(is_active=False)
+        self.assertEqual(Shop.objects.get_active_shops(), [])
+
+    def test_list_follows_version_bumped_by_another_process(self):
+        Shop.objects.get_active_shops()
+        # Изменение без обновления версии: список берется из кэша
+        models.QuerySet.update(Shop.objects.filter(id=self.shop.id), is_active=False)
+        self.assertEqual(Shop.objects.get_active_shops(), [self.shop])
+        # Версию в базе обновил другой процесс
+        versions.bump(versions.SHOPS)
+        self.assertEqual(Shop.objects.get_active_shops(), [])
+
+    def test_bouquet_changes_keep_list_cached(self):
+        Shop.objects.get_active_shops()
+        catalog_version.bump()
+        with self.assertNumQueries(1):
+            self.assertEqual(Shop.objects.get_active_shops(), [self.shop])
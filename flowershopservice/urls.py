@@ -6,6 +6,8 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('catalog/', views.catalog, name='catalog'),
     path('catalog/load-more/', views.load_more_bouquets, name='load_more_bouquets'),
+    path('catalog/search/', views.search_bouquets, name='search_bouquets'),
+    path('catalog/filter/', views.filter_bouquets, name='filter_bouquets'),
     path('card/', views.card, name='card'),
     path('card/<int:bouquet_id>/', views.card, name='bouquet_detail'),
     path('consultation/', views.show_consultation, name='show_consultation'),
@@ -20,4 +22,5 @@ urlpatterns = [
     path('privacy/', views.privacy, name='privacy'),
     path('process-order/', views.process_order, name='process_order'),
     path('contacts/', views.contacts, name='contacts'),
+    path('shops/nearest/', views.nearest_shops, name='nearest_shops'),
 ]
\ No newline at end of file
@@ -1,5 +1,6 @@
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
 from typing import Optional, Tuple
 import logging
 from urllib.parse import urlencode
@@ -7,43 +8,68 @@ import re
 
 logger = logging.getLogger(__name__)
 
-def get_coordinates_by_address(address: str) -> Optional[Tuple[float, float]]:
+# Сколько ждать ответа геокодера, секунды
+GEOCODER_TIMEOUT = 10
+# Соединений с геокодером, которые держатся открытыми для параллельных запросов
+GEOCODER_POOL_SIZE = 16
+
+
+def _create_session():
+    # Одна сессия на процесс: соединения с геокодером переиспользуются (keep-alive)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=GEOCODER_POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = _create_session()
+
+class GeocoderError(Exception):
+    """Геокодер недоступен или вернул ошибку; запрос стоит повторить позже"""
+
+
+def request_coordinates(address: str) -> Optional[Tuple[float, float]]:
     """
-    Получает координаты по адресу используя API Яндекс.Геокодера
+    Запрашивает координаты адреса у API Яндекс.Геокодера
     
     Args:
         address: Адрес для геокодирования
         
     Returns:
-        Tuple[float, float]: Кортеж (широта, долгота) или None в случае ошибки
+        Tuple[float, float]: Кортеж (широта, долгота) или None, если адрес не найден
+        
+    Raises:
+        GeocoderError: Ошибка запроса или ответа API
     """
+    logger.info(f"Запрос координат: {address}")
+    
+    base_url = settings.YANDEX_GEOCODER_URL
+    params = {
+        "apikey": settings.YANDEX_GEOCODER_API_KEY,
+        "format": "json",
+        "geocode": address
+    }
+    
+    debug_params = params.copy()
+    debug_params["apikey"] = "HIDDEN"
+    debug_url = f"{base_url}?{urlencode(debug_params)}"
+    logger.debug(f"Запрос к API: {debug_url}")
+    
     try:
-        logger.info(f"Запрос координат: {address}")
-        
-        base_url = "https://geocode-maps.yandex.ru/1.x/"
-        params = {
-            "apikey": settings.YANDEX_GEOCODER_API_KEY,
-            "format": "json",
-            "geocode": address
-        }
-        
-        debug_params = params.copy()
-        debug_params["apikey"] = "HIDDEN"
-        debug_url = f"{base_url}?{urlencode(debug_params)}"
-        logger.debug(f"Запрос к API: {debug_url}")
-        
-        response = requests.get(base_url, params=params)
+        response = _session.get(base_url, params=params, timeout=GEOCODER_TIMEOUT)
+    except requests.RequestException as e:
+        raise GeocoderError(f"Ошибка запроса к геокодеру: {e}") from e
+    
+    if response.status_code == 403:
+        logger.error(f"Ответ API: {response.text}")
+        raise GeocoderError("Ошибка авторизации API (403)")
         
-        if response.status_code == 403:
-            logger.error("Ошибка авторизации API (403)")
-            logger.error(f"Ответ API: {response.text}")
-            return None
-            
-        if response.status_code != 200:
-            logger.error(f"Ошибка API: {response.status_code}")
-            logger.error(f"Ответ: {response.text}")
-            return None
-            
+    if response.status_code != 200:
+        logger.error(f"Ответ: {response.text}")
+        raise GeocoderError(f"Ошибка API: {response.status_code}")
+    
+    try:
         data = response.json()
         features = data["response"]["GeoObjectCollection"]["featureMember"]
         
@@ -53,13 +79,32 @@ def get_coordinates_by_address(address: str) -> Optional[Tuple[float, float]]:
             
         coords_str = features[0]["GeoObject"]["Point"]["pos"]
         longitude, latitude = map(float, coords_str.split())
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        raise GeocoderError(f"Некорректный ответ геокодера: {e}") from e
+    
+    logger.info(f"Найдены координаты: {latitude}, {longitude}")
+    return latitude, longitude
+
+
+def get_coordinates_by_address(address: str) -> Optional[Tuple[float, float]]:
+    """
+    Получает координаты по адресу используя API Яндекс.Геокодера
+    
+    Запрос выполняется всегда; для повторяющихся адресов используйте
+    geocoding.get_coordinates, который кэширует результаты.
+    
+    Args:
+        address: Адрес для геокодирования
         
-        logger.info(f"Найдены координаты: {latitude}, {longitude}")
-        return latitude, longitude
-        
-    except Exception as e:
+    Returns:
+        Tuple[float, float]: Кортеж (широта, долгота) или None в случае ошибки
+    """
+    try:
+        return request_coordinates(address)
+    except GeocoderError as e:
         logger.error(f"Ошибка геокодирования: {str(e)}")
-        return None 
+        return None
+
 
 def validate_russian_phone(phone_number: str) -> tuple:
     """
@@ -0,0 +1,50 @@
+import time
+
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+# Наборы данных с общей версией. Версию меняет процесс, изменивший данные,
+# а кэши в памяти остальных процессов включают ее в ключ или сверяют с ней
+CATALOG = 'catalog'
+SHOPS = 'shops'
+RECIPIENTS = 'recipients'
+DELIVERY_SLOTS = 'delivery_slots'
+
+
+def _now_version():
+    # Версия - время последнего изменения данных в миллисекундах
+    return int(time.time() * 1000)
+
+
+def get(name):
+    """
+    Возвращает текущую версию набора данных.
+
+    Версия читается из базы, поэтому изменение в одном процессе сразу
+    видно остальным. Если строки с версией еще нет, она создается.
+    """
+    from .models import DataVersion
+
+    version = DataVersion.objects.filter(name=name).values_list('version', flat=True).first()
+    if version is None:
+        row, _ = DataVersion.objects.get_or_create(name=name, defaults={'version': _now_version()})
+        version = row.version
+    return version
+
+
+def bump(name):
+    """
+    Отмечает изменение набора данных.
+
+    Версия меняется одним UPDATE в базе, поэтому одновременные изменения
+    из разных процессов не теряются, а версия только растет.
+    """
+    from .models import DataVersion
+
+    now = _now_version()
+    next_version = Greatest(F('version') + 1, Value(now))
+    rows = DataVersion.objects.filter(name=name)
+    if not rows.update(version=next_version):
+        _, created = DataVersion.objects.get_or_create(name=name, defaults={'version': now})
+        if not created:
+            rows.update(version=next_version)
@@ -1,17 +1,22 @@
 from django.shortcuts import get_object_or_404
 from django.template.loader import render_to_string
-from .models import Product, DeliveryTimeSlot, Category, PriceRange
-import datetime
-from django.shortcuts import render, redirect
+from .models import Product, Category, PriceRange
+from django.shortcuts import render
 
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import JsonResponse, Http404
+from django.db import transaction
+from django.db.models import Count, Q
+from django.views.decorators.http import require_GET, require_POST
 from .models import ShopUser, Consultation, Order
-import uuid
 import logging
 from django.utils import timezone  # Добавляем импорт timezone
 from django.views.decorators.csrf import csrf_protect
 from .utils import validate_russian_phone
+from .pagination import paginate_by_cursor, encode_cursor
+from .cards import ProductCard, LIST_FIELDS, get_card, fetch_cards
+from . import quiz_index, search, facets, delivery_slots, orders, wizard, shop_index
+from .catalog_version import catalog_conditional
+from .idempotency import idempotent
 
 logger = logging.getLogger(__name__)
 
@@ -25,86 +30,133 @@ def index(request):
     })
 
 
+@catalog_conditional
 def catalog(request):
-    # Получаем все активные букеты из базы данных
-    bouquets = Product.objects.filter(status='active')
-
-    # Для каждого букета модифицируем путь к изображению, убирая 'static/' из начала пути
-    for bouquet in bouquets:
-        if bouquet.image and str(bouquet.image).startswith('static/'):
-            bouquet.image_url = str(bouquet.image)[
-                                7:]  # Убираем 'static/' из начала пути
-        else:
-            bouquet.image_url = str(bouquet.image)
-
-    # Определяем начальное количество отображаемых букетов
+    # Первая страница активных букетов: читаем из базы только items_per_page + 1 строк
     items_per_page = 6
-
-    # Рассчитываем, нужно ли показывать кнопку "Показать еще"
-    show_more_button = len(bouquets) > items_per_page
-
-    # Передаем только первые N букетов в шаблон
-    initial_bouquets = bouquets[:items_per_page]
+    rows, next_cursor = paginate_by_cursor(
+        Product.objects.filter(status='active').values(*LIST_FIELDS),
+        limit=items_per_page,
+    )
 
     context = {
-        'bouquets': initial_bouquets,
-        'total_bouquets': len(bouquets),
-        'show_more_button': show_more_button,
+        'bouquets': [ProductCard.from_row(row) for row in rows],
+        # Кнопка "Показать еще" нужна, если за первой страницей есть еще букеты
+        'show_more_button': next_cursor is not None,
+        'next_cursor': next_cursor,
     }
 
     return render(request, 'catalog.html', context)
 
 
 # Представление для загрузки дополнительных букетов
+@catalog_conditional
 def load_more_bouquets(request):
-    # Получаем количество уже загруженных букетов
-    offset = int(request.GET.get('offset', 0))
-
     # Количество букетов, которые нужно загрузить
     limit = 3
 
-    # Получаем все активные букеты из базы данных
-    bouquets = Product.objects.filter(status='active')
+    bouquets = Product.objects.filter(status='active').values(*LIST_FIELDS)
+    cursor = request.GET.get('cursor')
 
-    # Для каждого букета модифицируем путь к изображению, убирая 'static/' из начала пути
-    for bouquet in bouquets:
-        if bouquet.image and str(bouquet.image).startswith('static/'):
-            bouquet.image_url = str(bouquet.image)[
-                                7:]  # Убираем 'static/' из начала пути
-        else:
-            bouquet.image_url = str(bouquet.image)
+    if cursor:
+        # Keyset-пагинация: страница начинается сразу после последнего показанного букета
+        rows, next_cursor = paginate_by_cursor(bouquets, cursor=cursor, limit=limit)
+        offset = None
+    else:
+        # Старый контракт со смещением оставлен для совместимости с закэшированными страницами
+        offset = int(request.GET.get('offset', 0))
+        rows = list(bouquets.order_by('id')[offset:offset + limit + 1])
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['id'], rows[-1]['id'])
 
-    # Получаем следующую порцию букетов
-    more_bouquets = bouquets[offset:offset + limit]
+    # Рендерим HTML для новых букетов
+    html = render_to_string('bouquet_items.html',
+                            {'bouquets': [ProductCard.from_row(row) for row in rows]},
+                            request=request)
 
-    # Проверяем, есть ли еще букеты для загрузки
-    has_more = len(bouquets) > offset + limit
+    # Возвращаем JSON с HTML и курсором следующей страницы
+    response = {
+        'html': html,
+        'has_more': next_cursor is not None,
+        'next_cursor': next_cursor,
+    }
+    if offset is not None:
+        response['next_offset'] = offset + limit
+    return JsonResponse(response)
+
+
+@catalog_conditional
+def filter_bouquets(request):
+    """Фильтрация каталога по категориям, ценам и флагам со счетчиками фасетов"""
+    catalog_filter = facets.parse_filter(request.GET)
+    sort_field, descending = facets.SORT_OPTIONS[catalog_filter['sort']]
+
+    # Количество букетов на странице
+    limit = 6
+
+    rows, next_cursor = paginate_by_cursor(
+        facets.filter_products(catalog_filter).values(*LIST_FIELDS),
+        cursor=request.GET.get('cursor'),
+        limit=limit,
+        sort_field=sort_field,
+        descending=descending,
+    )
 
-    # Рендерим HTML для новых букетов
-    html = render_to_string('bouquet_items.html', {'bouquets': more_bouquets},
+    html = render_to_string('bouquet_items.html',
+                            {'bouquets': [ProductCard.from_row(row) for row in rows]},
                             request=request)
 
-    # Возвращаем JSON с HTML и информацией о наличии дополнительных букетов
     return JsonResponse({
         'html': html,
+        'has_more': next_cursor is not None,
+        'next_cursor': next_cursor,
+        'facets': facets.facet_counts(catalog_filter),
+    })
+
+
+@catalog_conditional
+def search_bouquets(request):
+    """Полнотекстовый поиск по букетам с постраничной выдачей карточек"""
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    # Количество букетов на странице выдачи
+    limit = 6
+
+    # Запрашиваем на один букет больше, чтобы узнать, есть ли следующая страница
+    product_ids = search.search_product_ids(query, offset=(page - 1) * limit, limit=limit + 1)
+    has_more = len(product_ids) > limit
+    product_ids = product_ids[:limit]
+
+    # Карточки выбираются одним запросом и выстраиваются в порядке релевантности
+    cards = {card.id: card for card in fetch_cards(Product.objects.filter(id__in=product_ids))}
+    bouquets = [cards[product_id] for product_id in product_ids if product_id in cards]
+
+    html = render_to_string('bouquet_items.html', {'bouquets': bouquets}, request=request)
+
+    return JsonResponse({
+        'html': html,
+        'query': query,
         'has_more': has_more,
-        'next_offset': offset + limit,
+        'next_page': page + 1 if has_more else None,
     })
 
 
+@catalog_conditional
 def card(request, bouquet_id=None):
-    # Получаем конкретный букет по id или используем заглушку
+    # Получаем карточку конкретного букета по id или используем заглушку
     if bouquet_id:
-        bouquet = get_object_or_404(Product, id=bouquet_id)
+        bouquet = get_card(Product.objects.all(), id=bouquet_id)
+        if bouquet is None:
+            raise Http404("Букет не найден")
     else:
         # Если id не указан, возвращаем первый букет из базы (временное решение)
-        bouquet = Product.objects.filter(status='active').first()
-
-    # Модифицируем путь к изображению
-    if bouquet.image and str(bouquet.image).startswith('static/'):
-        bouquet.image_url = str(bouquet.image)[7:]  # Убираем 'static/' из начала пути
-    else:
-        bouquet.image_url = str(bouquet.image)
+        bouquet = get_card(Product.objects.filter(status='active').order_by('id'))
 
     return render(request, 'card.html', {'bouquet': bouquet})
 
@@ -115,6 +167,7 @@ def show_consultation(request):
 
 @csrf_protect
 @require_POST
+@idempotent
 def consultation(request):
     name = request.POST.get('fname', '').strip()
     phone = request.POST.get('tel', '').strip()
@@ -131,17 +184,20 @@ def consultation(request):
     logger.info(f"Processed phone number: {formatted_phone}")
 
     try:
-        user, created = ShopUser.objects.get_or_create(
-            phone=formatted_phone,
-            defaults={
-                'full_name': name,
-                'status': 'user',
-            }
-        )
-        logger.info(f"User created/found: {user.full_name}, {user.phone}, Created: {created}")
-        
-        # Создаем запись о консультации
-        consultation = Consultation.objects.create(user=user)
+        # Уведомления менеджерам ставятся в очередь сигналом post_save в той же
+        # транзакции: заявка без уведомления не сохранится
+        with transaction.atomic():
+            user, created = ShopUser.objects.get_or_create(
+                phone=formatted_phone,
+                defaults={
+                    'full_name': name,
+                    'status': 'user',
+                }
+            )
+            logger.info(f"User created/found: {user.full_name}, {user.phone}, Created: {created}")
+
+            # Создаем запись о консультации
+            consultation = Consultation.objects.create(user=user)
         logger.info(f"Consultation created: {consultation.id}")
         
         return JsonResponse({
@@ -155,77 +211,36 @@ def consultation(request):
         return JsonResponse({'success': False, 'error': str(e)})
 
 
+def _order_page(request, state, error_message=None):
+    """Страница выбора доставки: доступные слоты и токен мастера заказа"""
+    # Доступные слоты считаются по закэшированному расписанию: из базы читается
+    # только его версия (и счетчики загрузки, когда истек их кэш)
+    context = delivery_slots.get_availability()
+    context['express_message'] = None
+    context['error_message'] = error_message
+    context['wizard_token'] = wizard.dumps(state)
+    return render(request, 'order.html', context)
+
+
 def order(request):
     # Получаем ID букета из параметров URL
     bouquet_id = request.GET.get('bouquet_id')
-    
+    state = {}
+
     if bouquet_id:
-        # Получаем букет и сохраняем его данные в сессии
-        try:
-            bouquet = Product.objects.get(id=bouquet_id)
-            request.session['bouquet_data'] = {
-                'id': bouquet.id,
-                'name': bouquet.name,
-                'price': str(bouquet.price),
-                'composition': bouquet.composition
-            }
-        except Product.DoesNotExist:
-            pass
-
-    # Получаем текущую дату и время
-    current_date = datetime.date.today()
-    current_time = datetime.datetime.now().time()
-
-    # Специальный слот "Как можно скорее"
-    express_slot = DeliveryTimeSlot.objects.filter(is_express=True).first()
-    
-    # Получаем обычные слоты (не экспресс)
-    regular_slots = DeliveryTimeSlot.objects.filter(is_express=False).order_by(
-        'time_start')
-
-    # Разделяем слоты на доступные сегодня и завтра
-    today_slots = []
-    tomorrow_slots = []
-
-    for slot in regular_slots:
-        # Слот доступен сегодня, если текущее время меньше времени окончания слота
-        # и не слишком близко к времени окончания (мин. 30 минут до конца)
-        time_diff = datetime.datetime.combine(datetime.date.today(), slot.time_end) - datetime.datetime.combine(datetime.date.today(), current_time)
-        if time_diff.total_seconds() > 1800:  # Более 30 минут до конца слота
-            today_slots.append(slot)
-
-        # Если слот доступен для доставки завтра
-        if slot.is_available_tomorrow:
-            tomorrow_slots.append(slot)
-    
-    # Для отладки
-    print(f"Express slot: {express_slot}")
-    print(f"Today slots: {today_slots}")
-    print(f"Tomorrow slots: {tomorrow_slots}")
-    
-    # Проверяем доступность экспресс-слота
-    express_available = False
-    express_message = None
-    if express_slot:
-        # Проверяем время с учетом 30-минутного интервала
-        time_diff = datetime.datetime.combine(datetime.date.today(), express_slot.time_end) - datetime.datetime.combine(datetime.date.today(), current_time)
-        if time_diff.total_seconds() > 1800:  # Более 30 минут до конца слота
-            express_available = True
-    
-    context = {
-        'express_slot': express_slot if express_available else None,
-        'express_message': express_message,
-        'today_slots': today_slots,
-        'tomorrow_slots': tomorrow_slots,
-        'current_date': current_date,
-        'tomorrow_date': current_date + datetime.timedelta(days=1)
-    }
+        # Данные букета передаются дальше в подписанном токене мастера заказа
+        bouquet = Product.objects.filter(id=bouquet_id).values('id', 'name', 'price', 'composition').first()
+        if bouquet:
+            bouquet['price'] = str(bouquet['price'])
+            state['bouquet_data'] = bouquet
 
-    return render(request, 'order.html', context)
+    return _order_page(request, state)
 
 
 def order_step(request):
     if request.method == 'POST':
+        state = wizard.get_state(request)
+
         # Обработка данных формы
         name = request.POST.get('fname', '')
         phone = request.POST.get('tel', '')
@@ -238,76 +253,38 @@ def order_step(request):
         # Валидируем номер телефона
         is_valid, result = validate_russian_phone(phone)
         if not is_valid:
-            # Если номер не валиден, возвращаем ошибку
-            # В реальном приложении нужен бы редирект обратно на форму с сообщением
+            # Если номер не валиден, возвращаем форму с сообщением
             logger.error(f"Invalid phone number: {phone}, error: {result}")
-            return render(request, 'order.html', {
-                'error_message': result
-            })
+            return _order_page(request, state, result)
         
         formatted_phone = result
         logger.info(f"Processed phone number: {formatted_phone}")
 
         # Обрабатываем выбранный слот доставки
-        delivery_date = datetime.date.today()
-        is_express = False
-        delivery_time_from = None
-        delivery_time_to = None
-
-        if order_time.startswith('express'):
-            # Это экспресс-доставка
-            is_express = True
-            # Если для экспресс-доставки нужно указать время, получаем экспресс-слот
-            try:
-                express_slot = DeliveryTimeSlot.objects.filter(is_express=True).first()
-                if express_slot:
-                    delivery_time_from = express_slot.time_start
-                    delivery_time_to = express_slot.time_end
-                    logger.info(f"Express delivery: {delivery_time_from} - {delivery_time_to}")
-            except Exception as e:
-                logger.error(f"Error getting express time slot: {str(e)}")
-                pass
-        elif order_time.startswith('today'):
-            # Доставка сегодня
-            _, slot_id = order_time.split('-')
-            slot_id = int(slot_id)
-            # Получаем слот доставки
-            try:
-                time_slot = DeliveryTimeSlot.objects.get(id=slot_id)
-                delivery_time_from = time_slot.time_start
-                delivery_time_to = time_slot.time_end
-                logger.info(f"Today delivery: {delivery_time_from} - {delivery_time_to}")
-            except DeliveryTimeSlot.DoesNotExist:
-                logger.error(f"Time slot not found: {slot_id}")
-                pass
-        elif order_time.startswith('tomorrow'):
-            # Доставка завтра
-            delivery_date = datetime.date.today() + datetime.timedelta(days=1)
-            _, slot_id = order_time.split('-')
-            slot_id = int(slot_id)
-            # Получаем слот доставки
-            try:
-                time_slot = DeliveryTimeSlot.objects.get(id=slot_id)
-                delivery_time_from = time_slot.time_start
-                delivery_time_to = time_slot.time_end
-                logger.info(f"Tomorrow delivery: {delivery_time_from} - {delivery_time_to}")
-            except DeliveryTimeSlot.DoesNotExist:
-                logger.error(f"Time slot not found: {slot_id}")
-                pass
-
-        # Сохраняем информацию в сессии для последующего создания заказа
-        request.session['order_data'] = {
+        delivery = delivery_slots.resolve_order_time(order_time)
+        if delivery is None:
+            return _order_page(request, state, 'Выбранное время доставки недоступно, выберите другой слот')
+        delivery_date = delivery['delivery_date']
+        is_express = delivery['is_express']
+        delivery_time_from = delivery['delivery_time_from']
+        delivery_time_to = delivery['delivery_time_to']
+        logger.info(f"Delivery slot: {delivery_date} {delivery_time_from} - {delivery_time_to}, express={is_express}")
+
+        # Сохраняем информацию в токене для последующего создания заказа
+        state['order_data'] = {
             'name': name,
             'phone': formatted_phone,  # Используем отформатированный номер
             'address': address,
             'delivery_date': delivery_date.isoformat(),
             'is_express': is_express,
+            'delivery_slot_id': delivery['slot_id'],
             'delivery_time_from': delivery_time_from.strftime(
                 '%H:%M:%S') if delivery_time_from else None,
             'delivery_time_to': delivery_time_to.strftime(
                 '%H:%M:%S') if delivery_time_to else None
         }
-        logger.info(f"Saved order data to session: {request.session['order_data']}")
+        logger.info(f"Saved order data to wizard token: {state['order_data']}")
+        return render(request, 'order-step.html', {'wizard_token': wizard.dumps(state)})
 
     return render(request, 'order-step.html')
 
@@ -336,8 +313,18 @@ def quiz_step(request, category_id):
     # Получаем выбранную категорию
     category = get_object_or_404(Category, id=category_id)
     
-    # Получаем все ценовые диапазоны
-    price_ranges = PriceRange.objects.all().order_by('min_price')
+    # Получаем все ценовые диапазоны с количеством активных букетов выбранной категории
+    price_ranges = PriceRange.objects.annotate(
+        products_count=Count(
+            'products',
+            filter=Q(products__status='active', products__categories=category),
+            distinct=True,
+        )
+    ).order_by('min_price')
+
+    # Пустые диапазоны не показываем; если у категории нет букетов вовсе,
+    # оставляем все диапазоны - результат подберет букет из всего каталога
+    price_ranges = [price_range for price_range in price_ranges if price_range.products_count] or price_ranges
     
     context = {
         'category': category,
@@ -349,53 +336,21 @@ def quiz_step(request, category_id):
 
 def result(request):
     """Показывает случайный букет из всего каталога"""
-    # Получаем случайный активный букет
-    random_bouquet = Product.objects.filter(status='active').order_by('?').first()
-
-    # Модифицируем путь к изображению
-    if random_bouquet and random_bouquet.image:
-        if str(random_bouquet.image).startswith('static/'):
-            random_bouquet.image_url = str(random_bouquet.image)[7:]
-        else:
-            random_bouquet.image_url = str(random_bouquet.image)
+    # Случайный активный букет из индекса квиза (без ORDER BY RANDOM())
+    random_bouquet = quiz_index.pick_random_product()
 
     return render(request, 'result.html', {'bouquet': random_bouquet})
 
 
 def result_filtered(request, category_id, price_range_id):
     """Показывает букет, отфильтрованный по категории и ценовому диапазону"""
-    # Получаем выбранную категорию и ценовой диапазон
-    category = get_object_or_404(Category, id=category_id)
-    price_range = get_object_or_404(PriceRange, id=price_range_id)
-    
-    # Получаем букеты, соответствующие критериям
-    # Сначала фильтрация по категории
-    bouquets = Product.objects.filter(
-        categories=category,
-        status='active'
-    )
-    
-    # Затем по ценовому диапазону
-    if price_range.min_price and price_range.max_price:
-        bouquets = bouquets.filter(price__gte=price_range.min_price, price__lte=price_range.max_price)
-    elif price_range.min_price:
-        bouquets = bouquets.filter(price__gte=price_range.min_price)
-    elif price_range.max_price:
-        bouquets = bouquets.filter(price__lte=price_range.max_price)
-    
-    # Если нет подходящих букетов, берем все активные
-    if not bouquets.exists():
-        bouquets = Product.objects.filter(status='active')
-    
-    # Берем случайный букет из отфильтрованного списка
-    random_bouquet = bouquets.order_by('?').first()
-    
-    # Модифицируем путь к изображению
-    if random_bouquet and random_bouquet.image:
-        if str(random_bouquet.image).startswith('static/'):
-            random_bouquet.image_url = str(random_bouquet.image)[7:]
-        else:
-            random_bouquet.image_url = str(random_bouquet.image)
+    # Проверяем параметры по индексу, не обращаясь к базе
+    if not quiz_index.has_category(category_id) or not quiz_index.has_price_range(price_range_id):
+        raise Http404("Категория или ценовой диапазон не найдены")
+
+    # Берем случайный букет из корзины (категория, ценовой диапазон).
+    # Если подходящих букетов нет, индекс вернет случайный из всех активных
+    random_bouquet = quiz_index.pick_random_product(category_id, price_range_id)
     
     return render(request, 'result.html', {'bouquet': random_bouquet})
 
@@ -404,29 +359,27 @@ def privacy(request):
     # Создайте шаблон privacy.html или перенаправляйте куда-то
     return render(request, 'privacy.html')
 
+@idempotent
 def process_order(request):
     if request.method == 'POST':
-        # Получаем данные заказа и букета из сессии
-        order_data = request.session.get('order_data', {})
-        bouquet_data = request.session.get('bouquet_data', {})
+        # Получаем данные заказа и букета из подписанного токена мастера заказа
+        state = wizard.get_state(request)
+        order_data = state.get('order_data', {})
+        bouquet_data = state.get('bouquet_data', {})
         
         # Логирование для отладки
-        logger.info(f"Order data from session: {order_data}")
-        logger.info(f"Bouquet data from session: {bouquet_data}")
+        logger.info(f"Order data from wizard token: {order_data}")
+        logger.info(f"Bouquet data from wizard token: {bouquet_data}")
         
-        if not order_data:
-            logger.error("Order data not found in session")
+        if not order_data or not state.get(wizard.NONCE_KEY):
+            logger.error("Order data not found in wizard token")
             return JsonResponse({'success': False, 'error': 'Данные заказа не найдены'})
         
         if not bouquet_data:
-            logger.error("Bouquet data not found in session")
+            logger.error("Bouquet data not found in wizard token")
             return JsonResponse({'success': False, 'error': 'Данные букета не найдены'})
         
         try:
-            # Получаем букет
-            bouquet = Product.objects.get(id=bouquet_data['id'])
-            logger.info(f"Found product: {bouquet.name}, ID: {bouquet.id}")
-            
             # Проверяем, что номер телефона в правильном формате
             phone = order_data.get('phone', '')
             if not phone.startswith('+'):
@@ -439,48 +392,21 @@ def process_order(request):
                     return JsonResponse({'success': False, 'error': result})
                     
             logger.info(f"Using phone: {phone}")
-            
-            # Создаем или получаем пользователя
-            user, created = ShopUser.objects.get_or_create(
-                phone=phone,
-                defaults={
-                    'full_name': order_data['name'],
-                    'status': 'user',
-                    'address': order_data['address']
-                }
-            )
-            logger.info(f"User: {user.full_name}, Created: {created}")
-
-            # Создаем заказ с информацией о букете
-            order = Order.objects.create(
-                user=user,
-                product=bouquet,
-                product_name=bouquet.name,
-                product_price=bouquet.price,
-                product_composition=bouquet.composition,
-                delivery_address=order_data['address'],
-                delivery_date=datetime.datetime.strptime(order_data['delivery_date'], '%Y-%m-%d').date(),
-                is_express_delivery=order_data['is_express'],
-                status='created',
-                creation_date=timezone.now()  # Явно указываем текущее время с учетом часового пояса
-            )
-            logger.info(f"Created order with ID: {order.id}")
-
-            # Добавляем время доставки, если оно есть
-            if order_data.get('delivery_time_from'):
-                order.delivery_time_from = datetime.datetime.strptime(
-                    order_data['delivery_time_from'], '%H:%M:%S').time()
-            if order_data.get('delivery_time_to'):
-                order.delivery_time_to = datetime.datetime.strptime(
-                    order_data['delivery_time_to'], '%H:%M:%S').time()
-            
-            order.save()
-            logger.info(f"Order saved: {order.id}")
 
-            # Очищаем данные из сессии
-            del request.session['order_data']
-            del request.session['bouquet_data']
-            
+            # Заказ создается одной транзакцией и одним INSERT
+            try:
+                order = orders.create_order({**order_data, 'phone': phone}, bouquet_data['id'],
+                                            wizard_nonce=state[wizard.NONCE_KEY])
+            except wizard.TokenAlreadyUsed as e:
+                logger.warning(str(e))
+                return JsonResponse({'success': False, 'error': 'Этот заказ уже оформлен'})
+            except orders.SlotUnavailable as e:
+                logger.warning(str(e))
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Выбранное время доставки уже занято, пожалуйста, выберите другое'
+                })
+
             return JsonResponse({
                 'success': True,
                 'message': 'Мы свяжемся с Вами в ближайшее время для уточнения заказа',
@@ -496,3 +422,38 @@ def process_order(request):
 
 def contacts(request):
     return render(request, 'contacts.html')
+
+
+@require_GET
+def nearest_shops(request):
+    """
+    Ближайшие к точке магазины: /shops/nearest/?lat=56.01&lng=92.87[&limit=3]
+
+    Поиск идет по индексу магазинов в памяти процесса; из базы читается
+    только версия магазинов, чтобы заметить их изменение в другом процессе.
+    """
+    try:
+        lat = float(request.GET['lat'])
+        lng = float(request.GET['lng'])
+        limit = int(request.GET.get('limit', 1))
+    except (KeyError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Укажите координаты lat и lng'}, status=400)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return JsonResponse({'success': False, 'error': 'Координаты вне допустимого диапазона'}, status=400)
+    limit = max(1, min(limit, shop_index.MAX_LIMIT))
+
+    shops = [
+        {
+            'id': shop['id'],
+            'title': shop['title'],
+            'slug': shop['slug'],
+            'address': shop['address'],
+            'phone': shop['phone'],
+            'working_hours': shop['working_hours'],
+            'lat': shop['coord_x'],
+            'lng': shop['coord_y'],
+            'distance_km': round(distance, 3),
+        }
+        for shop, distance in shop_index.nearest(lat, lng, limit=limit)
+    ]
+    return JsonResponse({'success': True, 'shops': shops})
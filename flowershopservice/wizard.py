@@ -0,0 +1,77 @@
+import datetime
+import logging
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import UsedWizardToken
+
+logger = logging.getLogger(__name__)
+
+# Состояние мастера заказа (order -> order_step -> process_order) передается
+# между шагами подписанным токеном в скрытом поле формы, а не через сессию
+FIELD_NAME = 'wizard'
+SALT = 'flowershopservice.order-wizard'
+# Одноразовый номер токена: заказ по одному токену оформляется один раз
+NONCE_KEY = 'nonce'
+
+
+class TokenAlreadyUsed(Exception):
+    """По этому токену мастера заказ уже оформлен"""
+
+
+def dumps(state):
+    """Подписывает и сжимает состояние мастера; каждый токен получает новый одноразовый номер"""
+    return signing.dumps({**state, NONCE_KEY: uuid.uuid4().hex}, salt=SALT, compress=True)
+
+
+def loads(token):
+    """
+    Проверяет подпись и срок действия токена.
+
+    Срок отсчитывается от последнего шага: каждый шаг выдает новый токен.
+
+    Returns:
+        dict: Состояние мастера или пустой словарь, если токен поддельный или устарел
+    """
+    if not token:
+        return {}
+    try:
+        return signing.loads(token, salt=SALT, max_age=settings.ORDER_WIZARD_MAX_AGE)
+    except signing.SignatureExpired:
+        logger.info("Токен мастера заказа устарел")
+    except signing.BadSignature:
+        logger.warning("Неверная подпись токена мастера заказа")
+    return {}
+
+
+def get_state(request):
+    """Состояние мастера из POST или GET запроса"""
+    return loads(request.POST.get(FIELD_NAME) or request.GET.get(FIELD_NAME))
+
+
+def consume(nonce):
+    """
+    Отмечает токен использованным.
+
+    Вызывается в транзакции оформления заказа: номер вставляется строкой с
+    уникальным индексом, поэтому повтор того же токена, в том числе
+    одновременный из другого процесса, отклоняется, а откат заказа
+    освобождает номер.
+
+    Raises:
+        TokenAlreadyUsed: Заказ по этому токену уже оформлен
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            UsedWizardToken.objects.create(nonce=nonce, used_at=now)
+    except IntegrityError:
+        raise TokenAlreadyUsed(f"Токен мастера заказа {nonce} уже использован")
+    # Номера просроченных токенов больше не нужны: такие токены не проходят loads
+    UsedWizardToken.objects.filter(
+        used_at__lt=now - datetime.timedelta(seconds=settings.ORDER_WIZARD_MAX_AGE),
+    ).delete()